@@ -6,38 +6,44 @@ import requests
 from requests.exceptions import RequestException
 from flask import send_from_directory
 from datetime import datetime
-from fetch_using_ai import extract_xpaths
-import undetected_chromedriver as uc
-from selenium.webdriver.common.by import By
-from selenium.webdriver.support.ui import WebDriverWait
-from selenium.webdriver.support import expected_conditions as EC
-from selenium.common.exceptions import TimeoutException
-from selenium_stealth import stealth
+from xpath_generator import extract_xpaths
 import time
 import re
 import tempfile
+import uuid
+from database import init_schema, release_connections
+from db_driver import ConfigDBDriver
+from html_cache import get_html_cache
+from compiled_config import invalidate_compiled
+from image_downloader import download_images, list_job_images, DOWNLOAD_IMAGES, IMAGES_DIR
+from listing_store import STATUS_REMOVED
+from excel_export import STATUS_COLUMN, COLUMNS
+from results_store import get_result_store
+from readiness import wait_for_ready, scroll_until_stable
+from driver_pool import apply_stealth
+from browser_worker import get_browser_client
+from resource_policy import resolve_policy, apply_resource_policy, enable_network_log, collect_network_stats, get_resource_stats
+from transform_dsl import validate_transforms
+from html_minimizer import minimize_html, STRUCTURE_ATTRS, CHARS_PER_TOKEN
+from fetcher import pop_job_fetch_stats, format_fetch_stats, FETCH_LABELS
+from tracing import span, job_context, finish_job, format_summary, recent_jobs, STAGE_LABELS
+from politeness import domain_of, get_politeness
 app = Flask(__name__)
 app.config['MAX_CONTENT_LENGTH'] = 100 * 1024 * 1024  # 100 MB
 app.secret_key = "supersecretkey"  # change this in production
 
-DB_FILE = "website_configs.db"
 
-# ================= Initialize DB =================
-def init_db():
-    if not os.path.exists(DB_FILE):
-        conn = sqlite3.connect(DB_FILE)
-        c = conn.cursor()
-        c.execute("""
-            CREATE TABLE configs (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                website TEXT NOT NULL,
-                config_json TEXT NOT NULL
-            )
-        """)
-        conn.commit()
-        conn.close()
+@app.teardown_appcontext
+def release_db(exc):
+    # The dev server runs every request on a new thread: pass its DB connection on
+    release_connections()
+
+
+# Generator renders differ from scraper renders (always lazy-scrolled)
+GENERATOR_CACHE_CONFIG = {"lazy_scroll": True, "max_scrolls": 5, "fetch_mode": "generator"}
 
-init_db()
+# ================= Initialize DB =================
+init_schema()
 
 
 # ================= Admin Credentials =================
@@ -65,13 +71,17 @@ def dashboard():
     if not session.get("logged_in"):
         return redirect(url_for("login"))
     
-    conn = sqlite3.connect(DB_FILE)
-    c = conn.cursor()
-    c.execute("SELECT id, website, config_json FROM configs")
-    rows = c.fetchall()
-    conn.close()
-    
-    return render_template("dashboard.html", configs=rows)
+    rows = ConfigDBDriver().config_rows()
+
+    heatmap = get_result_store().field_failure_heatmap()
+    heatmap_fields = [c for c in COLUMNS if any(c in fields for fields in heatmap.values())]
+    return render_template(
+        "dashboard.html", configs=rows, resource_stats=get_resource_stats(),
+        recent_jobs=recent_jobs(), job_rows={j["job_id"]: j for j in get_result_store().jobs(limit=50)},
+        stage_labels=STAGE_LABELS, fetch_labels=FETCH_LABELS,
+        domain_limits=get_politeness().stats(),
+        field_heatmap=heatmap, heatmap_fields=heatmap_fields,
+    )
 
 
 # ================= Create/Edit Field =================
@@ -81,15 +91,13 @@ def edit_field(id):
     if not session.get("logged_in"):
         return redirect(url_for("login"))
     
-    conn = sqlite3.connect(DB_FILE)
-    c = conn.cursor()
+    db = ConfigDBDriver()
     config_data = {"website": "", "config_json": "{}"}
-    
+
     if id:
-        c.execute("SELECT website, config_json FROM configs WHERE id=?", (id,))
-        row = c.fetchone()
+        row = db.get_config_row(id)
         if row:
-            config_data = {"website": row[0], "config_json": row[1]}
+            config_data = {"website": row["website"], "config_json": row["config_json"]}
     
     if request.method == "POST":
         website = request.form.get("website")
@@ -97,27 +105,25 @@ def edit_field(id):
         
         # Validate JSON
         try:
-            json.loads(config_json)
+            parsed = json.loads(config_json)
         except:
             flash("❌ Invalid JSON format", "danger")
             return redirect(request.url)
+
+        transform_errors = validate_transforms(parsed)
+        if transform_errors:
+            flash("❌ Invalid transform — " + "; ".join(transform_errors), "danger")
+            return redirect(request.url)
         
-        if id:
-            c.execute(
-                "UPDATE configs SET website=?, config_json=? WHERE id=?",
-                (website, config_json, id)
-            )
-        else:
-            c.execute(
-                "INSERT INTO configs (website, config_json) VALUES (?, ?)",
-                (website, config_json)
-            )
-        conn.commit()
-        conn.close()
+        try:
+            db.save_config_json(website, config_json, config_id=id, replace=False)
+        except sqlite3.IntegrityError:
+            flash(f"❌ {website} already has a config — edit that one instead", "danger")
+            return redirect(request.url)
+        invalidate_compiled()
         flash("✅ Saved successfully!", "success")
         return redirect(url_for("dashboard"))
-    
-    conn.close()
+
     return render_template("edit_field.html", config=config_data)
 
 
@@ -128,10 +134,8 @@ def delete(id):
         return redirect(url_for("login"))
 
     try:
-        with sqlite3.connect(DB_FILE) as conn:
-            c = conn.cursor()
-            c.execute("DELETE FROM configs WHERE id=?", (id,))
-            conn.commit()
+        ConfigDBDriver().delete_config_by_id(id)
+        invalidate_compiled()
         flash("✅ Deleted successfully!", "success")
     except sqlite3.OperationalError as e:
         flash(f"❌ Database error: {str(e)}", "danger")
@@ -142,18 +146,30 @@ def delete(id):
 def serve_output(filename):
     return send_from_directory("output_files", filename)
 
+# Re-export a stored job (e.g. after the file was deleted or columns changed)
+@app.route("/export/<job_id>")
+def export_job(job_id):
+    if not session.get("logged_in"):
+        return redirect(url_for("login"))
+
+    filename = export_job_excel(job_id, f"{datetime.now().strftime('%Y-%m-%d_%H-%M-%S')}_{job_id}_export.xlsx")
+    if not filename:
+        flash(f"❌ No stored results for job {job_id}", "danger")
+        return redirect(url_for("dashboard"))
+    return send_from_directory("output_files", filename, as_attachment=True)
+
 # Serve 'images' folder
 @app.route("/images/<path:filename>")
 def serve_images(filename):
-    return send_from_directory("images", filename)
+    return send_from_directory(IMAGES_DIR, filename)
 
 @app.route("/download/<path:filename>")
 def download_file(filename):
-    return send_from_directory("images", filename, as_attachment=True)
+    return send_from_directory(IMAGES_DIR, filename, as_attachment=True)
 @app.route("/image_pages")
 def image_pages():
-    images = os.listdir("images")
-    return render_template("image_pages.html", images=images)
+    jobs = list_job_images()
+    return render_template("image_pages.html", jobs=jobs)
 
 # ================= Logout =================
 @app.route("/logout")
@@ -161,21 +177,19 @@ def logout():
     session.clear()
     return redirect(url_for("login"))
 def create_generator_driver():
-    options = build_generator_chrome_options()
-    driver = uc.Chrome(options=options)
+    options = enable_network_log(build_generator_chrome_options())
+    # Selenium/undetected_chromedriver load on the first generator run, not at app start
+    import undetected_chromedriver as uc
 
-    stealth(
-        driver,
-        languages=["en-US", "en"],
-        vendor="Google Inc.",
-        platform="Win32",
-        webgl_vendor="Intel Inc.",
-        renderer="Intel Iris OpenGL Engine",
-        fix_hairline=True,
-    )
+    driver = uc.Chrome(options=options)
+    apply_stealth(driver)
 
+    # Only the DOM is needed: skip images, fonts, media and trackers
+    apply_resource_policy(driver, resolve_policy(GENERATOR_CACHE_CONFIG))
     return driver
 def build_generator_chrome_options():
+    import undetected_chromedriver as uc
+
     options = uc.ChromeOptions()
     options.add_argument("--headless=new")
     options.add_argument("--no-sandbox")
@@ -197,44 +211,47 @@ def build_generator_chrome_options():
     return options
 
 def wait_and_scroll(driver, wait_time=6, lazy_scroll=True, max_scrolls=5, scroll_pause=2):
-    try:
-        WebDriverWait(driver, wait_time).until(
-            EC.presence_of_element_located((By.XPATH, "//*"))
-        )
-    except TimeoutException:
-        pass
+    # No config yet: wait for load + DOM/network quiet rather than any XPath
+    wait_for_ready(driver, {}, targets=[], timeout=wait_time)
 
     if not lazy_scroll:
         return
 
-    last_height = driver.execute_script("return document.body.scrollHeight")
-    for _ in range(max_scrolls):
-        driver.execute_script("window.scrollTo(0, document.body.scrollHeight);")
-        time.sleep(scroll_pause)
-        new_height = driver.execute_script("return document.body.scrollHeight")
-        if new_height == last_height:
-            break
-        last_height = new_height
+    scroll_until_stable(driver, {}, max_scrolls=max_scrolls, pause_cap=scroll_pause)
 
 def clean_html_for_llm(html_text, max_length=120_000):
-    # Remove scripts/styles
-    html_text = re.sub(r"<script.*?>.*?</script>", "", html_text, flags=re.S)
-    html_text = re.sub(r"<style.*?>.*?</style>", "", html_text, flags=re.S)
-
-    # Collapse whitespace
-    html_text = re.sub(r"\s+", " ", html_text).strip()
-
-    # Hard truncate (safety)
-    if len(html_text) > max_length:
-        html_text = html_text[:max_length]
-
-    return html_text
+    # DOM-aware reduction; keeps id/class hooks the XPath generator relies on
+    return minimize_html(
+        html_text,
+        max_tokens=max_length // CHARS_PER_TOKEN,
+        keep_attrs=STRUCTURE_ATTRS,
+    )
 
-def fetch_html_for_generator(url):
+def fetch_html_for_generator(url, bypass_cache=False):
     """
     Cloudflare-safe HTML fetch for config generator.
-    Uses undetected Chrome + stealth.
+    Uses undetected Chrome + stealth; rendered pages are kept in the HTML cache.
     """
+    cache = get_html_cache()
+    if not bypass_cache:
+        cached = cache.get(url, GENERATOR_CACHE_CONFIG)
+        if cached:
+            return cached
+
+    client = get_browser_client()
+    if client:
+        # Rendered by the browser worker daemon; a hung Chrome cannot block the panel
+        try:
+            html_content = client.render(
+                url, GENERATOR_CACHE_CONFIG,
+                targets=[], scroll=True, ready_timeout=6, max_scrolls=5, scroll_pause=2,
+            )
+        except Exception as e:
+            print(f"Error fetching URL {url}: {e}")
+            raise RuntimeError(f"Failed to render URL: {url}\n{e}")
+        cache.put(url, GENERATOR_CACHE_CONFIG, html_content)
+        return html_content
+
     driver = None
     try:
         driver = create_generator_driver()
@@ -249,6 +266,8 @@ def fetch_html_for_generator(url):
         )
 
         html_content = driver.page_source
+        collect_network_stats(driver)
+        cache.put(url, GENERATOR_CACHE_CONFIG, html_content)
         return html_content
 
     except Exception as e:
@@ -262,8 +281,8 @@ def fetch_html_for_generator(url):
             except Exception:
                 pass
 
-def fetch_and_prepare_html(url):
-    raw_html = fetch_html_for_generator(url)
+def fetch_and_prepare_html(url, bypass_cache=False):
+    raw_html = fetch_html_for_generator(url, bypass_cache=bypass_cache)
     print(f"Fetched HTML length for {url}: {len(raw_html)}")
     return clean_html_for_llm(raw_html)
 
@@ -315,16 +334,23 @@ def generator():
         if field2_file:
             field2_html = field2_file.read().decode("utf-8")
 
+        # Pasted/uploaded pages get the same reduction as fetched ones
+        if field1_html:
+            field1_html = clean_html_for_llm(field1_html)
+        if field2_html:
+            field2_html = clean_html_for_llm(field2_html)
+
         if action == "generate":
             if not ((field1 and field2) or (field1_html and field2_html)):
                 flash("❌ Provide URLs, HTML, or uploaded files for both pages", "danger")
                 return redirect(url_for("generator"))
 
+            bypass_cache = request.form.get("bypass_cache") == "on"
             try:
                 if not field1_html and field1:
-                    field1_html = fetch_and_prepare_html(field1)
+                    field1_html = fetch_and_prepare_html(field1, bypass_cache)
                 if not field2_html and field2:
-                    field2_html = fetch_and_prepare_html(field2)
+                    field2_html = fetch_and_prepare_html(field2, bypass_cache)
 
                 extracted = extract_xpaths(list_html=field1_html, detail_html=field2_html)
                 generated_json = json.dumps(extracted, indent=2, ensure_ascii=False)
@@ -336,22 +362,22 @@ def generator():
         elif action == "store":
             generated_json = request.form.get("json_data")
             try:
-                json.loads(generated_json)
+                parsed = json.loads(generated_json)
             except:
                 flash("❌ Invalid JSON format", "danger")
                 return redirect(url_for("generator"))
 
+            transform_errors = validate_transforms(parsed)
+            if transform_errors:
+                flash("❌ Invalid transform — " + "; ".join(transform_errors), "danger")
+                return redirect(url_for("generator"))
+
             # Use mandatory domain_url for DB key
             domain_key = extract_domain_key(domain_url)
 
-            conn = sqlite3.connect(DB_FILE)
-            c = conn.cursor()
-            c.execute(
-                "INSERT INTO configs (website, config_json) VALUES (?, ?)",
-                (domain_key, generated_json)
-            )
-            conn.commit()
-            conn.close()
+            # One config per domain: regenerating replaces the stored one
+            ConfigDBDriver().save_config_json(domain_key, generated_json)
+            invalidate_compiled()
 
             flash("✅ Config stored successfully!", "success")
             return redirect(url_for("dashboard"))
@@ -371,14 +397,16 @@ def generator():
     )
 
 import os
-import pandas as pd
 from datetime import datetime
 from main import (
     get_website_config,
     parse_property_with_config,
     parse_list_page,
-    save_to_excel,
+    export_job_excel,
     send_email_notification,
+    extract_fields,
+    split_cache_flag,
+    start_incremental_run,
     BASE_URL
 )
 
@@ -387,7 +415,23 @@ def process_user_message(message_text: str):
     Process a user message (URL) using main.py bot functions.
     Returns a tuple of (bot_reply_text, optional_excel_file_link)
     """
-    url = message_text.strip()
+    url, bypass_cache = split_cache_flag(message_text)
+    job_id = uuid.uuid4().hex[:8]
+    with job_context(job_id):
+        try:
+            with span("job", url=url):
+                bot_messages, download_link = _process_user_message(job_id, url, bypass_cache)
+        finally:
+            fetch_stats = pop_job_fetch_stats(job_id)
+            timings = finish_job(job_id, url=url, domain=domain_of(url), fetch=fetch_stats)
+    if fetch_stats:
+        bot_messages.append(format_fetch_stats(fetch_stats))
+    if timings:
+        bot_messages.append(format_summary(timings))
+    return bot_messages, download_link
+
+
+def _process_user_message(job_id, url, bypass_cache):
     bot_messages = []
 
     bot_messages.append("✅ Принято, собираю…")
@@ -398,51 +442,92 @@ def process_user_message(message_text: str):
         bot_messages.append("❌ Источник не подключён. Добавьте в панели.")
         return bot_messages, None
 
-    # Try single property first
-    data, error = parse_property_with_config(url, config)
-    download_folder = "images"
+    results = get_result_store()
+    results.start_job(job_id, url)
 
-    try:
-        # Clean old images
-        for f in os.listdir(download_folder):
-            file_path = os.path.join(download_folder, f)
-            if os.path.isfile(file_path):
-                os.remove(file_path)
-        print(f"🧹 Old images removed from '{download_folder}'")
-    except Exception as e:
-        print(f"⚠️ Failed to clear images folder: {e}")
+    def store(result):
+        results.add(job_id, result.data, result.field_status)
+
+    # Try single property first
+    single = parse_property_with_config(url, config, bypass_cache=bypass_cache)
 
-    # Parse properties
-    if data and data.get("Название") != "ERROR":
-        properties = [data]
+    # Parse properties; every row is stored with its per-field statuses
+    if single.data and single.data.get("Название") != "ERROR":
+        properties = [single.data]
+        store(single)
     else:
-        properties = parse_list_page(url, config)
+        incremental = start_incremental_run(url, config, bypass_cache)
+        properties = parse_list_page(
+            url, config, bypass_cache=bypass_cache, on_result=store, incremental=incremental
+        )
+        if incremental:
+            bot_messages.append(incremental.summary())
 
     if not properties:
+        results.finish_job(job_id)
         bot_messages.append("❌ Недвижимость не найдена.")
         return bot_messages, None
 
-    # Save to Excel
-    filename = f"{datetime.now().strftime('%Y-%m-%d_%H-%M-%S')}_properties.xlsx"
-    file_path = save_to_excel(properties, filename)
+    # The Excel file is an export of the stored rows
+    filename = f"{datetime.now().strftime('%Y-%m-%d_%H-%M-%S')}_{job_id}_properties.xlsx"
+    results.finish_job(job_id, export_job_excel(job_id, filename))
+
+    # Photos go to the shared content-addressed store, listed under this job
+    if config.get("download_images", DOWNLOAD_IMAGES):
+        download_images(job_id, [p for p in properties if p.get(STATUS_COLUMN) != STATUS_REMOVED], config)
 
-    # Count errors in Excel
-    df = pd.read_excel(file_path, engine="openpyxl")
-    error_count = df.apply(lambda x: x.astype(str).str.contains("error", case=False, na=False)).sum().sum()
+    # Properties with at least one failed field, and which fields fail
+    error_count = results.job_counts(job_id)["with_errors"]
+    field_summary = results.field_stats(job_id).summary()
 
     download_link = f"{BASE_URL}/output_files/{filename}"
     bot_messages.append(
         f"✅ Готово: {len(properties)} объекта(ов), {error_count} с ошибками. Скачать Excel: \n📂 {download_link}"
     )
+    if field_summary:
+        bot_messages.append(field_summary)
 
     # Optional: send email
     send_email_notification(
         "🚀 Bot Notification",
         f"✅ Готово: {len(properties)} объекта(ов), {error_count} с ошибками. Скачать Excel: \n📂 {download_link}"
+        f"\n\n{field_summary}"
     )
 
     return bot_messages, download_link
 
+# ================= Re-parse cached pages =================
+@app.route("/reparse/<int:id>")
+def reparse_cached(id):
+    """Validate a (possibly just edited) config against cached pages, without re-scraping."""
+    if not session.get("logged_in"):
+        return redirect(url_for("login"))
+
+    row = ConfigDBDriver().get_config_row(id)
+    if not row:
+        flash("❌ Config not found", "danger")
+        return redirect(url_for("dashboard"))
+
+    website, config = row["website"], json.loads(row["config_json"])
+    cache = get_html_cache()
+    limit = request.args.get("limit", 20, type=int)
+
+    results = []
+    for entry in cache.entries(website)[:limit]:
+        html_content = cache.load(entry["key"])
+        if not html_content:
+            continue
+        try:
+            extracted = extract_fields(html_content, entry["url"], config, config_id=website)
+            data, missing, status = extracted.data, extracted.failed_fields(), extracted.field_status
+        except Exception as e:
+            data, missing, status = {"Ссылка на объект": entry["url"]}, [f"parse failed: {e}"], {}
+        results.append({"url": entry["url"], "data": data, "missing": missing, "status": status})
+
+    field_names = list(config.get("fields", {}).keys())
+    return render_template("reparse.html", id=id, website=website, fields=field_names, results=results)
+
+
 @app.route("/chat", methods=["GET", "POST"])
 def chat_ui():
     if "chat" not in session:
@@ -0,0 +1,241 @@
+"""
+Hot-path benchmarks over recorded pages.
+
+    python benchmarks/bench.py                       # all sites in benchmarks/fixtures
+    python benchmarks/bench.py --site jamesedition.com --iterations 100
+    python benchmarks/bench.py --save baseline.json
+    python benchmarks/bench.py --baseline baseline.json   # flag regressions
+
+Each fixture folder holds list.html, detail.html, config.json (the site's
+config JSON) and urls.json ({"list_url", "detail_url"}). No network, browser
+or LLM is touched: fetch_html and the LLM scheduler are stubbed.
+"""
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import tempfile
+import statistics
+import tracemalloc
+import contextlib
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from lxml import html
+
+import main
+from db_driver import ConfigDBDriver
+from config_registry import ConfigRegistry
+from compiled_config import get_compiled_config
+from listing_store import card_fingerprint
+
+FIXTURES_DIR = os.path.join(ROOT, "benchmarks", "fixtures")
+EXCEL_ROWS = 200
+# Percent slower than the baseline p50 that counts as a regression
+REGRESSION_THRESHOLD = 15.0
+
+
+class _NoLLM:
+    """Stands in for the LLM scheduler: missing fields stay ERROR."""
+
+    def extract(self, html_content, url, missing_fields, timeout=600):
+        return {}
+
+
+def load_site(site):
+    folder = os.path.join(FIXTURES_DIR, site)
+    with open(os.path.join(folder, "config.json"), encoding="utf-8") as f:
+        config = json.load(f)
+    with open(os.path.join(folder, "urls.json"), encoding="utf-8") as f:
+        urls = json.load(f)
+    pages = {}
+    for name in ("list", "detail"):
+        with open(os.path.join(folder, f"{name}.html"), encoding="utf-8") as f:
+            pages[name] = f.read()
+    return config, urls, pages
+
+
+# ============================================================
+# 🧪 Stages
+# ============================================================
+def stage_parse_property(config, urls, pages):
+    """parse_property_with_config with fetch_html returning the recorded page."""
+    main.fetch_html = lambda url, cfg, bypass_cache=False: pages["detail"]
+    main.get_llm_scheduler = lambda: _NoLLM()
+
+    def run():
+        result = main.parse_property_with_config(urls["detail_url"], config)
+        assert result.data, result.error
+        return result.data
+    return run
+
+
+def stage_transforms(config, urls, pages):
+    """XPath evaluation + transform per field on an already parsed tree."""
+    tree = html.fromstring(pages["detail"])
+    compiled = get_compiled_config(config)
+
+    def run():
+        return {field.name: main._xpath_value(field, tree)[0] for field in compiled.fields}
+    return run
+
+
+def stage_list_links(config, urls, pages):
+    """List-page parse, link XPath and card fingerprints (what pagination does per page)."""
+    def run():
+        tree = html.fromstring(pages["list"])
+        links = tree.xpath(config.get("list_page_check", ""))
+        if links and hasattr(links[0], "tag"):
+            # Card-level list_page_check: take each card's first link
+            links = [href for card in links for href in card.xpath(".//a/@href")[:1]]
+        hrefs = {str(link) for link in links}
+        return [card_fingerprint(link, hrefs) for link in links]
+    return run
+
+
+def stage_save_to_excel(config, urls, pages, workdir):
+    """EXCEL_ROWS copies of the parsed record through the streaming writer."""
+    main.fetch_html = lambda url, cfg, bypass_cache=False: pages["detail"]
+    main.get_llm_scheduler = lambda: _NoLLM()
+    record = main.parse_property_with_config(urls["detail_url"], config).data
+    properties = [dict(record) for _ in range(EXCEL_ROWS)]
+
+    def run():
+        return main.save_to_excel(properties, "bench.xlsx", output_folder=workdir)
+    return run
+
+
+def stage_config_lookup(config, urls, pages, workdir):
+    """Registry lookup against a DB holding this site plus 500 other domains."""
+    db_path = os.path.join(workdir, "configs.db")
+    db = ConfigDBDriver(db_path)
+    db.cursor.executemany(
+        "INSERT INTO configs (website, config_json) VALUES (?, ?)",
+        [(f"site{i}.example.com", json.dumps({"fields": {}})) for i in range(500)],
+    )
+    db.conn.commit()
+    db.insert_config(main.domain_of(urls["detail_url"]), config)
+    db.close()
+    registry = ConfigRegistry(db_path)
+
+    def run():
+        domain, found = registry.lookup(urls["detail_url"])
+        assert found, domain
+        return found
+    return run
+
+
+# ============================================================
+# 📊 Measurement
+# ============================================================
+def percentile(samples, pct):
+    ordered = sorted(samples)
+    k = (len(ordered) - 1) * pct / 100
+    lo, hi = int(k), min(int(k) + 1, len(ordered) - 1)
+    return ordered[lo] + (ordered[hi] - ordered[lo]) * (k - lo)
+
+
+def measure(fn, iterations, warmup=3):
+    for _ in range(warmup):
+        fn()
+
+    samples = []
+    for _ in range(iterations):
+        start = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - start) * 1000)
+
+    # Memory in a separate pass: tracemalloc slows allocation-heavy code down.
+    # It sees the Python heap only; lxml's C-side tree memory is not included.
+    tracemalloc.start()
+    fn()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return {
+        "iterations": iterations,
+        "mean_ms": round(statistics.fmean(samples), 3),
+        "p50_ms": round(percentile(samples, 50), 3),
+        "p90_ms": round(percentile(samples, 90), 3),
+        "p99_ms": round(percentile(samples, 99), 3),
+        "max_ms": round(max(samples), 3),
+        "peak_kb": round(peak / 1024, 1),
+    }
+
+
+def run_site(site, iterations):
+    config, urls, pages = load_site(site)
+    workdir = tempfile.mkdtemp(prefix="bench_")
+    stages = {
+        "config_lookup": stage_config_lookup(config, urls, pages, workdir),
+        "parse_property": stage_parse_property(config, urls, pages),
+        "transforms": stage_transforms(config, urls, pages),
+        "list_links": stage_list_links(config, urls, pages),
+        "save_to_excel": stage_save_to_excel(config, urls, pages, workdir),
+    }
+    results = {}
+    try:
+        # The scraper's progress prints are part of the cost but not of the report
+        with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+            for name, fn in stages.items():
+                # Excel writes 200 rows per call; fewer rounds keep the run short
+                rounds = max(5, iterations // 10) if name == "save_to_excel" else iterations
+                results[name] = measure(fn, rounds)
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+    return results
+
+
+def print_report(report, baseline=None):
+    regressions = []
+    header = f"{'stage':<18}{'p50 ms':>10}{'p90 ms':>10}{'p99 ms':>10}{'max ms':>10}{'py peak KB':>12}"
+    for site, stages in report.items():
+        print(f"\n🏁 {site}")
+        print(header)
+        for name, r in stages.items():
+            line = f"{name:<18}{r['p50_ms']:>10.2f}{r['p90_ms']:>10.2f}{r['p99_ms']:>10.2f}{r['max_ms']:>10.2f}{r['peak_kb']:>12.1f}"
+            base = (baseline or {}).get(site, {}).get(name)
+            if base:
+                delta = (r["p50_ms"] - base["p50_ms"]) / base["p50_ms"] * 100 if base["p50_ms"] else 0.0
+                line += f"   {delta:+.1f}% vs baseline"
+                if delta > REGRESSION_THRESHOLD:
+                    line += " ⚠️"
+                    regressions.append(f"{site}/{name}")
+            print(line)
+    return regressions
+
+
+def main_cli():
+    parser = argparse.ArgumentParser(description="Scraper hot-path benchmarks")
+    parser.add_argument("--site", action="append", help="fixture folder name (default: all)")
+    parser.add_argument("--iterations", type=int, default=50)
+    parser.add_argument("--save", help="write results as JSON (use as a later --baseline)")
+    parser.add_argument("--baseline", help="compare p50 against a saved run; exit 1 on regression")
+    args = parser.parse_args()
+
+    sites = args.site or sorted(
+        d for d in os.listdir(FIXTURES_DIR) if os.path.isdir(os.path.join(FIXTURES_DIR, d))
+    )
+    report = {site: run_site(site, args.iterations) for site in sites}
+
+    baseline = None
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            baseline = json.load(f)
+    regressions = print_report(report, baseline)
+
+    if args.save:
+        with open(args.save, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+        print(f"\n💾 Saved results to {args.save}")
+
+    if regressions:
+        print(f"\n❌ Regressions over {REGRESSION_THRESHOLD:.0f}%: {', '.join(regressions)}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main_cli()
@@ -0,0 +1,81 @@
+"""
+Cold-start cost of the long-running processes.
+
+    python benchmarks/startup.py                     # app, main, bot
+    python benchmarks/startup.py --module app --runs 10
+    python benchmarks/startup.py --top 15            # slowest imports per module
+
+Each run imports the module in a fresh interpreter and reports wall time
+and resident memory right after the import (what the process pays before
+serving its first request).
+"""
+import os
+import sys
+import json
+import argparse
+import statistics
+import subprocess
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+MODULES = ["app", "main", "bot"]
+
+PROBE = """
+import json, time
+start = time.perf_counter()
+import {module}
+elapsed = time.perf_counter() - start
+rss_kb = 0
+with open("/proc/self/status") as f:
+    for line in f:
+        if line.startswith("VmRSS:"):
+            rss_kb = int(line.split()[1])
+print(json.dumps({{"seconds": elapsed, "rss_kb": rss_kb}}))
+"""
+
+
+def measure_once(module):
+    result = subprocess.run(
+        [sys.executable, "-c", PROBE.format(module=module)],
+        cwd=ROOT, capture_output=True, text=True, check=True,
+    )
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def slowest_imports(module, top):
+    """Cumulative -X importtime entries, largest first."""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=ROOT, capture_output=True, text=True, check=True,
+    )
+    entries = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        _, cumulative, name = line.split("|")
+        try:
+            entries.append((int(cumulative), name.rstrip()))
+        except ValueError:
+            continue            # header line
+    return sorted(entries, reverse=True)[:top]
+
+
+def main_cli():
+    parser = argparse.ArgumentParser(description="Process cold-start time and RSS")
+    parser.add_argument("--module", action="append", help=f"module to import (default: {', '.join(MODULES)})")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--top", type=int, default=0, help="also list the N slowest imports")
+    args = parser.parse_args()
+
+    print(f"{'module':<10}{'import s (p50)':>16}{'min s':>10}{'RSS MB':>10}")
+    for module in args.module or MODULES:
+        runs = [measure_once(module) for _ in range(args.runs)]
+        seconds = [r["seconds"] for r in runs]
+        rss = statistics.median(r["rss_kb"] for r in runs) / 1024
+        print(f"{module:<10}{statistics.median(seconds):>16.3f}{min(seconds):>10.3f}{rss:>10.1f}")
+        if args.top:
+            for cumulative, name in slowest_imports(module, args.top):
+                print(f"    {cumulative / 1e6:>7.3f}s  {name}")
+
+
+if __name__ == "__main__":
+    main_cli()
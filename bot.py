@@ -3,7 +3,6 @@ import re
 import json
 import time
 import requests
-import pandas as pd
 
 from datetime import datetime
 from lxml import html
@@ -11,8 +10,11 @@ from dotenv import load_dotenv
 from telegram import Update
 from telegram.ext import ApplicationBuilder, CommandHandler, MessageHandler, ContextTypes, filters
 
-import undetected_chromedriver as uc
-from selenium_stealth import stealth
+from html_minimizer import minimize_html
+from transform_dsl import compile_transform, TransformError
+from readiness import wait_for_ready
+from resource_policy import enable_network_log
+from browser_worker import get_browser_client
 
 
 load_dotenv()
@@ -49,7 +51,7 @@ GPT_SCHEMA = {
 }
 
 def gpt_extract_property(html_content: str, url: str) -> dict:
-    truncated_html = html_content[:120000]
+    truncated_html = minimize_html(html_content, list(GPT_SCHEMA))
 
     system_prompt = "You are an expert in web scraping and data extraction."
 
@@ -98,8 +100,16 @@ HTML:
     except json.JSONDecodeError:
         raise ValueError(f"Invalid JSON returned by LLM:\n{content}")
 
-def get_rendered_html(url):
-    options = uc.ChromeOptions()
+def get_rendered_html(url, config=None):
+    client = get_browser_client()
+    if client:
+        # Chrome runs in the browser worker daemon, not in the bot process
+        return client.render(url, config or {})
+
+    import undetected_chromedriver as uc
+    from selenium_stealth import stealth
+
+    options = enable_network_log(uc.ChromeOptions())
     options.add_argument("--headless=new")
     options.add_argument("--no-sandbox")
     options.add_argument("--disable-gpu")
@@ -110,14 +120,14 @@ def get_rendered_html(url):
 
     try:
         driver.get(url)  
-        time.sleep(5)  
+        wait_for_ready(driver, config or {})
         html_content = driver.page_source  
         return html_content
     finally:
         driver.quit()  
 
 def parse_property(url, config):
-    html_content = get_rendered_html(url)
+    html_content = get_rendered_html(url, config)
     tree = html.fromstring(html_content)
 
     result = {"Ссылка на объект": url}  
@@ -150,8 +160,8 @@ def parse_property(url, config):
         if transform:  
             try:
                 # Use the transform rules from your prompt (normalizing whitespace)
-                text = eval(transform, {"re": re}, {"value": text})  
-            except:  
+                text = compile_transform(transform)(text)
+            except TransformError:
                 text = "ERROR"  
                 error_count += 1  
 
@@ -169,6 +179,8 @@ def save_to_excel(data):
     filename = datetime.now().strftime("%Y-%m-%d_%H-%M-%S") + ".xlsx"
     path = os.path.join(OUTPUT_FOLDER, filename)
 
+    import pandas as pd
+
     df = pd.DataFrame(data)  
     df.to_excel(path, index=False)  
     return filename  
@@ -0,0 +1,637 @@
+"""
+Browser worker: a separate daemon that owns the Chrome processes.
+
+    python browser_worker.py [--host 127.0.0.1] [--port 8765] [--slots 3]
+
+Each slot is a child process holding one stealth Chrome. The supervisor
+talks to it over a pipe and serves a small JSON API on localhost:
+
+    POST   /render                    {"url", "config", "options"} → {"html"}
+    POST   /sessions                  {"config"} → {"session"}      (pins a slot)
+    POST   /sessions/<id>/load        {"url", "options"} → {"html"}
+    POST   /sessions/<id>/click       {"xpath", "options"} → {"html" | null}
+    DELETE /sessions/<id>
+    GET    /health
+
+A request that runs past its timeout gets its slot killed: the worker, the
+chromedriver and every Chrome process group started from the slot's profile
+dir. Slots whose summed RSS (read from /proc) passes BROWSER_WORKER_MAX_RSS_MB
+are restarted when they go back to the pool.
+
+When BROWSER_WORKER_URL is set, main.py, bot.py and app.py render through
+get_browser_client() instead of launching Chrome in their own process.
+"""
+import os
+import sys
+import json
+import time
+import uuid
+import queue
+import shutil
+import signal
+import tempfile
+import threading
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib import request as urlrequest
+from urllib.error import HTTPError, URLError
+
+from selenium.common.exceptions import WebDriverException
+
+from driver_pool import PooledDriver, pool_key, get_driver_pool, DRIVER_MAX_PAGES, POOL_MAX_DRIVERS
+from readiness import wait_for_ready, scroll_until_stable
+from resource_policy import collect_network_stats, record_page_stats
+from tracing import span
+
+BROWSER_WORKER_URL = os.getenv("BROWSER_WORKER_URL", "").rstrip("/")
+BROWSER_WORKER_HOST = os.getenv("BROWSER_WORKER_HOST", "127.0.0.1")
+BROWSER_WORKER_PORT = int(os.getenv("BROWSER_WORKER_PORT", "8765"))
+BROWSER_WORKER_SLOTS = int(os.getenv("BROWSER_WORKER_SLOTS", str(POOL_MAX_DRIVERS)))
+# One render (Chrome launch included) may take this long before the slot is killed
+BROWSER_WORKER_TIMEOUT = float(os.getenv("BROWSER_WORKER_TIMEOUT", "120"))
+# How long a request waits for a free slot before the worker answers 503
+BROWSER_WORKER_ACQUIRE_TIMEOUT = float(os.getenv("BROWSER_WORKER_ACQUIRE_TIMEOUT", "300"))
+# Worker + chromedriver + Chrome RSS summed over processes (shared pages count
+# once per process, so this overstates real usage and errs on the safe side)
+BROWSER_WORKER_MAX_RSS_MB = int(os.getenv("BROWSER_WORKER_MAX_RSS_MB", "1500"))
+# A pagination session nobody touched for this long gives its slot back
+BROWSER_WORKER_SESSION_TTL = float(os.getenv("BROWSER_WORKER_SESSION_TTL", "300"))
+
+PAGE_SIZE = os.sysconf("SC_PAGE_SIZE")
+RENDER_OPTIONS = ("targets", "scroll", "ready_timeout", "max_scrolls", "scroll_pause")
+
+
+class BrowserWorkerError(WebDriverException):
+    """A render that failed in the worker; callers' Selenium error handling covers it."""
+
+
+# ============================================================
+# 🧭 Page operations (shared by the worker and in-process drivers)
+# ============================================================
+def load_page(driver, url, config, targets=None, scroll=None, ready_timeout=None,
+              max_scrolls=None, scroll_pause=None) -> str:
+    """Open a URL, wait until it is ready, optionally lazy-scroll; returns the page source."""
+    with span("page_load", url=url):
+        driver.get(url)
+        wait_for_ready(driver, config, targets=targets, timeout=ready_timeout)
+
+    if config.get("lazy_scroll", False) if scroll is None else scroll:
+        with span("scroll", url=url):
+            scroll_until_stable(driver, config, max_scrolls=max_scrolls, pause_cap=scroll_pause)
+    return driver.page_source
+
+
+def click_next(driver, xpath, config, targets=None, not_equal=None):
+    """
+    Click a "next page" button via JS and wait for the first card to change.
+    Returns the new page source, or None when there is no such button.
+    """
+    from selenium.webdriver.common.by import By
+    from selenium.webdriver.support.ui import WebDriverWait
+    from selenium.webdriver.support import expected_conditions as EC
+    from selenium.common.exceptions import TimeoutException
+
+    try:
+        next_btn = WebDriverWait(driver, 5).until(EC.presence_of_element_located((By.XPATH, xpath)))
+    except TimeoutException:
+        return None
+    driver.execute_script("arguments[0].scrollIntoView(true);", next_btn)
+    driver.execute_script("arguments[0].click();", next_btn)
+    print("👉 Clicked next page button via JS.")
+    # Same document: ready once the first card is a different listing
+    wait_for_ready(driver, config, targets=targets, not_equal=not_equal)
+    return driver.page_source
+
+
+# ============================================================
+# 🔀 Sessions: one pinned browser for multi-step work (pagination)
+# ============================================================
+class LocalBrowserSession:
+    """A pooled in-process driver behind the same interface as RemoteBrowserSession."""
+
+    def __init__(self, config):
+        self.config = config
+        self.pool = get_driver_pool()
+        self.pooled = self.pool.acquire(config)
+
+    def load(self, url, **options):
+        return load_page(self.pooled.driver, url, self.config, **options)
+
+    def click(self, xpath, targets=None, not_equal=None):
+        return click_next(self.pooled.driver, xpath, self.config, targets=targets, not_equal=not_equal)
+
+    def close(self, broken=False):
+        self.pool.release(self.pooled, broken=broken)
+
+
+class RemoteBrowserSession:
+    def __init__(self, client, config):
+        self.client = client
+        self.config = config
+        self.session_id = client.call("POST", "/sessions", {"config": config})["session"]
+
+    def load(self, url, **options):
+        return self.client.call(
+            "POST", f"/sessions/{self.session_id}/load", {"url": url, "options": options}
+        )["html"]
+
+    def click(self, xpath, targets=None, not_equal=None):
+        return self.client.call(
+            "POST", f"/sessions/{self.session_id}/click",
+            {"xpath": xpath, "options": {"targets": targets, "not_equal": not_equal}},
+        )["html"]
+
+    def close(self, broken=False):
+        try:
+            self.client.call("DELETE", f"/sessions/{self.session_id}", timeout=10)
+        except BrowserWorkerError as e:
+            print(f"⚠️ Could not close browser session {self.session_id}: {e}")
+
+
+@contextmanager
+def browser_session(config):
+    """The worker's session when BROWSER_WORKER_URL is set, else a pooled local driver."""
+    client = get_browser_client()
+    session = client.open_session(config) if client else LocalBrowserSession(config)
+    broken = False
+    try:
+        yield session
+    except WebDriverException:
+        broken = True
+        raise
+    finally:
+        session.close(broken=broken)
+
+
+# ============================================================
+# 📡 Client
+# ============================================================
+class BrowserWorkerClient:
+    def __init__(self, base_url=BROWSER_WORKER_URL, timeout=BROWSER_WORKER_TIMEOUT):
+        self.base_url = base_url.rstrip("/")
+        self.timeout = timeout
+
+    def render(self, url, config, **options) -> str:
+        """Rendered HTML of one page (options: targets, scroll, ready_timeout, max_scrolls, scroll_pause)."""
+        return self.call("POST", "/render", {"url": url, "config": config, "options": options})["html"]
+
+    def open_session(self, config) -> RemoteBrowserSession:
+        return RemoteBrowserSession(self, config)
+
+    def health(self) -> dict:
+        return self.call("GET", "/health", timeout=10)
+
+    def call(self, method, path, payload=None, timeout=None) -> dict:
+        data = json.dumps(payload, ensure_ascii=False, default=str).encode("utf-8") if payload is not None else None
+        req = urlrequest.Request(
+            self.base_url + path, data=data, method=method, headers={"Content-Type": "application/json"}
+        )
+        # The worker enforces the render timeout; the HTTP wait also covers queueing for a slot
+        wait = timeout or self.timeout + BROWSER_WORKER_ACQUIRE_TIMEOUT
+        try:
+            with urlrequest.urlopen(req, timeout=wait) as response:
+                body = json.loads(response.read() or b"{}")
+        except HTTPError as e:
+            try:
+                message = json.loads(e.read()).get("error")
+            except ValueError:
+                message = None
+            raise BrowserWorkerError(f"Browser worker {e.code}: {message or e.reason}") from None
+        except (URLError, OSError, ValueError) as e:
+            raise BrowserWorkerError(f"Browser worker unreachable at {self.base_url}: {e}") from None
+        if body.get("network"):
+            record_page_stats(body["network"])
+        return body
+
+
+_client = None
+_client_lock = threading.Lock()
+
+
+def get_browser_client():
+    """Client for BROWSER_WORKER_URL, or None when Chrome runs in-process."""
+    global _client
+    if not BROWSER_WORKER_URL:
+        return None
+    with _client_lock:
+        if _client is None:
+            _client = BrowserWorkerClient()
+        return _client
+
+
+# ============================================================
+# 🧮 /proc accounting
+# ============================================================
+def _scan_proc(marker):
+    """(pid, pgrp, rss_bytes, cmdline mentions marker) for every process we can read."""
+    rows = []
+    for name in os.listdir("/proc"):
+        if not name.isdigit():
+            continue
+        try:
+            with open(f"/proc/{name}/stat") as f:
+                pgrp = int(f.read().rsplit(")", 1)[1].split()[2])
+            with open(f"/proc/{name}/statm") as f:
+                rss = int(f.read().split()[1]) * PAGE_SIZE
+            with open(f"/proc/{name}/cmdline", "rb") as f:
+                mentions = marker.encode() in f.read()
+        except (OSError, ValueError, IndexError):
+            continue            # exited while we were looking
+        rows.append((int(name), pgrp, rss, mentions))
+    return rows
+
+
+def slot_processes(worker_pid, slot_dir):
+    """
+    {pid: (pgrp, rss_bytes)} of everything a slot started. undetected_chromedriver
+    launches Chrome in its own session, so besides the worker's process group
+    this takes every group whose leader runs with a profile under slot_dir.
+    """
+    rows = _scan_proc(slot_dir)
+    groups = {worker_pid} | {pgrp for _, pgrp, _, mentions in rows if mentions}
+    return {pid: (pgrp, rss) for pid, pgrp, rss, _ in rows if pgrp in groups}
+
+
+# ============================================================
+# 🧱 Worker process (one Chrome per slot)
+# ============================================================
+def _worker_main(conn, slot_dir):
+    # Own process group, profiles under slot_dir: the supervisor can find and kill all of it
+    os.setsid()
+    tempfile.tempdir = slot_dir
+    signal.signal(signal.SIGTERM, lambda *_: sys.exit(0))
+
+    pooled = None
+    try:
+        while True:
+            try:
+                message = conn.recv()
+            except (EOFError, KeyboardInterrupt):
+                break           # supervisor went away
+            op = message["op"]
+            if op == "quit":
+                break
+
+            config = message.get("config") or {}
+            options = message.get("options") or {}
+            try:
+                if pooled and op in ("render", "open") and (
+                    pooled.key != pool_key(config) or pooled.pages >= DRIVER_MAX_PAGES
+                ):
+                    pooled.quit()
+                    pooled = None
+                if pooled is None:
+                    print(f"🚀 [{os.getpid()}] Launching Chrome in browser worker...")
+                    pooled = PooledDriver(pool_key(config))
+                pooled.use_policy(config)
+
+                reply = {}
+                if op in ("render", "load"):
+                    reply["html"] = load_page(
+                        pooled.driver, message["url"], config,
+                        **{k: v for k, v in options.items() if k in RENDER_OPTIONS},
+                    )
+                elif op == "click":
+                    reply["html"] = click_next(
+                        pooled.driver, message["xpath"], config,
+                        targets=options.get("targets"), not_equal=options.get("not_equal"),
+                    )
+                if op != "open":
+                    pooled.pages += 1
+                    reply["network"] = collect_network_stats(pooled.driver)
+            except WebDriverException as e:
+                print(f"♻️ [{os.getpid()}] Chrome failed ({e.__class__.__name__}) → relaunching on next request.")
+                if pooled:
+                    pooled.quit()
+                pooled = None
+                reply = {"error": str(e).strip() or e.__class__.__name__}
+            except Exception as e:
+                reply = {"error": f"{e.__class__.__name__}: {e}"}
+            conn.send(reply)
+    finally:
+        if pooled:
+            pooled.quit()
+
+
+# ============================================================
+# 🧑‍✈️ Supervisor
+# ============================================================
+class SlotTimeout(Exception):
+    pass
+
+
+class SlotBusy(Exception):
+    pass
+
+
+class UnknownSession(Exception):
+    pass
+
+
+class BrowserSlot:
+    """One worker process and the Chrome it owns; started on first use."""
+
+    def __init__(self, index):
+        self.index = index
+        self.process = None
+        self.conn = None
+        self.dir = None
+        self.requests = 0
+        self.restarts = 0
+
+    @property
+    def running(self):
+        return self.process is not None and self.process.is_alive()
+
+    def start(self):
+        import multiprocessing
+
+        ctx = multiprocessing.get_context("spawn")
+        self.dir = tempfile.mkdtemp(prefix=f"browser_slot{self.index}_")
+        self.conn, child_conn = ctx.Pipe()
+        self.process = ctx.Process(
+            target=_worker_main, args=(child_conn, self.dir), name=f"browser-slot-{self.index}", daemon=True
+        )
+        self.process.start()
+        child_conn.close()
+        self.requests = 0
+
+    def call(self, message, timeout):
+        if not self.running:
+            self.kill("not running")        # clean up whatever a crash left behind
+            self.start()
+        try:
+            self.conn.send(message)
+            if not self.conn.poll(timeout):
+                self.kill(f"hung for more than {timeout:.0f}s")
+                raise SlotTimeout(f"Render timed out after {timeout:.0f}s")
+            reply = self.conn.recv()
+        except (EOFError, OSError):
+            self.kill("worker process died")
+            raise RuntimeError("Browser worker process died")
+        self.requests += 1
+        return reply
+
+    def rss_bytes(self):
+        if not self.running:
+            return 0
+        return sum(rss for _, rss in slot_processes(self.process.pid, self.dir).values())
+
+    def stop(self, reason, grace=10):
+        """Ask the worker to quit Chrome cleanly, then make sure nothing is left."""
+        if self.running:
+            try:
+                self.conn.send({"op": "quit"})
+                self.process.join(grace)
+            except OSError:
+                pass
+        self.kill(reason)
+
+    def kill(self, reason):
+        if self.process is None:
+            return
+        pid, slot_dir = self.process.pid, self.dir
+        verb = "stopped" if not self.process.is_alive() else "killed"
+        procs = slot_processes(pid, slot_dir)
+        for pgid in {pid} | {pgrp for pgrp, _ in procs.values()}:
+            try:
+                os.killpg(pgid, signal.SIGKILL)
+            except (ProcessLookupError, PermissionError):
+                pass
+        self.process.kill()             # in case it died before setsid()
+        self.process.join(5)
+        self.conn.close()
+        shutil.rmtree(slot_dir, ignore_errors=True)
+        print(f"🔪 Browser slot {self.index} (pid {pid}) {verb}: {reason} [{len(procs)} processes left]")
+        self.process = self.conn = self.dir = None
+        self.restarts += 1
+
+
+class BrowserSession:
+    def __init__(self, slot, config):
+        self.id = uuid.uuid4().hex[:12]
+        self.slot = slot
+        self.config = config
+        self.lock = threading.Lock()
+        self.last_used = time.monotonic()
+
+
+class BrowserWorker:
+    def __init__(self, slots=BROWSER_WORKER_SLOTS, timeout=BROWSER_WORKER_TIMEOUT,
+                 max_rss_mb=BROWSER_WORKER_MAX_RSS_MB):
+        self.slots = [BrowserSlot(i) for i in range(max(1, slots))]
+        self.timeout = timeout
+        self.max_rss = max_rss_mb * 1024 * 1024
+        self._idle = queue.LifoQueue()       # most recently used first: its Chrome is warm
+        for slot in reversed(self.slots):
+            self._idle.put(slot)
+        self.sessions = {}
+        self._lock = threading.Lock()
+        self._closed = threading.Event()
+
+    # ---------------- slots ----------------
+    def _checkout(self):
+        try:
+            return self._idle.get(timeout=BROWSER_WORKER_ACQUIRE_TIMEOUT)
+        except queue.Empty:
+            raise SlotBusy("All browser slots are busy") from None
+
+    def _checkin(self, slot):
+        rss = slot.rss_bytes()
+        if rss > self.max_rss:
+            slot.stop(f"RSS {rss / 1e6:.0f} MB over the {self.max_rss / 1e6:.0f} MB limit")
+        self._idle.put(slot)
+
+    def _request(self, slot, message, timeout=None):
+        reply = slot.call(message, timeout or self.timeout)
+        if "error" in reply:
+            raise RuntimeError(reply["error"])
+        return reply
+
+    # ---------------- API ----------------
+    def render(self, url, config, options):
+        slot = self._checkout()
+        try:
+            return self._request(slot, {"op": "render", "url": url, "config": config, "options": options},
+                                 options.get("timeout"))
+        finally:
+            self._checkin(slot)
+
+    def open_session(self, config):
+        slot = self._checkout()
+        try:
+            self._request(slot, {"op": "open", "config": config})
+        except BaseException:
+            self._checkin(slot)
+            raise
+        session = BrowserSession(slot, config)
+        with self._lock:
+            self.sessions[session.id] = session
+        return {"session": session.id}
+
+    def session_call(self, session_id, message):
+        with self._lock:
+            session = self.sessions.get(session_id)
+        if session is None:
+            raise UnknownSession(f"No browser session {session_id}")
+        with session.lock:
+            # Closed (reaped, timed out, deleted) while we waited for the lock
+            if not self._registered(session):
+                raise UnknownSession(f"No browser session {session_id}")
+            session.last_used = time.monotonic()
+            try:
+                return self._request(session.slot, {**message, "config": session.config},
+                                     (message.get("options") or {}).get("timeout"))
+            except SlotTimeout:
+                # The browser behind the session is gone
+                self._drop(session)
+                raise
+
+    def close_session(self, session_id):
+        with self._lock:
+            session = self.sessions.get(session_id)
+        if session is None:
+            return {"closed": False}
+        with session.lock:
+            return {"closed": self._drop(session)}
+
+    def _registered(self, session):
+        with self._lock:
+            return self.sessions.get(session.id) is session
+
+    def _drop(self, session):
+        """Unregister a session and give its slot back; the caller holds session.lock."""
+        with self._lock:
+            if self.sessions.get(session.id) is not session:
+                return False
+            del self.sessions[session.id]
+        self._checkin(session.slot)
+        return True
+
+    def reap_sessions(self):
+        while not self._closed.wait(30):
+            with self._lock:
+                sessions = list(self.sessions.values())
+            for session in sessions:
+                # A session in the middle of a request is not idle, whatever last_used says
+                if not session.lock.acquire(blocking=False):
+                    continue
+                try:
+                    idle = time.monotonic() - session.last_used
+                    if idle > BROWSER_WORKER_SESSION_TTL and self._drop(session):
+                        print(f"⌛ Browser session {session.id} idle for {idle:.0f}s → slot released.")
+                finally:
+                    session.lock.release()
+
+    def health(self):
+        with self._lock:
+            pinned = {s.slot.index for s in self.sessions.values()}
+        return {
+            "slots": [{
+                "slot": slot.index,
+                "pid": slot.process.pid if slot.running else None,
+                "rss_mb": round(slot.rss_bytes() / 1e6, 1),
+                "requests": slot.requests,
+                "restarts": slot.restarts,
+                "session": slot.index in pinned,
+            } for slot in self.slots],
+            "idle": self._idle.qsize(),
+            "sessions": len(pinned),
+        }
+
+    def shutdown(self):
+        self._closed.set()
+        for slot in self.slots:
+            slot.stop("shutdown", grace=5)
+
+
+# ============================================================
+# 🌐 HTTP front
+# ============================================================
+class _Handler(BaseHTTPRequestHandler):
+    worker = None
+
+    def do_GET(self):
+        if self.path == "/health":
+            return self._dispatch(self.worker.health)
+        self._reply(404, {"error": f"Unknown path {self.path}"})
+
+    def do_POST(self):
+        parts = self.path.strip("/").split("/")
+        try:
+            length = int(self.headers.get("Content-Length") or 0)
+            payload = json.loads(self.rfile.read(length) or b"{}")
+        except ValueError:
+            return self._reply(400, {"error": "Body must be JSON"})
+
+        if parts == ["render"] and payload.get("url"):
+            return self._dispatch(self.worker.render, payload["url"], payload.get("config") or {},
+                                  payload.get("options") or {})
+        if parts == ["sessions"]:
+            return self._dispatch(self.worker.open_session, payload.get("config") or {})
+        if len(parts) == 3 and parts[0] == "sessions" and parts[2] in ("load", "click"):
+            op = parts[2]
+            message = {"op": op, "options": payload.get("options") or {}}
+            if op == "load":
+                message["url"] = payload.get("url")
+            else:
+                message["xpath"] = payload.get("xpath")
+            return self._dispatch(self.worker.session_call, parts[1], message)
+        self._reply(404, {"error": f"Unknown path {self.path}"})
+
+    def do_DELETE(self):
+        parts = self.path.strip("/").split("/")
+        if len(parts) == 2 and parts[0] == "sessions":
+            return self._dispatch(self.worker.close_session, parts[1])
+        self._reply(404, {"error": f"Unknown path {self.path}"})
+
+    def _dispatch(self, func, *args):
+        try:
+            self._reply(200, func(*args))
+        except SlotTimeout as e:
+            self._reply(504, {"error": str(e)})
+        except SlotBusy as e:
+            self._reply(503, {"error": str(e)})
+        except UnknownSession as e:
+            self._reply(404, {"error": str(e)})
+        except Exception as e:
+            self._reply(502, {"error": str(e)})
+
+    def _reply(self, code, body):
+        data = json.dumps(body, ensure_ascii=False).encode("utf-8")
+        self.send_response(code)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, fmt, *args):
+        pass                    # slot kills and recycles are logged; requests are not
+
+
+def serve(host=BROWSER_WORKER_HOST, port=BROWSER_WORKER_PORT, slots=BROWSER_WORKER_SLOTS):
+    worker = _Handler.worker = BrowserWorker(slots=slots)
+    server = ThreadingHTTPServer((host, port), _Handler)
+    server.daemon_threads = True
+    threading.Thread(target=worker.reap_sessions, name="session-reaper", daemon=True).start()
+    signal.signal(signal.SIGTERM, lambda *_: sys.exit(0))
+    print(f"🧑‍✈️ Browser worker on http://{host}:{port} ({len(worker.slots)} slots, "
+          f"{BROWSER_WORKER_TIMEOUT:.0f}s timeout, {BROWSER_WORKER_MAX_RSS_MB} MB RSS cap)")
+    try:
+        server.serve_forever()
+    except (KeyboardInterrupt, SystemExit):
+        pass
+    finally:
+        server.server_close()
+        worker.shutdown()
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Browser worker daemon")
+    parser.add_argument("--host", default=BROWSER_WORKER_HOST)
+    parser.add_argument("--port", type=int, default=BROWSER_WORKER_PORT)
+    parser.add_argument("--slots", type=int, default=BROWSER_WORKER_SLOTS)
+    args = parser.parse_args()
+    serve(args.host, args.port, args.slots)
@@ -0,0 +1,81 @@
+import json
+import hashlib
+import threading
+
+from lxml import etree
+
+from transform_dsl import compile_transform, TransformError
+
+
+def config_version(config) -> str:
+    """Content hash of a config; changes whenever the admin panel edits it."""
+    raw = json.dumps(config, sort_keys=True, ensure_ascii=False)
+    return hashlib.sha1(raw.encode("utf-8")).hexdigest()
+
+
+class CompiledField:
+    def __init__(self, name, field_data):
+        self.name = name
+        self.xpath_source = field_data.get("xpath")
+        self.transform_source = field_data.get("transform")
+        self.xpath = None
+        self.transform = None
+
+        if self.xpath_source:
+            try:
+                self.xpath = etree.XPath(self.xpath_source)
+            except etree.XPathSyntaxError as e:
+                print(f"⚠️ Invalid XPath for '{name}': {e}")
+
+        self.transform_error = None
+        if self.transform_source:
+            try:
+                self.transform = compile_transform(self.transform_source)
+            except TransformError as e:
+                # The field is reported as failed rather than passing raw text through
+                self.transform_error = str(e)
+                print(f"⚠️ Transform for '{name}' is not valid: {e}")
+
+
+class CompiledConfig:
+    def __init__(self, config, version):
+        self.version = version
+        self.fields = [
+            CompiledField(name, data or {}) for name, data in config.get("fields", {}).items()
+        ]
+
+
+# lxml XPath objects must not be shared between threads, so every worker
+# thread keeps its own compiled copy: config_id → (version, CompiledConfig)
+_local = threading.local()
+_generation = 0
+_generation_lock = threading.Lock()
+
+
+def _thread_cache():
+    if getattr(_local, "generation", None) != _generation:
+        _local.cache = {}
+        _local.generation = _generation
+    return _local.cache
+
+
+def get_compiled_config(config, config_id=None, version=None) -> CompiledConfig:
+    """XPaths and transform closures for a config, compiled once per (id, version)."""
+    version = version or config_version(config)
+    config_id = config_id or version
+    cache = _thread_cache()
+
+    entry = cache.get(config_id)
+    if entry and entry[0] == version:
+        return entry[1]
+
+    compiled = CompiledConfig(config, version)
+    cache[config_id] = (version, compiled)
+    return compiled
+
+
+def invalidate_compiled():
+    """Drop compiled configs in every thread; each recompiles on its next lookup."""
+    global _generation
+    with _generation_lock:
+        _generation += 1
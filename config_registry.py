@@ -0,0 +1,101 @@
+import json
+import threading
+from urllib.parse import urlparse
+
+from database import DB_PATH, connect
+
+
+def normalize_domain(value: str) -> str:
+    """
+    'https://www.JamesEdition.com/real_estate' → 'jamesedition.com'
+    Works for bare hosts ('properstar.ru') as well as full URLs.
+    """
+    value = (value or "").strip().lower()
+    if "://" not in value:
+        value = "http://" + value
+    host = urlparse(value).hostname or ""
+    host = host.rstrip(".")
+    return host[4:] if host.startswith("www.") else host
+
+
+# ============================================================
+# 📚 Process-wide config registry
+# ============================================================
+class ConfigRegistry:
+    """
+    All website configs loaded once and indexed by normalized domain.
+    A lookup walks the URL's host suffixes (a.b.site.com → b.site.com →
+    site.com), so it costs a few dict hits regardless of how many configs
+    exist and never matches a config name that merely occurs in the URL.
+    """
+
+    def __init__(self, db_path: str = DB_PATH):
+        # Own connection: PRAGMA data_version is only comparable on the same connection
+        self._conn = connect(db_path, check_same_thread=False)
+        self._lock = threading.Lock()
+        self._data_version = None
+        self._rows = {}        # id → (website, raw_json, config)
+        self._by_domain = {}   # normalized domain → (website, config)
+
+    def lookup(self, url: str):
+        """(website, config) for the config that owns the URL's host, else (None, None)."""
+        with self._lock:
+            self._refresh_if_changed()
+            labels = normalize_domain(url).split(".")
+            # Never fall through to a bare TLD such as "ru"
+            for i in range(max(len(labels) - 1, 1)):
+                hit = self._by_domain.get(".".join(labels[i:]))
+                if hit:
+                    return hit
+        return None, None
+
+    def reload(self):
+        with self._lock:
+            self._data_version = None
+            self._refresh_if_changed()
+
+    def _refresh_if_changed(self):
+        # data_version changes whenever another connection commits to the DB
+        version = self._conn.execute("PRAGMA data_version").fetchone()[0]
+        if version == self._data_version:
+            return
+        self._data_version = version
+
+        rows = self._conn.execute("SELECT id, website, config_json FROM configs ORDER BY id").fetchall()
+        fresh = {}
+        for row_id, website, raw_json in rows:
+            cached = self._rows.get(row_id)
+            if cached and cached[0] == website and cached[1] == raw_json:
+                fresh[row_id] = cached
+                continue
+            try:
+                fresh[row_id] = (website, raw_json, json.loads(raw_json))
+            except (TypeError, ValueError):
+                print(f"⚠️ Skipping config #{row_id} ({website}): invalid JSON")
+
+        by_domain = {}
+        for website, _, config in fresh.values():
+            domain = normalize_domain(website)
+            if domain:
+                # Later rows win, like the most recent edit in the panel
+                by_domain[domain] = (website, config)
+
+        changed = len(fresh.keys() ^ self._rows.keys()) + sum(
+            1 for k in fresh if k in self._rows and fresh[k] is not self._rows[k]
+        )
+        self._rows = fresh
+        self._by_domain = by_domain
+        if changed:
+            print(f"🔄 Config registry refreshed: {len(by_domain)} domains ({changed} changed).")
+
+
+_registry = None
+_registry_lock = threading.Lock()
+
+
+def get_config_registry() -> ConfigRegistry:
+    global _registry
+    with _registry_lock:
+        if _registry is None:
+            _registry = ConfigRegistry()
+        return _registry
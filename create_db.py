@@ -1,16 +1,5 @@
-import sqlite3
-import json
-from config import WEBSITE_CONFIGS  # your config file
+from database import DB_PATH, MIGRATIONS, init_schema
 
-# 1️⃣ Connect to SQLite (or create it)
-conn = sqlite3.connect("website_configs.db")
-cursor = conn.cursor()
-
-# 2️⃣ Create table
-cursor.execute("""
-CREATE TABLE IF NOT EXISTS configs (
-    id INTEGER PRIMARY KEY AUTOINCREMENT,
-    website TEXT UNIQUE,
-    config_json TEXT
-)
-""")
\ No newline at end of file
+# Creates the database (or upgrades an old one) with every table the app uses
+version = init_schema()
+print(f"✅ {DB_PATH} ready — schema v{version} of {len(MIGRATIONS)}")
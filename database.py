@@ -0,0 +1,263 @@
+import os
+import sqlite3
+import threading
+from contextlib import contextmanager
+
+DB_PATH = os.getenv("DB_PATH", "website_configs.db")
+
+# Connections handed back by finished requests/tasks, kept for the next thread (per DB file)
+POOL_IDLE_MAX = int(os.getenv("DB_POOL_IDLE", "8"))
+
+# A writer waits this long for another writer instead of failing with "database is locked"
+BUSY_TIMEOUT_MS = int(os.getenv("DB_BUSY_TIMEOUT_MS", "10000"))
+
+PRAGMAS = (
+    f"PRAGMA busy_timeout = {BUSY_TIMEOUT_MS}",
+    # Readers never block the writer and vice versa (panel + bot + job workers)
+    "PRAGMA journal_mode = WAL",
+    # Durable at checkpoints; with WAL a crash can lose only the last commits, never corrupt
+    "PRAGMA synchronous = NORMAL",
+    "PRAGMA foreign_keys = ON",
+    "PRAGMA temp_store = MEMORY",
+    "PRAGMA cache_size = -16000",        # KiB → 16 MB page cache per connection
+)
+
+
+# ============================================================
+# 🧱 Schema migrations (PRAGMA user_version = number applied)
+# ============================================================
+def _baseline(conn):
+    conn.execute("""
+    CREATE TABLE IF NOT EXISTS configs (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        website TEXT UNIQUE,
+        config_json TEXT
+    )
+    """)
+    conn.execute("""
+    CREATE TABLE IF NOT EXISTS fetch_modes (
+        domain TEXT PRIMARY KEY,
+        mode TEXT NOT NULL,
+        updated_at TEXT DEFAULT CURRENT_TIMESTAMP
+    )
+    """)
+    conn.execute("""
+    CREATE TABLE IF NOT EXISTS listings (
+        url TEXT PRIMARY KEY,
+        fingerprint TEXT,
+        etag TEXT,
+        last_modified TEXT,
+        record_json TEXT,
+        updated_at TEXT DEFAULT CURRENT_TIMESTAMP
+    )
+    """)
+    conn.execute("""
+    CREATE TABLE IF NOT EXISTS list_members (
+        list_url TEXT NOT NULL,
+        url TEXT NOT NULL,
+        PRIMARY KEY (list_url, url)
+    )
+    """)
+    conn.execute("""
+    CREATE TABLE IF NOT EXISTS images (
+        url TEXT PRIMARY KEY,
+        sha256 TEXT NOT NULL,
+        path TEXT NOT NULL,
+        bytes INTEGER,
+        fetched_at TEXT DEFAULT CURRENT_TIMESTAMP
+    )
+    """)
+
+
+def _unique_websites(conn):
+    """
+    The admin panel used to create configs without UNIQUE(website). Rebuild
+    such tables, keeping the newest row per website (the one lookups used).
+    """
+    unique = any(
+        index["unique"] and [col["name"] for col in conn.execute(f"PRAGMA index_info('{index['name']}')")] == ["website"]
+        for index in conn.execute("PRAGMA index_list('configs')")
+    )
+    if unique:
+        return
+    conn.execute("""
+    CREATE TABLE configs_new (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        website TEXT UNIQUE,
+        config_json TEXT
+    )
+    """)
+    conn.execute("""
+    INSERT INTO configs_new (id, website, config_json)
+    SELECT id, website, config_json FROM configs
+    WHERE id IN (SELECT MAX(id) FROM configs GROUP BY website)
+    """)
+    conn.execute("DROP TABLE configs")
+    conn.execute("ALTER TABLE configs_new RENAME TO configs")
+
+
+def _results(conn):
+    """Scrape jobs and every property they extracted (Excel files are exports of these)."""
+    conn.execute("""
+    CREATE TABLE scrape_jobs (
+        job_id TEXT PRIMARY KEY,
+        source_url TEXT NOT NULL,
+        domain TEXT NOT NULL,
+        excel_file TEXT,
+        started_at TEXT DEFAULT CURRENT_TIMESTAMP,
+        finished_at TEXT
+    )
+    """)
+    conn.execute("""
+    CREATE TABLE results (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        job_id TEXT NOT NULL REFERENCES scrape_jobs(job_id) ON DELETE CASCADE,
+        domain TEXT NOT NULL,
+        url TEXT NOT NULL,
+        title TEXT,
+        price REAL,
+        currency TEXT,
+        area_m2 REAL,
+        land_area_m2 REAL,
+        status TEXT,
+        error_fields INTEGER NOT NULL DEFAULT 0,
+        record_json TEXT NOT NULL,
+        scraped_at TEXT DEFAULT CURRENT_TIMESTAMP,
+        UNIQUE (job_id, url)
+    )
+    """)
+    conn.execute("CREATE INDEX idx_results_url ON results (url, scraped_at)")
+    conn.execute("CREATE INDEX idx_results_domain ON results (domain, scraped_at)")
+    conn.execute("CREATE INDEX idx_scrape_jobs_domain ON scrape_jobs (domain, started_at)")
+
+
+def _field_status(conn):
+    """Per-field extraction status of each result row: {"Цена": "xpath", "Телефон": "missing", …}."""
+    conn.execute("ALTER TABLE results ADD COLUMN field_status TEXT")
+
+
+# Append only: position + 1 is the schema version the step produces
+MIGRATIONS = [
+    _baseline,
+    _unique_websites,
+    _results,
+    _field_status,
+]
+
+
+def migrate(conn) -> int:
+    """Apply pending migrations in one write transaction; returns the schema version."""
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        version = conn.execute("PRAGMA user_version").fetchone()[0]
+        for number, step in enumerate(MIGRATIONS[version:], start=version + 1):
+            step(conn)
+            conn.execute(f"PRAGMA user_version = {number}")
+            print(f"🧱 DB schema migrated to v{number} ({step.__name__.strip('_')})")
+    except BaseException:
+        conn.rollback()
+        raise
+    conn.commit()
+    return max(version, len(MIGRATIONS))
+
+
+# ============================================================
+# 🔌 Connections
+# ============================================================
+_migrated = set()
+_migrate_lock = threading.Lock()
+_local = threading.local()
+_idle = {}              # db_path → connections no thread currently owns
+_idle_lock = threading.Lock()
+
+
+def connect(db_path: str = DB_PATH, check_same_thread: bool = True) -> sqlite3.Connection:
+    """
+    New connection with the pragmas applied and the schema up to date.
+    Autocommit mode: single statements commit on their own, multi-statement
+    writes go through transaction().
+    """
+    conn = sqlite3.connect(
+        db_path, timeout=BUSY_TIMEOUT_MS / 1000, isolation_level=None, check_same_thread=check_same_thread
+    )
+    conn.row_factory = sqlite3.Row
+    for pragma in PRAGMAS:
+        conn.execute(pragma)
+    with _migrate_lock:
+        key = os.path.abspath(db_path)
+        if key not in _migrated:
+            migrate(conn)
+            _migrated.add(key)
+    return conn
+
+
+def get_connection(db_path: str = DB_PATH) -> sqlite3.Connection:
+    """
+    This thread's connection to db_path. Taken from the shared idle pool (or
+    opened) on first use and owned by the thread until release_connections().
+    """
+    pool = getattr(_local, "connections", None)
+    if pool is None:
+        pool = _local.connections = {}
+    conn = pool.get(db_path)
+    if conn is None:
+        with _idle_lock:
+            idle = _idle.get(db_path)
+            conn = idle.pop() if idle else None
+        if conn is None:
+            # Moves between threads through the pool, but only one thread owns it at a time
+            conn = connect(db_path, check_same_thread=False)
+        pool[db_path] = conn
+    return conn
+
+
+def release_connections():
+    """
+    Hand this thread's connections back to the idle pool. Call it where
+    short-lived threads finish their work (Flask request teardown, executor
+    tasks) so each new thread does not open and configure its own.
+    """
+    pool = getattr(_local, "connections", None)
+    if not pool:
+        return
+    for db_path, conn in pool.items():
+        if conn.in_transaction:
+            conn.rollback()
+        with _idle_lock:
+            idle = _idle.setdefault(db_path, [])
+            if len(idle) < POOL_IDLE_MAX:
+                idle.append(conn)
+                conn = None
+        if conn is not None:
+            conn.close()
+    pool.clear()
+
+
+def run_released(fn, *args):
+    """fn(*args), then release_connections(): for tasks on short-lived executor threads."""
+    try:
+        return fn(*args)
+    finally:
+        release_connections()
+
+
+@contextmanager
+def transaction(db_path: str = DB_PATH):
+    """
+    Write transaction on this thread's connection. BEGIN IMMEDIATE takes the
+    write lock up front, so a read-then-write waits for busy_timeout instead
+    of failing when another writer got there first.
+    """
+    conn = get_connection(db_path)
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        yield conn
+    except BaseException:
+        conn.rollback()
+        raise
+    conn.commit()
+
+
+def init_schema(db_path: str = DB_PATH) -> int:
+    """Create/upgrade the database; returns the schema version."""
+    return get_connection(db_path).execute("PRAGMA user_version").fetchone()[0]
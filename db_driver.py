@@ -1,37 +1,45 @@
 import sqlite3
 import json
-from typing import Optional, Dict, Any
+from typing import Optional, Dict, Any, List
 
-DB_PATH = "website_configs.db"  # Path to your existing SQLite database
+from database import DB_PATH, get_connection
 
 
 class ConfigDBDriver:
     def __init__(self, db_path: str = DB_PATH):
-        """Initialize the database connection."""
-        self.conn = sqlite3.connect(db_path)
-        self.conn.row_factory = sqlite3.Row  # Enables dict-like access
+        """Use this thread's pooled connection (schema is migrated on first connect)."""
+        self.conn = get_connection(db_path)
         self.cursor = self.conn.cursor()
 
-        # Ensure table exists
-        self.cursor.execute("""
-        CREATE TABLE IF NOT EXISTS configs (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            website TEXT UNIQUE,
-            config_json TEXT
-        )
-        """)
-        self.conn.commit()
-
     def insert_config(self, website: str, config: Dict[str, Any]):
         """Insert or replace a website config."""
-        json_data = json.dumps(config, ensure_ascii=False)
-        self.cursor.execute("""
-            INSERT OR REPLACE INTO configs (website, config_json)
-            VALUES (?, ?)
-        """, (website, json_data))
-        self.conn.commit()
+        self.save_config_json(website, json.dumps(config, ensure_ascii=False))
         print(f"✅ Config saved for: {website}")
 
+    def save_config_json(self, website: str, config_json: str, config_id: Optional[int] = None,
+                         replace: bool = True) -> int:
+        """
+        Store raw config JSON (as typed in the panel). With config_id the row is
+        updated in place; otherwise the website's row is created, or replaced
+        (keeping its id) when `replace` is set. Raises sqlite3.IntegrityError
+        if another row already owns `website`.
+        """
+        if config_id:
+            self.cursor.execute(
+                "UPDATE configs SET website = ?, config_json = ? WHERE id = ?",
+                (website, config_json, config_id),
+            )
+            return config_id
+        if not replace:
+            self.cursor.execute("INSERT INTO configs (website, config_json) VALUES (?, ?)", (website, config_json))
+            return self.cursor.lastrowid
+        self.cursor.execute("""
+            INSERT INTO configs (website, config_json) VALUES (?, ?)
+            ON CONFLICT(website) DO UPDATE SET config_json = excluded.config_json
+        """, (website, config_json))
+        row = self.cursor.execute("SELECT id FROM configs WHERE website = ?", (website,)).fetchone()
+        return row["id"]
+
     def get_config(self, website: str) -> Optional[Dict[str, Any]]:
         """Fetch configuration by website name."""
         self.cursor.execute("SELECT config_json FROM configs WHERE website = ?", (website,))
@@ -41,6 +49,16 @@ class ConfigDBDriver:
         print(f"⚠️ No config found for website: {website}")
         return None
 
+    def get_config_row(self, config_id: int) -> Optional[sqlite3.Row]:
+        """(id, website, config_json) row by id."""
+        self.cursor.execute("SELECT id, website, config_json FROM configs WHERE id = ?", (config_id,))
+        return self.cursor.fetchone()
+
+    def config_rows(self) -> List[sqlite3.Row]:
+        """All (id, website, config_json) rows, oldest first."""
+        self.cursor.execute("SELECT id, website, config_json FROM configs ORDER BY id")
+        return self.cursor.fetchall()
+
     def list_configs(self):
         """List all website configs."""
         self.cursor.execute("SELECT id, website, config_json FROM configs")
@@ -54,13 +72,28 @@ class ConfigDBDriver:
     def delete_config(self, website: str):
         """Delete config by website."""
         self.cursor.execute("DELETE FROM configs WHERE website = ?", (website,))
-        self.conn.commit()
         print(f"🗑️ Deleted config for: {website}")
 
+    def delete_config_by_id(self, config_id: int):
+        """Delete config by id (the panel's key)."""
+        self.cursor.execute("DELETE FROM configs WHERE id = ?", (config_id,))
+
+    def get_fetch_mode(self, domain: str) -> Optional[str]:
+        """Fetch path ("http" or "browser") last known to work for a domain."""
+        self.cursor.execute("SELECT mode FROM fetch_modes WHERE domain = ?", (domain,))
+        row = self.cursor.fetchone()
+        return row["mode"] if row else None
+
+    def set_fetch_mode(self, domain: str, mode: str):
+        """Remember which fetch path works for a domain."""
+        self.cursor.execute("""
+            INSERT OR REPLACE INTO fetch_modes (domain, mode, updated_at)
+            VALUES (?, ?, CURRENT_TIMESTAMP)
+        """, (domain, mode))
+
     def close(self):
-        """Close the database connection."""
-        self.conn.close()
-        print("🔒 Connection closed.")
+        """Release the cursor; the pooled connection stays open for this thread."""
+        self.cursor.close()
 
 
 # -------------------------------
@@ -0,0 +1,235 @@
+import os
+import shutil
+import tempfile
+import threading
+import time
+import atexit
+from contextlib import contextmanager
+
+from selenium.common.exceptions import WebDriverException
+
+from resource_policy import resolve_policy, apply_resource_policy, enable_network_log, collect_network_stats
+from tracing import span
+
+DEFAULT_USER_AGENT = (
+    "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 "
+    "(KHTML, like Gecko) Chrome/140.0.0.0 Safari/537.36"
+)
+
+# A list page keeps one driver busy for pagination while detail pages need
+# another, so the pool never goes below two drivers.
+POOL_MAX_DRIVERS = max(2, int(os.getenv("DRIVER_POOL_SIZE", "3")))
+DRIVER_MAX_PAGES = int(os.getenv("DRIVER_MAX_PAGES", "50"))
+POOL_ACQUIRE_TIMEOUT = int(os.getenv("DRIVER_ACQUIRE_TIMEOUT", "300"))
+
+
+# ============================================================
+# 🧱 Driver factory
+# ============================================================
+def pool_key(config):
+    """Drivers are interchangeable only if they were launched with the same settings."""
+    return (
+        bool(config.get("headless", True)),
+        config.get("user_agent", DEFAULT_USER_AGENT),
+    )
+
+
+def build_chrome_options(headless=True, user_agent=DEFAULT_USER_AGENT, profile_dir=None):
+    # undetected_chromedriver (and selenium's webdriver) load only once a browser is needed
+    import undetected_chromedriver as uc
+
+    options = uc.ChromeOptions()
+    if headless:
+        options.add_argument("--headless=new")
+    options.add_argument("--no-sandbox")
+    options.add_argument("--disable-dev-shm-usage")
+    options.add_argument("--disable-gpu")
+    options.add_argument("--window-size=1920,1080")
+
+    # Set realistic User-Agent
+    options.add_argument(f"--user-agent={user_agent}")
+
+    # Unique profile per driver to avoid session conflicts
+    if profile_dir:
+        options.add_argument(f"--user-data-dir={profile_dir}")
+    return enable_network_log(options)
+
+
+def apply_stealth(driver):
+    from selenium_stealth import stealth
+
+    stealth(driver,
+            languages=["en-US", "en"],
+            vendor="Google Inc.",
+            platform="Win32",
+            webgl_vendor="Intel Inc.",
+            renderer="Intel Iris OpenGL Engine",
+            fix_hairline=True,
+            )
+
+
+class PooledDriver:
+    """A warmed-up stealth Chrome plus the bookkeeping the pool needs."""
+
+    def __init__(self, key):
+        self.key = key
+        self.pages = 0
+        self.created_at = time.time()
+        self.blocked_urls = None   # resource policy currently installed
+        self.profile_dir = tempfile.mkdtemp(prefix="chrome_profile_")
+
+        import undetected_chromedriver as uc
+
+        headless, user_agent = key
+        options = build_chrome_options(headless, user_agent, self.profile_dir)
+        try:
+            with span("chrome_start"):
+                self.driver = uc.Chrome(options=options)
+                apply_stealth(self.driver)
+        except Exception:
+            shutil.rmtree(self.profile_dir, ignore_errors=True)
+            raise
+
+    def use_policy(self, config):
+        """Switch the blocked-URL list only when the site's policy differs."""
+        patterns = resolve_policy(config)
+        if patterns != self.blocked_urls and apply_resource_policy(self.driver, patterns):
+            self.blocked_urls = patterns
+
+    def is_alive(self):
+        try:
+            self.driver.execute_script("return 1")
+            return True
+        except Exception:
+            return False
+
+    def quit(self):
+        try:
+            self.driver.quit()
+        except Exception:
+            pass
+        shutil.rmtree(self.profile_dir, ignore_errors=True)
+
+
+# ============================================================
+# ♻️ Driver Pool
+# ============================================================
+class DriverPool:
+    def __init__(self, max_drivers: int = POOL_MAX_DRIVERS, max_pages: int = DRIVER_MAX_PAGES):
+        self.max_drivers = max_drivers
+        self.max_pages = max_pages
+        self._idle = []      # PooledDriver objects ready for checkout
+        self._total = 0      # idle + checked out
+        self._closed = False
+        self._cond = threading.Condition()
+
+    def acquire(self, config, timeout: float = POOL_ACQUIRE_TIMEOUT) -> PooledDriver:
+        """Check out a healthy driver matching the config, launching one if needed."""
+        key = pool_key(config)
+        deadline = time.time() + timeout
+
+        while True:
+            stale = None
+            with self._cond:
+                if self._closed:
+                    raise RuntimeError("Driver pool is shut down")
+
+                candidate = self._pop_idle(key)
+                if candidate is None and self._total >= self.max_drivers and self._idle:
+                    # Pool is full of drivers for other settings: retire the oldest idle one
+                    stale = self._idle.pop(0)
+                    self._total -= 1
+
+                if candidate is None and stale is None and self._total >= self.max_drivers:
+                    remaining = deadline - time.time()
+                    if remaining <= 0:
+                        raise TimeoutError("Timed out waiting for a free Chrome driver")
+                    self._cond.wait(remaining)
+                    continue
+
+                if candidate is None:
+                    self._total += 1
+
+            if stale:
+                stale.quit()
+
+            if candidate is not None:
+                if candidate.is_alive():
+                    candidate.use_policy(config)
+                    return candidate
+                print("♻️ Idle driver failed health check → recycling.")
+                self._discard(candidate)
+                continue
+
+            try:
+                print("🚀 Launching new Chrome driver for pool...")
+                pooled = PooledDriver(key)
+                pooled.use_policy(config)
+                return pooled
+            except Exception:
+                with self._cond:
+                    self._total -= 1
+                    self._cond.notify()
+                raise
+
+    def release(self, pooled: PooledDriver, broken: bool = False):
+        """Return a driver to the pool, recycling it if it crashed or is worn out."""
+        pooled.pages += 1
+        if not broken:
+            collect_network_stats(pooled.driver)
+        if broken or self._closed or pooled.pages >= self.max_pages:
+            reason = "crashed" if broken else "page limit reached"
+            print(f"♻️ Recycling Chrome driver ({reason}, {pooled.pages} pages).")
+            self._discard(pooled)
+            return
+
+        with self._cond:
+            self._idle.append(pooled)
+            self._cond.notify()
+
+    @contextmanager
+    def checkout(self, config):
+        pooled = self.acquire(config)
+        broken = False
+        try:
+            yield pooled.driver
+        except WebDriverException:
+            broken = True
+            raise
+        finally:
+            self.release(pooled, broken=broken)
+
+    def shutdown(self):
+        with self._cond:
+            self._closed = True
+            idle, self._idle = self._idle, []
+            self._total -= len(idle)
+            self._cond.notify_all()
+        for pooled in idle:
+            pooled.quit()
+
+    def _pop_idle(self, key):
+        for i, pooled in enumerate(self._idle):
+            if pooled.key == key:
+                return self._idle.pop(i)
+        return None
+
+    def _discard(self, pooled: PooledDriver):
+        pooled.quit()
+        with self._cond:
+            self._total -= 1
+            self._cond.notify()
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_driver_pool() -> DriverPool:
+    """Process-wide driver pool, created on first use."""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = DriverPool()
+            atexit.register(_pool.shutdown)
+        return _pool
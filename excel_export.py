@@ -0,0 +1,102 @@
+import os
+from functools import lru_cache
+
+# ✅ Desired column order (Russian)
+COLUMNS = [
+    "Ссылка на объект", "Название", "Цена", "Валюта", "Площадь", "Площадь земли",
+    "Тип объекта", "Год постройки", "Количество комнат", "Описание", "Инфраструктура",
+    "С/у", "Этаж", "Локация", "Координаты", "Фото_ссылки", "Фото_уникальные_названия",
+    "Контактное лицо", "Телефон контактного лица", "Компания", "Телефон компании"
+]
+
+# Added by incremental listing runs: новый / изменён / без изменений / удалён
+STATUS_COLUMN = "Статус"
+
+ERROR_COLOR = "FFFF0000"
+STATUS_COLORS = {
+    "новый": "FFC6EFCE",
+    "изменён": "FFFFEB9C",
+    "удалён": "FFD9D9D9",
+}
+
+
+@lru_cache(maxsize=1)
+def _fills():
+    """
+    (error fill, {status: fill}). Shared style objects: openpyxl stores each
+    once instead of per cell. Built on first use so importing this module
+    does not pull in openpyxl.
+    """
+    from openpyxl.styles import PatternFill
+
+    def solid(color):
+        return PatternFill(start_color=color, end_color=color, fill_type="solid")
+    return solid(ERROR_COLOR), {status: solid(color) for status, color in STATUS_COLORS.items()}
+
+
+# ============================================================
+# 💾 Streaming Excel Writer
+# ============================================================
+class ExcelStreamWriter:
+    """
+    Write-only workbook that rows are appended to as properties are scraped.
+    Rows are serialized immediately instead of being kept as cell objects,
+    and the file is written on close() even if the scrape stopped half way.
+    """
+
+    def __init__(self, file_path, columns=COLUMNS):
+        os.makedirs(os.path.dirname(file_path) or ".", exist_ok=True)
+        self.file_path = file_path
+        self.columns = columns
+        self.rows = 0
+        self.closed = False
+
+        from openpyxl import Workbook
+        from openpyxl.cell import WriteOnlyCell
+
+        self._cell = WriteOnlyCell
+        self.error_fill, self.status_fills = _fills()
+        self.wb = Workbook(write_only=True)
+        self.ws = self.wb.create_sheet("Sheet")
+        self.ws.append(columns)
+
+    def append(self, prop: dict):
+        row = []
+        for col in self.columns:
+            # A missing status just means the row did not come from an incremental run
+            value = prop.get(col, "" if col == STATUS_COLUMN else "ERROR")
+
+            # ✅ If value is a list, join it into a string
+            if isinstance(value, list):
+                value = ";".join([str(v) for v in value])
+
+            # ✅ If value is None, replace with empty string
+            if value is None:
+                value = ""
+
+            if value == "ERROR":
+                cell = self._cell(self.ws, value=value)
+                cell.fill = self.error_fill
+                value = cell
+            elif col == STATUS_COLUMN and value in self.status_fills:
+                cell = self._cell(self.ws, value=value)
+                cell.fill = self.status_fills[value]
+                value = cell
+            row.append(value)
+
+        self.ws.append(row)
+        self.rows += 1
+
+    def close(self):
+        if self.closed:
+            return self.file_path
+        self.closed = True
+        self.wb.save(self.file_path)
+        return self.file_path
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+        return False
@@ -0,0 +1,81 @@
+from collections import Counter
+
+# Where a field's value came from (or why there is none)
+FIELD_XPATH = "xpath"
+FIELD_STRUCTURED = "structured"          # JSON-LD / microdata / OpenGraph
+FIELD_LLM = "llm"                        # filled by the LLM fallback
+FIELD_TRANSFORM_FAILED = "transform_failed"
+FIELD_MISSING = "missing"
+
+FAILED_STATUSES = (FIELD_TRANSFORM_FAILED, FIELD_MISSING)
+
+STATUS_LABELS = {
+    FIELD_XPATH: "✅ XPath",
+    FIELD_STRUCTURED: "🧩 разметка",
+    FIELD_LLM: "🤖 LLM",
+    FIELD_TRANSFORM_FAILED: "⚠️ ошибка трансформации",
+    FIELD_MISSING: "❌ не найдено",
+}
+
+
+class ExtractionResult:
+    """
+    Outcome of parsing one property page: the record (None if the page could
+    not be loaded), the status of every configured field and the error.
+    """
+
+    def __init__(self, url, data=None, field_status=None, error=None):
+        self.url = url
+        self.data = data
+        self.field_status = field_status or {}
+        self.error = error
+
+    def set(self, field, value, status):
+        self.data[field] = value
+        self.field_status[field] = status
+
+    def failed_fields(self) -> list:
+        return [f for f, status in self.field_status.items() if status in FAILED_STATUSES]
+
+
+# ============================================================
+# 📊 Per-job aggregation
+# ============================================================
+class FieldStats:
+    """Field status counts over a job's properties."""
+
+    def __init__(self):
+        self.by_field = {}      # field → Counter(status → n)
+        self.properties = 0
+
+    def add(self, field, status, count=1):
+        self.by_field.setdefault(field, Counter())[status] += count
+
+    def totals(self) -> Counter:
+        total = Counter()
+        for counts in self.by_field.values():
+            total.update(counts)
+        return total
+
+    def failures(self) -> list:
+        """[(field, failed, seen)] for fields that failed at least once, worst first."""
+        rows = []
+        for field, counts in self.by_field.items():
+            failed = sum(counts[s] for s in FAILED_STATUSES)
+            if failed:
+                rows.append((field, failed, sum(counts.values())))
+        return sorted(rows, key=lambda r: (-r[1] / r[2], -r[1], r[0]))
+
+    def summary(self, limit=5) -> str:
+        """Bot/email text: fields by source, then the fields that fail most."""
+        if not self.by_field:
+            return ""
+        totals = self.totals()
+        parts = [f"{STATUS_LABELS[s]}: {totals[s]}" for s in STATUS_LABELS if totals[s]]
+        lines = [f"📋 Поля ({self.properties} объектов) — " + ", ".join(parts)]
+        worst = self.failures()[:limit]
+        if worst:
+            lines.append("Чаще всего не извлекаются: " + ", ".join(
+                f"{field} {failed}/{seen}" for field, failed, seen in worst
+            ))
+        return "\n".join(lines)
@@ -0,0 +1,257 @@
+import threading
+from collections import Counter
+
+import requests
+from requests.adapters import HTTPAdapter
+from lxml import html
+from lxml.etree import XPathError, ParserError
+
+from db_driver import ConfigDBDriver
+from driver_pool import DEFAULT_USER_AGENT
+from politeness import get_politeness, domain_of
+from tracing import span, current_job
+
+HTTP_TIMEOUT = 20
+# Domains remembered as "browser" are re-probed over HTTP every N fetches
+HTTP_REPROBE_EVERY = 50
+
+CHALLENGE_MARKERS = [
+    "cf-chl-", "challenge-platform", "<title>just a moment",
+    "attention required! | cloudflare", "px-captcha", "captcha-delivery.com",
+    "datadome", "g-recaptcha", "h-captcha", "verify you are human",
+]
+
+# How often each fetch path was used in this process, and per running job
+FETCH_STATS = Counter()
+_job_stats = {}        # job_id → Counter(path → n)
+_stats_lock = threading.Lock()
+
+# "http_fallback" pages are counted under "browser" too
+FETCH_LABELS = {"http": "HTTP", "browser": "браузер", "http_fallback": "HTTP не сработал", "cache": "кэш"}
+
+# ETag / Last-Modified of recent successful HTTP fetches, for the listing store
+VALIDATORS_KEEP = 1000
+_validators = {}
+_validators_lock = threading.Lock()
+
+_local = threading.local()
+_modes = {}            # domain → "http" | "browser"
+_browser_streak = Counter()
+_modes_lock = threading.Lock()
+
+
+def count(path: str):
+    job_id = current_job()
+    with _stats_lock:
+        FETCH_STATS[path] += 1
+        if job_id:
+            _job_stats.setdefault(job_id, Counter())[path] += 1
+
+
+def get_fetch_stats() -> dict:
+    with _stats_lock:
+        return dict(FETCH_STATS)
+
+
+def pop_job_fetch_stats(job_id) -> dict:
+    """Fetch paths used by one job; called once when the job ends."""
+    with _stats_lock:
+        return dict(_job_stats.pop(job_id, {}))
+
+
+def format_fetch_stats(stats) -> str:
+    """'🌐 Страницы: HTTP 40, браузер 3, HTTP не сработал 2, кэш 5' — is HTTP-first paying off?"""
+    parts = [f"{label} {stats[path]}" for path, label in FETCH_LABELS.items() if stats.get(path)]
+    return "🌐 Страницы: " + ", ".join(parts) if parts else ""
+
+
+# ============================================================
+# 🌐 Pooled HTTP session
+# ============================================================
+def get_http_session() -> requests.Session:
+    """One keep-alive session per thread, so workers never share a connection."""
+    session = getattr(_local, "session", None)
+    if session is None:
+        session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=20, pool_maxsize=20, max_retries=1)
+        session.mount("http://", adapter)
+        session.mount("https://", adapter)
+        session.headers.update({
+            "Accept": "text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8",
+            "Accept-Language": "en-US,en;q=0.9",
+        })
+        _local.session = session
+    return session
+
+
+def looks_like_challenge(status_code: int, html_content: str) -> bool:
+    if status_code in (403, 429, 503):
+        return True
+    head = html_content[:20000].lower()
+    return any(marker in head for marker in CHALLENGE_MARKERS)
+
+
+def is_page_ready(html_content: str, config) -> bool:
+    """
+    Same readiness rule the browser uses (page_ready_xpath). When the config
+    keeps the catch-all default, require at least one field or list-card hit
+    so an empty JS shell is not mistaken for a rendered page.
+    """
+    try:
+        tree = html.fromstring(html_content)
+    except (ParserError, ValueError):
+        return False
+
+    page_ready_xpath = config.get("page_ready_xpath", "//*")
+    candidates = [page_ready_xpath]
+    if page_ready_xpath == "//*":
+        candidates = [config.get("list_page_check")] + [
+            f.get("xpath") for f in config.get("fields", {}).values()
+        ]
+
+    for xpath in candidates:
+        if not xpath:
+            continue
+        try:
+            if tree.xpath(xpath):
+                return True
+        except XPathError:
+            continue
+    return False
+
+
+def http_fetch(url, config):
+    """Plain GET. Returns HTML only if it passes the readiness and challenge checks."""
+    session = get_http_session()
+    headers = {"User-Agent": config.get("user_agent", DEFAULT_USER_AGENT)}
+    politeness = get_politeness()
+    try:
+        with politeness.slot(url, config), span("http_fetch", url=url) as tags:
+            r = session.get(url, headers=headers, timeout=config.get("http_timeout", HTTP_TIMEOUT))
+            tags["http_status"] = r.status_code
+    except requests.RequestException as e:
+        print(f"⚠️ HTTP fetch failed for {url}: {e}")
+        return None
+
+    ready = is_page_ready(r.text, config)
+    # Same rule as is_browser_blocked: markers only count when the content is missing
+    # (a detail page's contact form often carries reCAPTCHA)
+    challenge_page = looks_like_challenge(200, r.text) and not ready
+    challenged = r.status_code in (403, 429, 503) or challenge_page
+    # A challenge on plain HTTP usually means "needs a browser"; it is a rate
+    # signal only on 429/503, or a content-less challenge page where HTTP used to work
+    rate_limited = r.status_code in (429, 503) or (challenge_page and get_fetch_mode(domain_of(url)) == "http")
+    politeness.report(url, blocked=rate_limited, retry_after=r.headers.get("Retry-After"))
+
+    if r.status_code != 200 or challenged:
+        print(f"🛡️ HTTP fetch blocked or challenged ({r.status_code}) → browser fallback.")
+        return None
+    if not ready:
+        print("⏳ HTTP HTML not ready (page_ready_xpath miss) → browser fallback.")
+        return None
+    _remember_validators(url, r.headers)
+    return r.text
+
+
+# ============================================================
+# 🏷️ HTTP validators (ETag / Last-Modified)
+# ============================================================
+def _remember_validators(url, headers):
+    etag, last_modified = headers.get("ETag"), headers.get("Last-Modified")
+    if not (etag or last_modified):
+        return
+    with _validators_lock:
+        if len(_validators) >= VALIDATORS_KEEP:
+            _validators.pop(next(iter(_validators)))
+        _validators[url] = {"etag": etag, "last_modified": last_modified}
+
+
+def pop_validators(url) -> dict:
+    """Validators from the last HTTP fetch of `url` (empty if it was rendered or had none)."""
+    with _validators_lock:
+        return _validators.pop(url, {})
+
+
+def check_not_modified(url, config, etag=None, last_modified=None):
+    """
+    Conditional HEAD: True on 304, False when the server reports a change,
+    None when it cannot tell (blocked, error, no validators sent back).
+    """
+    headers = {"User-Agent": config.get("user_agent", DEFAULT_USER_AGENT)}
+    if etag:
+        headers["If-None-Match"] = etag
+    if last_modified:
+        headers["If-Modified-Since"] = last_modified
+    try:
+        with get_politeness().slot(url, config):
+            r = get_http_session().head(
+                url, headers=headers, allow_redirects=True, timeout=config.get("http_timeout", HTTP_TIMEOUT)
+            )
+    except requests.RequestException:
+        return None
+
+    if r.status_code in (429, 503):
+        get_politeness().report(url, blocked=True, retry_after=r.headers.get("Retry-After"))
+        return None
+    if r.status_code == 304:
+        return True
+    if r.status_code != 200:
+        return None
+    new_etag, new_modified = r.headers.get("ETag"), r.headers.get("Last-Modified")
+    if etag and new_etag:
+        return new_etag == etag
+    if last_modified and new_modified:
+        return new_modified == last_modified
+    return None
+
+
+# ============================================================
+# 🧠 Per-domain fetch mode memory
+# ============================================================
+def get_fetch_mode(domain: str):
+    with _modes_lock:
+        if domain in _modes:
+            return _modes[domain]
+
+    db = ConfigDBDriver()
+    mode = db.get_fetch_mode(domain)
+    db.close()
+
+    with _modes_lock:
+        _modes[domain] = mode
+    return mode
+
+
+def remember_fetch_mode(domain: str, mode: str):
+    with _modes_lock:
+        if _modes.get(domain) == mode:
+            return
+        _modes[domain] = mode
+
+    db = ConfigDBDriver()
+    db.set_fetch_mode(domain, mode)
+    db.close()
+
+
+def is_browser_blocked(html_content: str, config) -> bool:
+    """
+    A rendered page that shows challenge markers and none of the content we
+    came for. Content wins: detail pages often embed reCAPTCHA in a contact form.
+    """
+    return looks_like_challenge(200, html_content or "") and not is_page_ready(html_content or "", config)
+
+
+def should_try_http(domain: str, config) -> bool:
+    forced = config.get("fetch_mode", "auto")
+    if forced in ("http", "browser"):
+        return forced == "http"
+
+    if get_fetch_mode(domain) != "browser":
+        return True
+
+    with _modes_lock:
+        _browser_streak[domain] += 1
+        if _browser_streak[domain] >= HTTP_REPROBE_EVERY:
+            _browser_streak[domain] = 0
+            return True
+    return False
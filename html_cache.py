@@ -0,0 +1,196 @@
+import os
+import gzip
+import json
+import time
+import hashlib
+import threading
+from urllib.parse import urlsplit, urlunsplit, parse_qsl, urlencode
+
+CACHE_DIR = os.getenv("HTML_CACHE_DIR", "html_cache")
+CACHE_TTL = int(os.getenv("HTML_CACHE_TTL", str(6 * 3600)))            # seconds
+CACHE_MAX_BYTES = int(os.getenv("HTML_CACHE_MAX_MB", "500")) * 1024 * 1024
+
+# Config settings that change what the rendered HTML looks like
+CACHE_KNOBS = ("headless", "user_agent", "lazy_scroll", "max_scrolls", "page_ready_xpath", "fetch_mode")
+
+TRACKING_PARAMS = ("utm_", "fbclid", "gclid", "yclid", "_ga")
+
+
+def normalize_url(url: str) -> str:
+    """Lowercase scheme/host, drop fragment and tracking params, sort the query."""
+    parts = urlsplit(url.strip())
+    host = parts.netloc.lower()
+    if host.startswith("www."):
+        host = host[4:]
+    path = parts.path or "/"
+    if len(path) > 1:
+        path = path.rstrip("/")
+    query = sorted(
+        (k, v) for k, v in parse_qsl(parts.query, keep_blank_values=True)
+        if not k.lower().startswith(TRACKING_PARAMS)
+    )
+    return urlunsplit((parts.scheme.lower(), host, path, urlencode(query), ""))
+
+
+def cache_key(url: str, config=None) -> str:
+    config = config or {}
+    knobs = {k: config.get(k) for k in CACHE_KNOBS if k in config}
+    raw = normalize_url(url) + "\n" + json.dumps(knobs, sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+# ============================================================
+# 🗄️ Disk cache of rendered HTML (gzip + JSON metadata)
+# ============================================================
+class HtmlCache:
+    def __init__(self, cache_dir: str = CACHE_DIR, ttl: int = CACHE_TTL, max_bytes: int = CACHE_MAX_BYTES):
+        self.cache_dir = cache_dir
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self._total_bytes = None
+        self._lock = threading.Lock()
+        os.makedirs(cache_dir, exist_ok=True)
+
+    def _paths(self, key):
+        folder = os.path.join(self.cache_dir, key[:2])
+        return os.path.join(folder, f"{key}.html.gz"), os.path.join(folder, f"{key}.json")
+
+    def get(self, url, config=None):
+        """Cached HTML for url+config, or None if missing/expired."""
+        return self.load(cache_key(url, config))
+
+    def load(self, key):
+        data_path, meta_path = self._paths(key)
+        try:
+            with open(meta_path, encoding="utf-8") as f:
+                meta = json.load(f)
+            if time.time() - meta["created_at"] > self.ttl:
+                self._remove(key)
+                return None
+            with gzip.open(data_path, "rt", encoding="utf-8") as f:
+                html_content = f.read()
+        except (OSError, ValueError, KeyError):
+            return None
+
+        os.utime(data_path)  # LRU order for size-based eviction
+        return html_content
+
+    def put(self, url, config, html_content: str):
+        key = cache_key(url, config)
+        data_path, meta_path = self._paths(key)
+        os.makedirs(os.path.dirname(data_path), exist_ok=True)
+
+        tmp_path = f"{data_path}.{threading.get_ident()}.tmp"
+        with gzip.open(tmp_path, "wt", encoding="utf-8", compresslevel=6) as f:
+            f.write(html_content)
+        os.replace(tmp_path, data_path)
+
+        size = os.path.getsize(data_path)
+        meta = {
+            "url": url,
+            "normalized_url": normalize_url(url),
+            "domain": urlsplit(normalize_url(url)).netloc,
+            "created_at": time.time(),
+            "size": size,
+        }
+        with open(meta_path, "w", encoding="utf-8") as f:
+            json.dump(meta, f, ensure_ascii=False)
+
+        with self._lock:
+            if self._total_bytes is None:
+                self._total_bytes = self._scan_size()
+            else:
+                self._total_bytes += size
+            over_budget = self._total_bytes > self.max_bytes
+        if over_budget:
+            self.evict()
+        return key
+
+    def entries(self, website: str = None):
+        """Metadata of live entries, optionally limited to a website and its subdomains."""
+        result = []
+        now = time.time()
+        for meta_path in self._meta_files():
+            try:
+                with open(meta_path, encoding="utf-8") as f:
+                    meta = json.load(f)
+            except (OSError, ValueError):
+                continue
+            if now - meta.get("created_at", 0) > self.ttl:
+                continue
+            domain = meta.get("domain", "")
+            if website and domain != website and not domain.endswith("." + website):
+                continue
+            meta["key"] = os.path.basename(meta_path)[:-len(".json")]
+            result.append(meta)
+        return sorted(result, key=lambda m: m["created_at"], reverse=True)
+
+    def evict(self):
+        """Drop expired entries, then least recently used ones until under 90% of the budget."""
+        now = time.time()
+        live = []
+        for meta_path in self._meta_files():
+            key = os.path.basename(meta_path)[:-len(".json")]
+            data_path, _ = self._paths(key)
+            try:
+                with open(meta_path, encoding="utf-8") as f:
+                    created_at = json.load(f).get("created_at", 0)
+                stat = os.stat(data_path)
+            except (OSError, ValueError):
+                self._remove(key)
+                continue
+            if now - created_at > self.ttl:
+                self._remove(key)
+                continue
+            live.append((stat.st_mtime, stat.st_size, key))
+
+        total = sum(size for _, size, _ in live)
+        target = int(self.max_bytes * 0.9)
+        removed = 0
+        for _, size, key in sorted(live):
+            if total <= target:
+                break
+            self._remove(key)
+            total -= size
+            removed += 1
+
+        with self._lock:
+            self._total_bytes = total
+        if removed:
+            print(f"🧹 HTML cache evicted {removed} entries ({total // 1024} KB kept).")
+
+    def _remove(self, key):
+        for path in self._paths(key):
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+    def _meta_files(self):
+        for folder in os.listdir(self.cache_dir):
+            folder_path = os.path.join(self.cache_dir, folder)
+            if not os.path.isdir(folder_path):
+                continue
+            for name in os.listdir(folder_path):
+                if name.endswith(".json"):
+                    yield os.path.join(folder_path, name)
+
+    def _scan_size(self):
+        total = 0
+        for root, _, files in os.walk(self.cache_dir):
+            for name in files:
+                if name.endswith(".html.gz"):
+                    total += os.path.getsize(os.path.join(root, name))
+        return total
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_html_cache() -> HtmlCache:
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = HtmlCache()
+        return _cache
@@ -0,0 +1,235 @@
+import os
+import re
+import json
+
+from lxml import etree, html
+
+# Prompt budget for page HTML, in tokens (≈3 chars per token for mixed Latin/Cyrillic markup)
+LLM_TOKEN_BUDGET = int(os.getenv("LLM_TOKEN_BUDGET", "30000"))
+CHARS_PER_TOKEN = 3
+
+DROP_TAGS = [
+    "script", "style", "noscript", "svg", "iframe", "link", "template",
+    "canvas", "video", "audio", "track", "object", "embed", "map", "base",
+]
+# <meta> tags that carry listing data (OpenGraph, description)
+KEEP_META_NAMES = {"description", "keywords"}
+
+# Attributes worth keeping when the LLM only has to read values
+CONTENT_ATTRS = {
+    "href", "src", "srcset", "alt", "title", "content", "itemprop",
+    "property", "name", "aria-label", "datetime",
+}
+# The XPath generator also needs the hooks XPaths are written against
+STRUCTURE_ATTRS = CONTENT_ATTRS | {"id", "class", "role", "itemtype", "type"}
+
+# Sibling "cards" (≥ COLLAPSE_MIN alike siblings with ≥ CARD_MIN_NODES nodes each) keep COLLAPSE_KEEP copies
+COLLAPSE_MIN = 4
+COLLAPSE_KEEP = 2
+CARD_MIN_NODES = 8
+# Subtrees larger than this are split into their children when ranking
+SEGMENT_MAX_CHARS = 4000
+
+FIELD_HINTS = {
+    "Название": ["<h1", "title", "название"],
+    "Цена": ["price", "€", "$", "£", "₽", "цена", "стоимость"],
+    "Валюта": ["price", "€", "$", "£", "₽", "currency", "цена"],
+    "Площадь": ["sqm", "m²", "м²", "sq ft", "area", "площадь"],
+    "Площадь земли": ["lot", "land", "plot", "участок", "земл"],
+    "Тип объекта": ["property type", "type", "тип"],
+    "Год постройки": ["year built", "built", "год постройки"],
+    "Количество комнат": ["bed", "room", "комнат", "спальн"],
+    "Описание": ["description", "about", "описание"],
+    "Инфраструктура": ["features", "amenities", "инфраструктур", "удобств"],
+    "С/у": ["bath", "ванн", "санузел"],
+    "Этаж": ["floor", "этаж"],
+    "Локация": ["location", "address", "адрес", "город"],
+    "Координаты": ["latitude", "longitude", "lat", "lng", "map", "query="],
+    "Фото_ссылки": ["<img", "photo", "gallery", "фото"],
+    "Фото_уникальные_названия": ["<img", "photo", "gallery", "фото"],
+    "Контактное лицо": ["agent", "contact", "агент", "контакт"],
+    "Телефон контактного лица": ["tel:", "phone", "телефон"],
+    "Компания": ["agency", "company", "listed by", "office", "агентств", "компания"],
+    "Телефон компании": ["tel:", "phone", "телефон"],
+}
+
+
+def _squash(text: str) -> str:
+    text = re.sub(r">\s+<", "><", text)
+    return re.sub(r"\s+", " ", text).strip()
+
+
+def _serialize(el) -> str:
+    return etree.tostring(el, encoding="unicode", method="html", with_tail=False)
+
+
+def _remove_keep_tail(el):
+    parent = el.getparent()
+    if parent is None:
+        return
+    if el.tail:
+        prev = el.getprevious()
+        if prev is not None:
+            prev.tail = (prev.tail or "") + el.tail
+        else:
+            parent.text = (parent.text or "") + el.tail
+    parent.remove(el)
+
+
+def extract_json_ld(tree):
+    """Compact JSON-LD blocks (often the cleanest price/address data on the page)."""
+    blocks = []
+    for script in tree.xpath("//script[@type='application/ld+json']"):
+        raw = (script.text or "").strip()
+        if not raw:
+            continue
+        try:
+            raw = json.dumps(json.loads(raw), ensure_ascii=False, separators=(",", ":"))
+        except ValueError:
+            raw = _squash(raw)
+        blocks.append(raw)
+    return blocks
+
+
+def _shrink_json(block: str, limit: int):
+    """
+    Drop the bulkiest keys (or list items) of a JSON-LD block until it fits,
+    so the LLM still gets valid JSON. None if it cannot be made to fit.
+    """
+    try:
+        data = json.loads(block)
+    except ValueError:
+        return None
+    dump = lambda value: json.dumps(value, ensure_ascii=False, separators=(",", ":"))
+    while len(dump(data)) > limit:
+        if isinstance(data, dict):
+            keys = [k for k in data if k not in ("@context", "@type")]
+            if not keys:
+                return None
+            del data[max(keys, key=lambda k: len(dump(data[k])))]
+        elif isinstance(data, list) and data:
+            data.remove(max(data, key=lambda item: len(dump(item))))
+        else:
+            return None
+        if not data:
+            return None
+    return dump(data)
+
+
+def _json_ld_header(blocks, limit: int) -> str:
+    """Whole JSON-LD blocks in page order within `limit` chars; blocks that do not fit are trimmed by key."""
+    open_tag, close_tag = "<script type=\"application/ld+json\">", "</script>"
+    parts, used = [], 0
+    for block in blocks:
+        room = limit - used - len(open_tag) - len(close_tag)
+        if len(block) > room:
+            block = _shrink_json(block, room) if room > 0 else None
+            if block is None:
+                continue
+        parts.append(open_tag + block + close_tag)
+        used += len(parts[-1])
+    return "".join(parts)
+
+
+def _collapse_repeats(root):
+    for parent in root.iter():
+        children = [c for c in parent if isinstance(c.tag, str)]
+        if len(children) < COLLAPSE_MIN:
+            continue
+        groups = {}
+        for child in children:
+            groups.setdefault((child.tag, child.get("class")), []).append(child)
+        for (tag, _), same in groups.items():
+            if len(same) < COLLAPSE_MIN:
+                continue
+            if sum(1 for _ in same[0].iter()) < CARD_MIN_NODES:
+                continue  # short lists (features, specs) are content, not cards
+            for extra in same[COLLAPSE_KEEP:]:
+                _remove_keep_tail(extra)
+            kept = same[COLLAPSE_KEEP - 1]
+            kept.tail = f" [… {len(same) - COLLAPSE_KEEP} more similar <{tag}> omitted …] " + (kept.tail or "")
+
+
+def _strip_attributes(root, keep_attrs):
+    for el in root.iter():
+        if not isinstance(el.tag, str):
+            continue
+        for name, value in list(el.attrib.items()):
+            if name not in keep_attrs or value.startswith("data:") or len(value) > 1000:
+                del el.attrib[name]
+
+
+def _segments(el, out):
+    """Split the tree into ranked units no larger than SEGMENT_MAX_CHARS where possible."""
+    text = _serialize(el)
+    children = [c for c in el if isinstance(c.tag, str)]
+    if len(text) <= SEGMENT_MAX_CHARS or not children:
+        out.append(_squash(text))
+        return
+    own_text = _squash(" ".join(filter(None, [el.text] + [c.tail for c in children])))
+    if own_text:
+        out.append(own_text)
+    for child in children:
+        _segments(child, out)
+
+
+def _score(segment: str, hints) -> int:
+    lower = segment.lower()
+    score = sum(lower.count(h) for h in hints)
+    if "itemprop" in lower or "<h1" in lower:
+        score += 2
+    return score
+
+
+# ============================================================
+# ✂️ HTML Minimizer
+# ============================================================
+def minimize_html(html_content: str, fields=None, max_tokens: int = LLM_TOKEN_BUDGET, keep_attrs=CONTENT_ATTRS) -> str:
+    """
+    Shrink a page for an LLM prompt: keep JSON-LD, drop scripts/styles/SVG and
+    noisy attributes, collapse repeated cards, and when the result is still
+    over budget keep the subtrees that look closest to the requested fields.
+    """
+    budget = max_tokens * CHARS_PER_TOKEN
+    try:
+        tree = html.fromstring(html_content)
+    except (etree.ParserError, ValueError):
+        return _squash(html_content)[:budget]
+
+    json_ld = extract_json_ld(tree)
+
+    for comment in tree.xpath("//comment()"):
+        _remove_keep_tail(comment)
+    etree.strip_elements(tree, *DROP_TAGS, with_tail=False)
+    for meta in tree.xpath("//meta"):
+        if not (meta.get("property") or meta.get("itemprop") or meta.get("name") in KEEP_META_NAMES):
+            _remove_keep_tail(meta)
+    _collapse_repeats(tree)
+    _strip_attributes(tree, keep_attrs)
+
+    header = _json_ld_header(json_ld, budget // 2)
+
+    root = tree.getroottree().getroot()
+    full = _squash(_serialize(root))
+    if len(header) + len(full) <= budget:
+        return header + full
+
+    # Over budget: rank subtrees by closeness to the fields we still need
+    hints = []
+    for field in (fields or FIELD_HINTS.keys()):
+        hints.extend(FIELD_HINTS.get(field, [field.lower()]))
+
+    segments = []
+    _segments(root, segments)
+    ranked = sorted(range(len(segments)), key=lambda i: (-_score(segments[i], hints), i))
+
+    chosen = set()
+    used = len(header)
+    for i in ranked:
+        size = len(segments[i]) + 1
+        if used + size > budget:
+            continue
+        chosen.add(i)
+        used += size
+
+    return header + "\n".join(segments[i] for i in sorted(chosen))
@@ -0,0 +1,252 @@
+import os
+import re
+import json
+import asyncio
+import hashlib
+import tempfile
+import threading
+from urllib.parse import urljoin
+
+from database import DB_PATH, get_connection
+from driver_pool import DEFAULT_USER_AGENT
+from politeness import get_politeness, domain_of
+from tracing import span
+
+IMAGES_DIR = os.getenv("IMAGES_DIR", "images")
+# Content-addressed files: images/store/ab/abcdef….jpg (one copy per distinct photo)
+STORE_DIR = os.path.join(IMAGES_DIR, "store")
+# Per-job manifests: images/jobs/<job_id>.json
+JOBS_DIR = os.path.join(IMAGES_DIR, "jobs")
+
+DOWNLOAD_IMAGES = os.getenv("DOWNLOAD_IMAGES", "1") == "1"
+IMAGE_CONCURRENCY = int(os.getenv("IMAGE_CONCURRENCY", "8"))
+IMAGE_TIMEOUT = float(os.getenv("IMAGE_TIMEOUT", "30"))
+IMAGE_MAX_BYTES = int(os.getenv("IMAGE_MAX_MB", "25")) * 1024 * 1024
+# srcset candidate closest to (but preferably not below) this width wins
+IMAGE_TARGET_WIDTH = int(os.getenv("IMAGE_TARGET_WIDTH", "1600"))
+
+# Limits for image hosts other than the site itself (CDNs take far more than HTML servers)
+IMAGE_POLITENESS = {"rps": float(os.getenv("IMAGE_RPS", "8")), "burst": 16, "concurrency": IMAGE_CONCURRENCY}
+
+CONTENT_TYPE_EXT = {
+    "image/jpeg": ".jpg", "image/png": ".png", "image/webp": ".webp",
+    "image/gif": ".gif", "image/avif": ".avif", "image/svg+xml": ".svg",
+}
+PHOTO_FIELD = "Фото_ссылки"
+
+
+# ============================================================
+# 🖼️ srcset / URL helpers
+# ============================================================
+def pick_from_srcset(srcset: str, target_width: int = IMAGE_TARGET_WIDTH):
+    """'a.jpg 640w, b.jpg 1280w' → the smallest candidate ≥ target (or the largest)."""
+    candidates = []
+    for part in re.split(r",\s+(?=\S)", srcset.strip()):
+        bits = part.strip().split()
+        if not bits:
+            continue
+        url, width = bits[0], 0
+        if len(bits) > 1:
+            descriptor = bits[1].lower()
+            try:
+                if descriptor.endswith("w"):
+                    width = int(float(descriptor[:-1]))
+                elif descriptor.endswith("x"):
+                    width = int(float(descriptor[:-1]) * 1000)   # density: rank only
+            except ValueError:
+                pass
+        candidates.append((width, url))
+    if not candidates:
+        return None
+    candidates.sort()
+    for width, url in candidates:
+        if width >= target_width:
+            return url
+    return candidates[-1][1]
+
+
+def image_urls(value, base_url=None):
+    """Normalize a Фото_ссылки value (list, ';'/newline-joined text, srcset) to unique URLs."""
+    items = value if isinstance(value, list) else re.split(r"[\n;]+", str(value or ""))
+    urls = []
+    for item in items:
+        item = str(item).strip()
+        if not item or item == "ERROR":
+            continue
+        if re.search(r"\s\d+(\.\d+)?[wx](,|$)", item):
+            item = pick_from_srcset(item) or ""
+        if base_url:
+            item = urljoin(base_url, item)
+        if item.startswith("http") and item not in urls:
+            urls.append(item)
+    return urls
+
+
+# ============================================================
+# 🗃️ URL → content index
+# ============================================================
+class ImageIndex:
+    """Which URLs were already downloaded, and to which content-addressed file."""
+
+    def __init__(self, db_path: str = DB_PATH):
+        self.db_path = db_path
+        get_connection(db_path)       # migrate the schema up front
+
+    def lookup(self, url):
+        row = get_connection(self.db_path).execute("SELECT path FROM images WHERE url = ?", (url,)).fetchone()
+        if row and os.path.exists(os.path.join(IMAGES_DIR, row[0])):
+            return row[0]
+        return None
+
+    def add(self, url, sha256, path, size):
+        get_connection(self.db_path).execute(
+            "INSERT OR REPLACE INTO images (url, sha256, path, bytes) VALUES (?, ?, ?, ?)",
+            (url, sha256, path, size),
+        )
+
+
+_index = None
+_index_lock = threading.Lock()
+
+
+def get_image_index() -> ImageIndex:
+    global _index
+    with _index_lock:
+        if _index is None:
+            _index = ImageIndex()
+        return _index
+
+
+# ============================================================
+# ⬇️ Async downloader
+# ============================================================
+async def _download_one(client, semaphore, listing, url, config, index):
+    """Returns the stored path (relative to IMAGES_DIR) or None."""
+    import httpx
+
+    known = index.lookup(url)
+    if known:
+        return known
+
+    # Photos on the site's own host share its limits; CDNs get IMAGE_POLITENESS
+    if domain_of(url) == domain_of(listing or ""):
+        limiter = get_politeness().limiter(url, config)
+    else:
+        limiter = get_politeness().limiter(url, {"politeness": (config or {}).get("image_politeness", IMAGE_POLITENESS)})
+
+    async with semaphore:
+        await asyncio.to_thread(limiter.acquire)
+        tmp_path = None
+        complete = False
+        try:
+            fd, tmp_path = tempfile.mkstemp(dir=STORE_DIR, suffix=".part")
+            digest, size = hashlib.sha256(), 0
+            with os.fdopen(fd, "wb") as tmp:
+                async with client.stream("GET", url) as r:
+                    if r.status_code in (403, 429):
+                        get_politeness().report(url, blocked=True, retry_after=r.headers.get("Retry-After"))
+                        return None
+                    if r.status_code != 200:
+                        return None
+                    content_type = r.headers.get("Content-Type", "").split(";")[0].strip().lower()
+                    if not content_type.startswith("image/"):
+                        # Error and challenge pages come back as 200 text/html
+                        print(f"⚠️ Not an image ({content_type or 'no Content-Type'}), skipped: {url}")
+                        return None
+                    async for chunk in r.aiter_bytes(64 * 1024):
+                        size += len(chunk)
+                        if size > IMAGE_MAX_BYTES:
+                            print(f"⚠️ Image too large, skipped: {url}")
+                            return None
+                        digest.update(chunk)
+                        tmp.write(chunk)
+            get_politeness().report(url)
+            complete = size > 0
+        except (httpx.HTTPError, OSError) as e:
+            print(f"⚠️ Image download failed for {url}: {e}")
+            return None
+        finally:
+            limiter.release()
+            if not complete and tmp_path and os.path.exists(tmp_path):
+                os.remove(tmp_path)
+        if not complete:
+            return None
+
+    sha = digest.hexdigest()
+    ext = CONTENT_TYPE_EXT.get(content_type) or os.path.splitext(url.split("?")[0])[1][:5].lower() or ".img"
+    rel_path = os.path.join("store", sha[:2], sha + ext)
+    final_path = os.path.join(IMAGES_DIR, rel_path)
+    if os.path.exists(final_path):
+        os.remove(tmp_path)            # same photo already stored (other listing/URL)
+    else:
+        os.makedirs(os.path.dirname(final_path), exist_ok=True)
+        os.replace(tmp_path, final_path)
+    index.add(url, sha, rel_path, size)
+    return rel_path
+
+
+async def _download_all(jobs, config):
+    # Loaded on first download: the admin app and the bot start without it
+    import httpx
+
+    os.makedirs(STORE_DIR, exist_ok=True)
+    index = get_image_index()
+    semaphore = asyncio.Semaphore(IMAGE_CONCURRENCY)
+    limits = httpx.Limits(max_connections=IMAGE_CONCURRENCY, max_keepalive_connections=IMAGE_CONCURRENCY)
+    headers = {"User-Agent": (config or {}).get("user_agent", DEFAULT_USER_AGENT), "Accept": "image/*,*/*;q=0.8"}
+    async with httpx.AsyncClient(
+        limits=limits, headers=headers, timeout=IMAGE_TIMEOUT, follow_redirects=True
+    ) as client:
+        results = await asyncio.gather(
+            *(_download_one(client, semaphore, listing, url, config, index) for listing, url in jobs),
+            return_exceptions=True,
+        )
+    return [None if isinstance(r, Exception) else r for r in results]
+
+
+def download_images(job_id, properties, config=None) -> dict:
+    """
+    Download every photo of a job's properties and write images/jobs/<job_id>.json.
+    Files are stored once per content hash; URLs fetched before are skipped.
+    Returns the manifest.
+    """
+    pairs = []
+    for prop in properties:
+        listing = prop.get("Ссылка на объект")
+        for url in image_urls(prop.get(PHOTO_FIELD), listing):
+            pairs.append((listing, url))
+
+    manifest = {"job_id": job_id, "images": []}
+    if pairs:
+        print(f"🖼️ Downloading {len(pairs)} images for job {job_id}…")
+        with span("download_images", images=len(pairs)):
+            paths = asyncio.run(_download_all(pairs, config))
+        for (listing, url), path in zip(pairs, paths):
+            manifest["images"].append({"listing": listing, "url": url, "path": path})
+
+    os.makedirs(JOBS_DIR, exist_ok=True)
+    with open(os.path.join(JOBS_DIR, f"{job_id}.json"), "w", encoding="utf-8") as f:
+        json.dump(manifest, f, ensure_ascii=False)
+
+    stored = sum(1 for img in manifest["images"] if img["path"])
+    print(f"🖼️ Job {job_id}: {stored}/{len(pairs)} images stored")
+    return manifest
+
+
+def list_job_images(limit=20):
+    """Newest job manifests first, for the image gallery."""
+    if not os.path.isdir(JOBS_DIR):
+        return []
+    names = sorted(
+        (n for n in os.listdir(JOBS_DIR) if n.endswith(".json")),
+        key=lambda n: os.path.getmtime(os.path.join(JOBS_DIR, n)),
+        reverse=True,
+    )
+    manifests = []
+    for name in names[:limit]:
+        try:
+            with open(os.path.join(JOBS_DIR, name), encoding="utf-8") as f:
+                manifests.append(json.load(f))
+        except (OSError, ValueError):
+            continue
+    return manifests
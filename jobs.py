@@ -0,0 +1,116 @@
+import os
+import time
+import uuid
+import threading
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+
+# Global number of scrape jobs running at once
+SCRAPE_WORKERS = int(os.getenv("SCRAPE_WORKERS", "2"))
+# Queued + running jobs allowed per user
+MAX_JOBS_PER_USER = int(os.getenv("MAX_JOBS_PER_USER", "2"))
+# Finished jobs kept for /status lookups
+JOB_HISTORY = 200
+
+
+class JobLimitError(Exception):
+    pass
+
+
+class ScrapeJob:
+    def __init__(self, user_id, url, on_progress=None):
+        self.id = uuid.uuid4().hex[:8]
+        self.user_id = user_id
+        self.url = url
+        self.status = "queued"      # queued → running → done | failed
+        self.created_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+        self.result = None
+        self.error = None
+        self.progress = []
+        self.timings = None         # per-stage span totals, filled when the job ends
+        self.fetch_stats = None     # pages per fetch path (HTTP / browser / cache)
+        self._on_progress = on_progress
+
+    def report(self, message: str):
+        self.progress.append(message)
+        print(f"[job {self.id}] {message}")
+        if self._on_progress:
+            try:
+                self._on_progress(self, message)
+            except Exception as e:
+                print(f"⚠️ Progress callback failed: {e}")
+
+
+# ============================================================
+# 🧵 Job Queue
+# ============================================================
+class JobQueue:
+    def __init__(self, workers: int = SCRAPE_WORKERS, per_user: int = MAX_JOBS_PER_USER):
+        self.per_user = per_user
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="scrape-job")
+        self._jobs = {}
+        self._active = Counter()
+        self._lock = threading.Lock()
+
+    def submit(self, user_id, url, fn, *args, on_progress=None, on_done=None):
+        """
+        Queue fn(job, *args). on_progress(job, message) is called for every
+        job.report(); on_done(job) runs on the worker once the job finishes.
+        """
+        with self._lock:
+            if self._active[user_id] >= self.per_user:
+                raise JobLimitError(f"Too many active jobs for user {user_id}")
+            job = ScrapeJob(user_id, url, on_progress)
+            self._active[user_id] += 1
+            self._jobs[job.id] = job
+            self._trim_history()
+
+        self._executor.submit(self._run, job, fn, args, on_done)
+        return job
+
+    def get(self, job_id):
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def user_jobs(self, user_id):
+        with self._lock:
+            return [j for j in self._jobs.values() if j.user_id == user_id]
+
+    def _run(self, job, fn, args, on_done):
+        job.status = "running"
+        job.started_at = time.time()
+        try:
+            job.result = fn(job, *args)
+            job.status = "done"
+        except Exception as e:
+            job.error = str(e)
+            job.status = "failed"
+            print(f"❌ Job {job.id} failed: {e}")
+        finally:
+            job.finished_at = time.time()
+            with self._lock:
+                self._active[job.user_id] -= 1
+            if on_done:
+                try:
+                    on_done(job)
+                except Exception as e:
+                    print(f"⚠️ Done callback failed: {e}")
+
+    def _trim_history(self):
+        finished = [j for j in self._jobs.values() if j.finished_at]
+        for job in sorted(finished, key=lambda j: j.finished_at)[:max(0, len(finished) - JOB_HISTORY)]:
+            del self._jobs[job.id]
+
+
+_queue = None
+_queue_lock = threading.Lock()
+
+
+def get_job_queue() -> JobQueue:
+    global _queue
+    with _queue_lock:
+        if _queue is None:
+            _queue = JobQueue()
+        return _queue
@@ -0,0 +1,160 @@
+import re
+import json
+import hashlib
+import threading
+from collections import Counter
+
+from database import DB_PATH, get_connection, transaction
+from html_cache import normalize_url
+from excel_export import STATUS_COLUMN
+
+STATUS_NEW = "новый"
+STATUS_CHANGED = "изменён"
+STATUS_UNCHANGED = "без изменений"
+STATUS_REMOVED = "удалён"
+
+
+def card_fingerprint(link, listing_hrefs) -> str:
+    """
+    Hash of the list-page card around one link result. `link` is what
+    list_page_check returned: an href string (with a parent element) or an
+    element. The card is the largest ancestor that links to no other listing
+    from `listing_hrefs`.
+    """
+    el = link.getparent() if hasattr(link, "getparent") and not hasattr(link, "tag") else link
+    if el is None or not hasattr(el, "tag"):
+        return hashlib.sha1(str(link).encode("utf-8")).hexdigest()
+
+    own = set(el.xpath("ancestor-or-self::a[1]/@href | .//a/@href")) & listing_hrefs or {str(link)}
+    card = el
+    parent = card.getparent()
+    while parent is not None and not (set(parent.xpath(".//a/@href")) & listing_hrefs) - own:
+        card = parent
+        parent = card.getparent()
+
+    text = re.sub(r"\s+", " ", card.text_content()).strip()
+    images = " ".join(card.xpath(".//img/@src"))
+    return hashlib.sha1(f"{text}|{images}".encode("utf-8")).hexdigest()
+
+
+# ============================================================
+# 🗂️ Listing Store
+# ============================================================
+class ListingStore:
+    """
+    Last extracted record per canonical property URL, with the list-card
+    fingerprint and HTTP validators seen when it was scraped, plus which
+    listings each search URL returned on its last complete run.
+    """
+
+    def __init__(self, db_path: str = DB_PATH):
+        self.db_path = db_path
+        get_connection(db_path)       # migrate the schema up front
+
+    def get(self, url):
+        row = get_connection(self.db_path).execute(
+            "SELECT * FROM listings WHERE url = ?", (normalize_url(url),)
+        ).fetchone()
+        if not row:
+            return None
+        entry = dict(row)
+        entry["record"] = json.loads(entry.pop("record_json") or "{}")
+        return entry
+
+    def save(self, url, record, fingerprint=None, etag=None, last_modified=None):
+        get_connection(self.db_path).execute("""
+            INSERT OR REPLACE INTO listings (url, fingerprint, etag, last_modified, record_json, updated_at)
+            VALUES (?, ?, ?, ?, ?, CURRENT_TIMESTAMP)
+        """, (normalize_url(url), fingerprint, etag, last_modified, json.dumps(record, ensure_ascii=False)))
+
+    def members(self, list_url) -> set:
+        rows = get_connection(self.db_path).execute(
+            "SELECT url FROM list_members WHERE list_url = ?", (normalize_url(list_url),)
+        ).fetchall()
+        return {row["url"] for row in rows}
+
+    def set_members(self, list_url, urls):
+        list_key = normalize_url(list_url)
+        with transaction(self.db_path) as conn:
+            conn.execute("DELETE FROM list_members WHERE list_url = ?", (list_key,))
+            conn.executemany(
+                "INSERT OR IGNORE INTO list_members (list_url, url) VALUES (?, ?)",
+                [(list_key, normalize_url(u)) for u in urls],
+            )
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_listing_store() -> ListingStore:
+    global _store
+    with _store_lock:
+        if _store is None:
+            _store = ListingStore()
+        return _store
+
+
+# ============================================================
+# 🔁 Incremental Run
+# ============================================================
+class IncrementalRun:
+    """
+    Diff of one listing scrape against the previous run of the same search
+    URL. classify() decides per link whether the detail page must be
+    scraped; finish() returns the listings that disappeared.
+    """
+
+    def __init__(self, list_url, config, store=None, not_modified=None):
+        self.list_url = list_url
+        self.config = config
+        self.store = store or get_listing_store()
+        # fn(url, config, etag, last_modified) → True/False/None (unknown)
+        self.not_modified = not_modified
+        self.previous = self.store.members(list_url)
+        self.seen = []
+        self.counts = Counter()
+        self._lock = threading.Lock()
+
+    def classify(self, url, fingerprint):
+        """Returns (status, stored_record_or_None)."""
+        self.seen.append(url)
+        entry = self.store.get(url)
+        if not entry:
+            return STATUS_NEW, None
+        if entry["fingerprint"] != fingerprint:
+            return STATUS_CHANGED, None
+
+        if self.not_modified and (entry["etag"] or entry["last_modified"]):
+            if self.not_modified(url, self.config, entry["etag"], entry["last_modified"]) is False:
+                return STATUS_CHANGED, None
+
+        with self._lock:
+            self.counts[STATUS_UNCHANGED] += 1
+        return STATUS_UNCHANGED, dict(entry["record"], **{STATUS_COLUMN: STATUS_UNCHANGED})
+
+    def record(self, url, status, data, fingerprint, validators=None):
+        """Store a freshly scraped listing and tag it with its status."""
+        validators = validators or {}
+        self.store.save(url, data, fingerprint, validators.get("etag"), validators.get("last_modified"))
+        with self._lock:
+            self.counts[status] += 1
+        return dict(data, **{STATUS_COLUMN: status})
+
+    def finish(self):
+        """Persist this run's link set; returns removed listings as tagged records."""
+        current = {normalize_url(u) for u in self.seen}
+        removed = []
+        for url in sorted(self.previous - current):
+            entry = self.store.get(url)
+            record = entry["record"] if entry else {"Ссылка на объект": url}
+            removed.append(dict(record, **{STATUS_COLUMN: STATUS_REMOVED}))
+        self.counts[STATUS_REMOVED] = len(removed)
+        self.store.set_members(self.list_url, self.seen)
+        return removed
+
+    def summary(self) -> str:
+        return (
+            f"🆕 {self.counts[STATUS_NEW]} новых, ✏️ {self.counts[STATUS_CHANGED]} изменённых, "
+            f"⏭️ {self.counts[STATUS_UNCHANGED]} без изменений, 🗑️ {self.counts[STATUS_REMOVED]} удалённых"
+        )
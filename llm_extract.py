@@ -0,0 +1,273 @@
+import os
+import json
+import time
+import threading
+import contextvars
+from concurrent.futures import Future, ThreadPoolExecutor
+
+import requests
+
+from html_minimizer import minimize_html
+from tracing import span
+
+# Total (minimized) HTML characters allowed in one batched prompt
+LLM_CONTEXT_CHARS = int(os.getenv("LLM_CONTEXT_CHARS", "200000"))
+LLM_MAX_BATCH = int(os.getenv("LLM_MAX_BATCH", "5"))
+LLM_MAX_CONCURRENT = int(os.getenv("LLM_MAX_CONCURRENT", "3"))
+LLM_REQUESTS_PER_MINUTE = int(os.getenv("LLM_RPM", "30"))
+# How long the scheduler waits for more pages to join a batch
+LLM_BATCH_WINDOW = float(os.getenv("LLM_BATCH_WINDOW", "0.5"))
+
+
+# ============================================================
+# 🤖 LLM calls
+# ============================================================
+def call_llm(messages):
+    """Raw chat-completion call; returns the message content or None on HTTP error."""
+    headers = {
+        "Authorization": f"Bearer {os.getenv('CHAT_GPT_API_KEY')}",
+        "Content-Type": "application/json"
+    }
+
+    payload = {
+        "model": os.getenv("CHAT_GPT_MODEL"),
+        "messages": messages,
+        "temperature": 0
+    }
+
+    r = requests.post(
+        os.getenv("CHAT_GPT_URL"),
+        headers=headers,
+        json=payload,
+        timeout=120
+    )
+
+    if r.status_code != 200:
+        print("⚠️ GPT error:", r.text)
+        return None
+    return r.json()["choices"][0]["message"]["content"]
+
+
+def gpt_extract_fields(html_content: str, url: str, missing_fields: list, minimized: bool = False):
+    if not minimized:
+        html_content = minimize_html(html_content, missing_fields)
+    system_prompt = "You are a professional real estate data extractor."
+
+    user_prompt = f"""
+Extract ONLY the following missing fields from the HTML.
+
+Rules:
+- Return RAW JSON
+- No explanations
+- If value not found → null
+- Do NOT invent data
+
+Fields to extract:
+{json.dumps(missing_fields, ensure_ascii=False)}
+
+URL:
+{url}
+
+HTML:
+{html_content}
+"""
+
+    try:
+        with span("llm_call", url=url, fields=len(missing_fields), prompt_chars=len(user_prompt)):
+            content = call_llm([
+                {"role": "system", "content": system_prompt},
+                {"role": "user", "content": user_prompt}
+            ])
+        return json.loads(content) if content else {}
+    except Exception as e:
+        print("⚠️ GPT JSON error:", e)
+        return {}
+
+
+def gpt_extract_batch(items):
+    """
+    One prompt for several pages. items: [(url, minimized_html, missing_fields)].
+    Returns {url: {field: value}}; raises if the reply is not usable.
+    """
+    system_prompt = "You are a professional real estate data extractor."
+
+    documents = []
+    for url, html_content, fields in items:
+        documents.append(f"""
+### DOCUMENT
+URL: {url}
+Fields to extract: {json.dumps(fields, ensure_ascii=False)}
+HTML:
+{html_content}
+""")
+
+    user_prompt = f"""
+Extract ONLY the listed missing fields from each HTML document below.
+
+Rules:
+- Return RAW JSON: an object keyed by each document's URL
+- Each value is an object with that document's requested fields
+- No explanations
+- If value not found → null
+- Do NOT invent data
+{"".join(documents)}
+"""
+
+    with span("llm_batch", pages=len(items), prompt_chars=len(user_prompt)):
+        content = call_llm([
+            {"role": "system", "content": system_prompt},
+            {"role": "user", "content": user_prompt}
+        ])
+    if not content:
+        raise RuntimeError("LLM batch call failed")
+    data = json.loads(content)
+    if not isinstance(data, dict):
+        raise ValueError("LLM batch reply is not a JSON object")
+    return data
+
+
+# ============================================================
+# 🗓️ Extraction Scheduler
+# ============================================================
+class _RateLimiter:
+    def __init__(self, per_minute: int):
+        self.interval = 60.0 / per_minute if per_minute > 0 else 0
+        self._next = 0.0
+        self._lock = threading.Lock()
+
+    def wait(self):
+        with self._lock:
+            now = time.monotonic()
+            start = max(now, self._next)
+            self._next = start + self.interval
+        if start > now:
+            time.sleep(start - now)
+
+
+class _Request:
+    def __init__(self, key, url, html_content, fields):
+        self.key = key
+        self.url = url
+        self.fields = fields
+        # Minimized up front so batching sees the real prompt size
+        self.html = minimize_html(html_content, fields)
+        self.size = len(self.html)
+        self.future = Future()
+        self.queued_at = time.monotonic()
+        # Single-page calls run in the submitter's context so spans keep the job tag
+        self.context = contextvars.copy_context()
+
+
+class LLMScheduler:
+    """
+    Coalesces missing-field extraction requests from concurrent scrapers:
+    identical (url, fields) requests in flight share one result, pages that
+    arrive within the batch window are packed into one prompt while they fit
+    the context budget, and calls run concurrently under a rate limit.
+    """
+
+    def __init__(self, max_concurrent=LLM_MAX_CONCURRENT, per_minute=LLM_REQUESTS_PER_MINUTE,
+                 context_chars=LLM_CONTEXT_CHARS, max_batch=LLM_MAX_BATCH, window=LLM_BATCH_WINDOW):
+        self.context_chars = context_chars
+        self.max_batch = max_batch
+        self.window = window
+        self._limiter = _RateLimiter(per_minute)
+        self._executor = ThreadPoolExecutor(max_workers=max_concurrent, thread_name_prefix="llm")
+        self._pending = []
+        self._inflight = {}
+        self._cond = threading.Condition()
+        self._dispatcher = threading.Thread(target=self._dispatch_loop, name="llm-dispatcher", daemon=True)
+        self._dispatcher.start()
+
+    def submit(self, html_content, url, missing_fields) -> Future:
+        key = (url, tuple(sorted(missing_fields)))
+        with self._cond:
+            req = self._inflight.get(key)
+        if req:
+            print(f"🔗 Reusing in-flight LLM request for {url}")
+            return req.future
+
+        # Minimizing parses the whole page: keep it outside the lock every submitter and the dispatcher share
+        new_req = _Request(key, url, html_content, list(missing_fields))
+        with self._cond:
+            req = self._inflight.get(key)
+            if req is None:
+                req = self._inflight[key] = new_req
+                self._pending.append(req)
+                self._cond.notify()
+        if req is not new_req:
+            print(f"🔗 Reusing in-flight LLM request for {url}")
+        return req.future
+
+    def extract(self, html_content, url, missing_fields, timeout=600) -> dict:
+        try:
+            return self.submit(html_content, url, missing_fields).result(timeout=timeout)
+        except Exception as e:
+            print(f"⚠️ LLM extraction failed for {url}: {e}")
+            return {}
+
+    def _dispatch_loop(self):
+        while True:
+            with self._cond:
+                while not self._pending:
+                    self._cond.wait()
+                # Give concurrent scrapers a moment to add pages to this batch
+                while len(self._pending) < self.max_batch:
+                    wait = self.window - (time.monotonic() - self._pending[0].queued_at)
+                    if wait <= 0:
+                        break
+                    self._cond.wait(wait)
+                batch = self._take_batch()
+            self._executor.submit(self._run_batch, batch)
+
+    def _take_batch(self):
+        batch = [self._pending.pop(0)]
+        used = batch[0].size
+        i = 0
+        while i < len(self._pending) and len(batch) < self.max_batch:
+            req = self._pending[i]
+            if used + req.size <= self.context_chars:
+                batch.append(self._pending.pop(i))
+                used += req.size
+            else:
+                i += 1
+        return batch
+
+    def _run_batch(self, batch):
+        if len(batch) > 1:
+            self._limiter.wait()
+            print(f"🧠 GPT batch extracting {len(batch)} pages")
+            try:
+                data = gpt_extract_batch([(r.url, r.html, r.fields) for r in batch])
+                for req in batch:
+                    self._finish(req, data.get(req.url) or {})
+                return
+            except Exception as e:
+                print(f"⚠️ GPT batch failed ({e}) → falling back to single-page calls")
+
+        for req in batch:
+            self._limiter.wait()
+            try:
+                self._finish(req, req.context.run(gpt_extract_fields, req.html, req.url, req.fields, True))
+            except Exception as e:
+                self._finish(req, error=e)
+
+    def _finish(self, req, result=None, error=None):
+        with self._cond:
+            self._inflight.pop(req.key, None)
+        if error is not None:
+            req.future.set_exception(error)
+        else:
+            req.future.set_result(result if isinstance(result, dict) else {})
+
+
+_scheduler = None
+_scheduler_lock = threading.Lock()
+
+
+def get_llm_scheduler() -> LLMScheduler:
+    global _scheduler
+    with _scheduler_lock:
+        if _scheduler is None:
+            _scheduler = LLMScheduler()
+        return _scheduler
@@ -1,29 +1,45 @@
 import os
 import re
 import uuid
-import tempfile
 import time
 import json
-import openpyxl
-import requests
+import asyncio
 from datetime import datetime
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import TYPE_CHECKING
 from urllib.parse import urljoin, urlparse, urlencode, urlsplit, urlunsplit, parse_qs
 from lxml import html
-from openpyxl.styles import PatternFill
 from dotenv import load_dotenv
-from telegram import Update
-from telegram.ext import ApplicationBuilder, CommandHandler, MessageHandler, ContextTypes, filters
-from selenium import webdriver
-from selenium.webdriver.chrome.options import Options
-from selenium.webdriver.common.by import By
-from selenium.webdriver.support.ui import WebDriverWait
-from selenium.webdriver.support import expected_conditions as EC
-from selenium.common.exceptions import TimeoutException, WebDriverException
-from db_driver import ConfigDBDriver
+from selenium.common.exceptions import WebDriverException
+from config_registry import get_config_registry
+from jobs import get_job_queue, JobLimitError
 from send_email import send_email_notification
-import undetected_chromedriver as uc
-from selenium_stealth import stealth
-from openpyxl import Workbook
+from driver_pool import get_driver_pool
+from browser_worker import get_browser_client, browser_session, load_page
+from html_cache import get_html_cache
+from excel_export import ExcelStreamWriter, COLUMNS, STATUS_COLUMN
+from llm_extract import get_llm_scheduler
+from structured_data import extract_structured_data
+from compiled_config import get_compiled_config
+from transform_dsl import TransformError
+from fetcher import (
+    http_fetch, domain_of, should_try_http, remember_fetch_mode, count,
+    pop_validators, check_not_modified, is_browser_blocked, pop_job_fetch_stats, format_fetch_stats,
+)
+from politeness import get_politeness
+from listing_store import IncrementalRun, card_fingerprint, STATUS_REMOVED
+from image_downloader import download_images, DOWNLOAD_IMAGES
+from results_store import get_result_store
+from database import run_released
+from extraction_result import ExtractionResult, FIELD_XPATH, FIELD_STRUCTURED, FIELD_LLM, FIELD_TRANSFORM_FAILED, FIELD_MISSING
+from tracing import span, job_context, traced_submit, finish_job, format_summary
+from readiness import ready_targets
+
+# The admin app imports this module for its helpers; Telegram loads only in the bot process
+if TYPE_CHECKING:
+    from telegram import Update
+    from telegram.ext import ContextTypes
+
 # Load env
 load_dotenv()
 BOT_TOKEN = os.getenv("BOT_TOKEN")
@@ -32,6 +48,12 @@ BASE_URL = "http://86.104.73.3/" #os.getenv("BASE_URL", "http://localhost")
 OUTPUT_FOLDER = "output_files"
 os.makedirs(OUTPUT_FOLDER, exist_ok=True)
 
+# Structured data usually has one hero image while the XPath sees the gallery
+XPATH_FIRST_FIELDS = {"Фото_ссылки", "Фото_уникальные_названия"}
+
+# Detail pages scraped in parallel when a config has no "concurrency" key
+DEFAULT_CONCURRENCY = int(os.getenv("SCRAPE_CONCURRENCY", "2"))
+
 GPT_SCHEMA = {
     "Название": None,
     "Цена": None,
@@ -58,407 +80,542 @@ GPT_SCHEMA = {
 # 🧠 DB Config Loader
 # ============================================================
 def get_website_config(url):
-    db = ConfigDBDriver()
-    rows = db.cursor.execute("SELECT website, config_json FROM configs").fetchall()
-    for row in rows:
-        website = row["website"]
-        if website in url:
-            db.close()
-            return website, json.loads(row["config_json"])
-    db.close()
-    return None, None
+    return get_config_registry().lookup(url)
 
 
 # ============================================================
 # 🌐 Selenium Loader
 # ============================================================
 def get_rendered_html(url, config):
-    headless = config.get("headless", True)
-
-    options = uc.ChromeOptions()
-    if headless:
-        options.add_argument("--headless=new")
-    options.add_argument("--no-sandbox")
-    options.add_argument("--disable-dev-shm-usage")
-    options.add_argument("--disable-gpu")
-    options.add_argument("--window-size=1920,1080")
-
-    # Set realistic User-Agent
-    ua = config.get(
-        "user_agent",
-        "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/140.0.0.0 Safari/537.36"
-    )
-    options.add_argument(f"--user-agent={ua}")
-
-    # Optional: unique profile per run to avoid session conflicts
-    tempdir = tempfile.mkdtemp()
-    options.add_argument(f"--user-data-dir={tempdir}")
-
-    driver = None
+    politeness = get_politeness()
+    client = get_browser_client()
     try:
-        driver = uc.Chrome(options=options)
-
-        # Apply selenium-stealth tweaks
-        stealth(driver,
-                languages=["en-US", "en"],
-                vendor="Google Inc.",
-                platform="Win32",
-                webgl_vendor="Intel Inc.",
-                renderer="Intel Iris OpenGL Engine",
-                fix_hairline=True,
-                )
-
-        wait_time = config.get("wait_time", 6)
-        lazy_scroll = config.get("lazy_scroll", False)
-        max_scrolls = config.get("max_scrolls", 10)
-        scroll_pause = config.get("scroll_pause", 2)
-        page_ready_xpath = config.get("page_ready_xpath", "//*")
-
-        driver.get(url)
-
-        try:
-            WebDriverWait(driver, wait_time).until(
-                EC.presence_of_all_elements_located((By.XPATH, page_ready_xpath))
-            )
-        except TimeoutException:
-            print("⚠️ Timeout waiting for page load")
-
-        if lazy_scroll:
-            last_height = driver.execute_script("return document.body.scrollHeight")
-            for _ in range(max_scrolls):
-                driver.execute_script("window.scrollTo(0, document.body.scrollHeight);")
-                time.sleep(scroll_pause)
-                new_height = driver.execute_script("return document.body.scrollHeight")
-                if new_height == last_height:
-                    break
-                last_height = new_height
-
-        html_content = driver.page_source
-        driver.quit()
+        if client:
+            # Chrome lives in the browser worker daemon; a hang there costs a slot, not this process
+            with span("render", url=url), politeness.slot(url, config):
+                html_content = client.render(url, config)
+        else:
+            # Wait for the domain's turn before holding a pooled driver, so throttled domains don't starve the pool
+            with span("render", url=url), politeness.slot(url, config):
+                with get_driver_pool().checkout(config) as driver:
+                    html_content = load_page(driver, url, config)
+
+        blocked = is_browser_blocked(html_content, config)
+        politeness.report(url, blocked=blocked)
+        if blocked:
+            print(f"🛡️ Challenge page rendered for {url}")
+            return None
         return html_content
 
     except WebDriverException as e:
         print(f"⚠️ Selenium Error: {e}")
-        if driver:
-            driver.quit()
         return None
+# ============================================================
+# 🚦 Fetch Layer (HTTP first, browser fallback)
+# ============================================================
+def fetch_html(url, config, bypass_cache=False):
+    cache = get_html_cache()
+    if not bypass_cache:
+        cached = cache.get(url, config)
+        if cached:
+            count("cache")
+            return cached
+
+    html_content = _fetch_live(url, config)
+    if html_content:
+        cache.put(url, config, html_content)
+    return html_content
+
+
+def _fetch_live(url, config):
+    domain = domain_of(url)
+
+    if should_try_http(domain, config):
+        html_content = http_fetch(url, config)
+        if html_content:
+            count("http")
+            remember_fetch_mode(domain, "http")
+            return html_content
+        count("http_fallback")
+        remember_fetch_mode(domain, "browser")
+
+    count("browser")
+    return get_rendered_html(url, config)
+
+
 # ============================================================
 # 🧩 Property Parser
 # ============================================================
 # ============================================================
 # 🧩 Property Parser (fixed title spacing)
 # ============================================================
-def gpt_extract_fields(html_content: str, url: str, missing_fields: list):
-    system_prompt = "You are a professional real estate data extractor."
-
-    user_prompt = f"""
-Extract ONLY the following missing fields from the HTML.
-
-Rules:
-- Return RAW JSON
-- No explanations
-- If value not found → null
-- Do NOT invent data
-
-Fields to extract:
-{json.dumps(missing_fields, ensure_ascii=False)}
-
-URL:
-{url}
-
-HTML:
-{html_content[:120000]}
-"""
-
-    headers = {
-        "Authorization": f"Bearer {os.getenv('CHAT_GPT_API_KEY')}",
-        "Content-Type": "application/json"
-    }
-
-    payload = {
-        "model": os.getenv("CHAT_GPT_MODEL"),
-        "messages": [
-            {"role": "system", "content": system_prompt},
-            {"role": "user", "content": user_prompt}
-        ],
-        "temperature": 0
-    }
-
-    r = requests.post(
-        os.getenv("CHAT_GPT_URL"),
-        headers=headers,
-        json=payload,
-        timeout=120
-    )
-
-    if r.status_code != 200:
-        print("⚠️ GPT error:", r.text)
-        return {}
-
-    try:
-        content = r.json()["choices"][0]["message"]["content"]
-        return json.loads(content)
-    except Exception as e:
-        print("⚠️ GPT JSON error:", e)
-        return {}
+def _xpath_value(field, tree):
+    """Evaluate one compiled field; returns (transformed value or None, field status)."""
+    if not field.xpath:
+        return None, FIELD_MISSING
+
+    values = field.xpath(tree)
+    if not values:
+        return None, FIELD_MISSING
+    if not isinstance(values, list):
+        # string()/substring-after() etc. return a single scalar
+        values = [values]
+
+    cleaned = []
+    for v in values:
+        txt = v.text_content().strip() if hasattr(v, "text_content") else str(v).strip()
+        if txt:
+            cleaned.append(txt)
+
+    combined = "\n".join(dict.fromkeys(cleaned))  # remove duplicates
+
+    if field.transform_error:
+        return None, FIELD_TRANSFORM_FAILED
+    if field.transform:
+        try:
+            combined = field.transform(combined)
+        except TransformError as e:
+            print(f"⚠️ Transform failed for '{field.name}': {e}")
+            return None, FIELD_TRANSFORM_FAILED
 
-def parse_property_with_config(url, config, download_folder="images"):
-    result = {"Ссылка на объект": url}
-    os.makedirs(download_folder, exist_ok=True)
+    return (combined, FIELD_XPATH) if combined else (None, FIELD_MISSING)
 
-    html_content = get_rendered_html(url, config)
-    if not html_content:
-        return None, "Failed to load HTML"
 
+def extract_fields(html_content, url, config, config_id=None) -> ExtractionResult:
+    """
+    Run the config's XPaths/transforms over already-fetched HTML.
+    Failed fields are "ERROR" in the record; no network access, so it can be
+    used to re-validate a config against cached pages.
+    """
+    result = ExtractionResult(url, {"Ссылка на объект": url})
     tree = html.fromstring(html_content)
-    fields = config.get("fields", {})
+    compiled = get_compiled_config(config, config_id)
 
-    missing_for_gpt = []
+    # JSON-LD / microdata / OpenGraph first; a list limits it to those fields
+    structured = {}
+    use_structured = config.get("structured_data", True)
+    if use_structured:
+        structured = extract_structured_data(tree, url)
+        if isinstance(use_structured, list):
+            structured = {k: v for k, v in structured.items() if k in use_structured}
 
-    for field_name, field_data in fields.items():
-        xpath = field_data.get("xpath")
-        transform = field_data.get("transform")
+    for field in compiled.fields:
+        field_name = field.name
 
-        if not xpath:
-            result[field_name] = "ERROR"
-            missing_for_gpt.append(field_name)
+        if field_name in structured and field_name not in XPATH_FIRST_FIELDS:
+            result.set(field_name, structured[field_name], FIELD_STRUCTURED)
             continue
 
-        values = tree.xpath(xpath)
-        if not values:
-            result[field_name] = "ERROR"
-            missing_for_gpt.append(field_name)
-            continue
+        value, status = _xpath_value(field, tree)
+        if not value and structured.get(field_name):
+            value, status = structured[field_name], FIELD_STRUCTURED
+        result.set(field_name, value or "ERROR", status)
 
-        cleaned = []
-        for v in values:
-            txt = v.text_content().strip() if hasattr(v, "text_content") else str(v).strip()
-            if txt:
-                cleaned.append(txt)
+    return result
 
-        combined = "\n".join(dict.fromkeys(cleaned))  # remove duplicates
 
-        if transform:
-            try:
-                combined = eval(transform, {"re": re}, {"value": combined})
-            except:
-                combined = combined
+def parse_property_with_config(url, config, bypass_cache=False) -> ExtractionResult:
+    """Fetch and extract one property; .data is None when the page could not be loaded."""
+    with span("parse_property", url=url):
+        return _parse_property(url, config, bypass_cache)
 
-        if not combined:
-            result[field_name] = "ERROR"
-            missing_for_gpt.append(field_name)
-        else:
-            result[field_name] = combined
+
+def _parse_property(url, config, bypass_cache=False):
+    with span("fetch", url=url):
+        html_content = fetch_html(url, config, bypass_cache=bypass_cache)
+    if not html_content:
+        return ExtractionResult(url, error="Failed to load HTML")
+
+    with span("extract_fields", url=url):
+        result = extract_fields(html_content, url, config)
 
     # 🤖 GPT FALLBACK
+    missing_for_gpt = result.failed_fields()
     if missing_for_gpt:
         print(f"🧠 GPT extracting missing fields: {missing_for_gpt}")
-        gpt_data = gpt_extract_fields(html_content, url, missing_for_gpt)
+        with span("llm_fallback", url=url, fields=len(missing_for_gpt)):
+            gpt_data = get_llm_scheduler().extract(html_content, url, missing_for_gpt)
 
         for k in missing_for_gpt:
-            if k in gpt_data and gpt_data[k]:
-                result[k] = gpt_data[k]
-            elif result.get(k) == "ERROR":
-                result[k] = "ERROR"
+            if gpt_data.get(k):
+                result.set(k, gpt_data[k], FIELD_LLM)
 
-    return result, None
+    return result
 
 # ============================================================
 # 💾 Excel Export (fixed column order in Russian)
 # ============================================================
 
 
-def save_to_excel(properties, filename, output_folder="output_files"):
-    os.makedirs(output_folder, exist_ok=True)
-
-    # ✅ Desired column order (Russian)
-    desired_order = [
-        "Ссылка на объект", "Название", "Цена", "Валюта", "Площадь", "Площадь земли",
-        "Тип объекта", "Год постройки", "Количество комнат", "Описание", "Инфраструктура",
-        "С/у", "Этаж", "Локация", "Координаты", "Фото_ссылки", "Фото_уникальные_названия",
-        "Контактное лицо", "Телефон контактного лица", "Компания", "Телефон компании"
-    ]
-
-    # Ensure all properties have all columns
-    for prop in properties:
-        for col in desired_order:
-            if col not in prop:
-                prop[col] = "ERROR"
-
-    wb = Workbook()
-    ws = wb.active
-    ws.append(desired_order)
-
-    red_fill = PatternFill(start_color="FFFF0000", end_color="FFFF0000", fill_type="solid")
+def export_job_excel(job_id, filename, output_folder=OUTPUT_FOLDER):
+    """
+    Excel view of a job's stored results; returns filename, or None if the job
+    has no rows. Read-only: the scrape path records the file with finish_job.
+    """
+    with span("excel"):
+        rows = get_result_store().export_excel(job_id, os.path.join(output_folder, filename))
+    return filename if rows else None
 
-    for prop in properties:
-        row = []
-        for col in desired_order:
-            value = prop.get(col, "ERROR")
 
-            # ✅ If value is a list, join it into a string
-            if isinstance(value, list):
-                value = ";".join([str(v) for v in value])
-
-            # ✅ If value is None, replace with empty string
-            if value is None:
-                value = ""
+def save_to_excel(properties, filename, output_folder="output_files"):
+    file_path = os.path.join(output_folder, filename)
+    columns = COLUMNS + [STATUS_COLUMN] if any(STATUS_COLUMN in p for p in properties) else COLUMNS
+    with span("excel", rows=len(properties)), ExcelStreamWriter(file_path, columns) as writer:
+        for prop in properties:
+            writer.append(prop)
+    return file_path
 
-            row.append(value)
+# ============================================================
+# ⚡ Concurrent Detail Scraper
+# ============================================================
+def _scrape_one(idx, url, config, bypass_cache=False):
+    print(f"➡️ [{idx}] {url}")
+    try:
+        return parse_property_with_config(url, config, bypass_cache=bypass_cache)
+    except Exception as e:
+        return ExtractionResult(url, error=str(e))
+
+
+def _scrape_listing(idx, url, config, bypass_cache, incremental, status, fingerprint):
+    result = _scrape_one(idx, url, config, bypass_cache)
+    if result.data:
+        result.data = incremental.record(url, status, result.data, fingerprint, pop_validators(url))
+    return result
+
+
+def _completed(result):
+    future = Future()
+    future.set_result(result)
+    return future
+
+
+class _OrderedCollector:
+    """
+    Gathers (url, future → ExtractionResult) pairs in submission order.
+    drain() hands finished results to on_result as soon as every earlier one
+    is done, so streaming consumers see properties in link order while
+    scraping is still running.
+    """
+
+    def __init__(self, failures, on_result=None):
+        self.failures = failures
+        self.on_result = on_result
+        self.submitted = []
+        self.properties = []
+        self._next = 0
+
+    def add(self, url, future):
+        self.submitted.append((url, future))
+        self.drain(block=False)
+
+    def drain(self, block=True):
+        while self._next < len(self.submitted):
+            url, future = self.submitted[self._next]
+            if not block and not future.done():
+                return
+            self._next += 1
+
+            result = future.result()
+            if result.data:
+                self.properties.append(result.data)
+                if self.on_result:
+                    self.on_result(result)
+            else:
+                print(f"❌ Error parsing property {url}: {result.error}")
+                self.failures.append((url, result.error))
+        return self.properties
 
-        ws.append(row)
 
-        # Fill red for ERROR cells
-        for i, value in enumerate(row, start=1):
-            if value == "ERROR":
-                ws.cell(row=ws.max_row, column=i).fill = red_fill
+def _concurrency(config):
+    return max(1, int(config.get("concurrency", DEFAULT_CONCURRENCY)))
 
-    file_path = os.path.join(output_folder, filename)
-    wb.save(file_path)
-    return file_path
 
 # ============================================================
 # 🧩 List Page Parser with Auto Pagination (Next Button Supported)
 # ============================================================
-def parse_list_page(base_url, config):
-    print(f"🌍 Fetching list pages from: {base_url}")
-
-    properties = []
+def iter_property_links(base_url, config, discovery=None):
+    """
+    Producer: walk list pages in one browser session (the worker's or a
+    pooled driver) and yield (detail URL, list-card fingerprint) as soon as
+    each page is read. The browser goes back the moment link discovery is
+    exhausted. discovery["complete"] is set when pagination ended normally.
+    """
     seen_first = None
     page = 1
     page_query = config.get("page_query")
     next_button_xpath = config.get("next_page_xpath")
 
-    headless = config.get("headless", True)
-
-    options = uc.ChromeOptions()
-    if headless:
-        options.add_argument("--headless=new")
-    options.add_argument("--no-sandbox")
-    options.add_argument("--disable-dev-shm-usage")
-    options.add_argument("--disable-gpu")
-    options.add_argument("--window-size=1920,1080")
-    ua = config.get(
-        "user_agent",
-        "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/140.0.0.0 Safari/537.36"
-    )
-    options.add_argument(f"--user-agent={ua}")
-    tempdir = tempfile.mkdtemp()
-    options.add_argument(f"--user-data-dir={tempdir}")
-
-    driver = uc.Chrome(options=options)
-
-    # Apply stealth
-    stealth(driver,
-            languages=["en-US", "en"],
-            vendor="Google Inc.",
-            platform="Win32",
-            webgl_vendor="Intel Inc.",
-            renderer="Intel Iris OpenGL Engine",
-            fix_hairline=True,
-            )
+    list_targets = ready_targets(config, list_page=True)
+    politeness = get_politeness()
+
+    try:
+        with browser_session(config) as browser:
+            with politeness.slot(base_url, config), span("list_page_load", url=base_url, page=page):
+                html_content = browser.load(base_url, targets=list_targets, scroll=False)
+
+            while True:
+                print(f"\n🔄 Loading page {page}...")
+
+                with span("list_page_parse", url=base_url, page=page):
+                    blocked = is_browser_blocked(html_content, config)
+                    if not blocked:
+                        tree = html.fromstring(html_content)
+                        property_links = tree.xpath(config.get("list_page_check", ""))
+                politeness.report(base_url, blocked=blocked)
+                if blocked:
+                    print("🛡️ Challenge page on list page → stopping pagination.")
+                    break
+
+                if not property_links:
+                    print("🚫 No property links found → stopping pagination.")
+                    break
 
-    driver.get(base_url)
-    time.sleep(3)
+                first_url = urljoin(base_url, property_links[0])
+                if seen_first == first_url:
+                    print("🛑 Same first record as previous → last page reached.")
+                    break
+                seen_first = first_url
+
+                listing_hrefs = {str(link) for link in property_links}
+                for link in property_links:
+                    yield urljoin(base_url, link), card_fingerprint(link, listing_hrefs)
+
+                # Pagination
+                if next_button_xpath:
+                    try:
+                        with politeness.slot(base_url, config), span("list_page_load", url=base_url, page=page + 1):
+                            html_content = browser.click(
+                                next_button_xpath, targets=list_targets, not_equal=str(property_links[0])
+                            )
+                    except Exception as e:
+                        print(f"🛑 Next page button not clickable: {e}")
+                        break
+                    if html_content is None:
+                        print("🛑 No next page button found → last page reached.")
+                        break
+                    page += 1
+                    continue
+                elif page_query:
+                    parts = list(urlsplit(base_url))
+                    query = parse_qs(parts[3])
+                    query[page_query] = [str(page + 1)]
+                    parts[3] = urlencode(query, doseq=True)
+                    next_page_url = urlunsplit(parts)
+                    print(f"➡️ Loading next page via query: {next_page_url}")
+                    with politeness.slot(next_page_url, config), span("list_page_load", url=next_page_url, page=page + 1):
+                        html_content = browser.load(next_page_url, targets=list_targets, scroll=False)
+                    page += 1
+                    continue
+                else:
+                    break
 
-    while True:
-        print(f"\n🔄 Loading page {page}...")
+            if discovery is not None:
+                discovery["complete"] = True
 
-        html_content = driver.page_source
-        tree = html.fromstring(html_content)
-        property_links = tree.xpath(config.get("list_page_check", ""))
+    except WebDriverException as e:
+        print(f"⚠️ Selenium Error during pagination: {e}")
+
+
+def parse_list_page(base_url, config, failures=None, bypass_cache=False, on_result=None, incremental=None):
+    """
+    Walk all list pages and scrape every linked property.
+    Pagination and detail scraping overlap: each discovered link is queued on
+    the worker pool immediately. Per-URL failures are appended to `failures`
+    as (url, error) tuples. `bypass_cache` forces fresh detail-page fetches.
+    `on_result(ExtractionResult)` is called in link order as soon as results are ready.
+    With an IncrementalRun only new/changed listings are scraped; unchanged
+    ones come from the listing store and removed ones are appended at the end.
+    """
+    print(f"🌍 Fetching list pages from: {base_url}")
 
-        if not property_links:
-            print("🚫 No property links found → stopping pagination.")
-            break
+    if failures is None:
+        failures = []
+    collector = _OrderedCollector(failures, on_result)
+    discovery = {}
 
-        first_url = urljoin(base_url, property_links[0])
-        if seen_first == first_url:
-            print("🛑 Same first record as previous → last page reached.")
-            break
-        seen_first = first_url
+    with ThreadPoolExecutor(max_workers=_concurrency(config)) as executor:
+        for url, fingerprint in iter_property_links(base_url, config, discovery):
+            idx = len(collector.submitted) + 1
+            if incremental is None:
+                collector.add(url, traced_submit(executor, run_released, _scrape_one, idx, url, config, bypass_cache))
+                continue
 
-        for idx, link in enumerate(property_links, start=1):
-            full_url = urljoin(base_url, link)
-            print(f"➡️ [{idx}/{len(property_links)}] {full_url}")
-            data, error = parse_property_with_config(full_url, config)
-            if data:
-                properties.append(data)
+            status, record = incremental.classify(url, fingerprint)
+            if record:
+                print(f"⏭️ [{idx}] Unchanged: {url}")
+                collector.add(url, _completed(ExtractionResult(url, record)))
             else:
-                print(f"❌ Error parsing property: {error}")
-
-        # Pagination
-        if next_button_xpath:
-            try:
-                next_btn = WebDriverWait(driver, 5).until(
-                    EC.presence_of_element_located((By.XPATH, next_button_xpath))
-                )
-                driver.execute_script("arguments[0].scrollIntoView(true);", next_btn)
-                time.sleep(1)
-                driver.execute_script("arguments[0].click();", next_btn)
-                print("👉 Clicked next page button via JS.")
-                time.sleep(config.get("scroll_pause", 2))
-                page += 1
-                continue
-            except Exception as e:
-                print(f"🛑 No next page button found or not clickable: {e}")
-                break
-        elif page_query:
-            parts = list(urlsplit(base_url))
-            query = parse_qs(parts[3])
-            query[page_query] = [str(page + 1)]
-            parts[3] = urlencode(query, doseq=True)
-            next_page_url = urlunsplit(parts)
-            print(f"➡️ Loading next page via query: {next_page_url}")
-            driver.get(next_page_url)
-            time.sleep(2)
-            page += 1
-            continue
+                collector.add(url, traced_submit(
+                    executor, run_released, _scrape_listing, idx, url, config, bypass_cache, incremental, status, fingerprint
+                ))
+
+        print(f"✅ Link discovery finished: {len(collector.submitted)} links queued.")
+        collector.drain()
+
+    if incremental is not None:
+        if discovery.get("complete"):
+            for record in incremental.finish():
+                link = record["Ссылка на объект"]
+                collector.add(link, _completed(ExtractionResult(link, record)))
         else:
-            break
+            print("⚠️ Link discovery was cut short → removed listings not computed.")
+    return collector.drain()
+
 
-    driver.quit()
-    return properties
 # ============================================================
 # 🤖 Telegram Bot Handlers
 # ============================================================
-async def start(update: Update, context: ContextTypes.DEFAULT_TYPE):
+async def start(update: "Update", context: "ContextTypes.DEFAULT_TYPE"):
     await update.message.reply_text("👋 Отправьте URL объекта недвижимости/листинга. Я скачаю и экспортирую всё в Excel.")
 
 
-async def handle_message(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    url = update.message.text.strip()
-    await update.message.reply_text("🔍 Собираю данные…")
+NO_CACHE_FLAG = "nocache"
+
+
+def start_incremental_run(url, config, bypass_cache=False):
+    """IncrementalRun for a listing URL, or None when every page must be re-scraped."""
+    if bypass_cache or not config.get("incremental", True):
+        return None
+    return IncrementalRun(url, config, not_modified=check_not_modified)
+
+
+def split_cache_flag(text: str):
+    """'<url> nocache' → (url, True): lets a user force fresh renders and a full re-scrape."""
+    parts = text.strip().split()
+    bypass_cache = NO_CACHE_FLAG in parts[1:]
+    return (parts[0] if parts else ""), bypass_cache
+
+
+def run_scrape_job(job, url, config, bypass_cache=False):
+    """
+    Blocking scrape of a single property or a whole listing.
+    Rows are streamed into the Excel file as they arrive, so a run that is
+    cut short still leaves a partial workbook behind.
+    Runs on a job-queue worker; returns (properties, filename).
+    Every span opened on the way is tagged with the job id; the per-stage
+    totals end up in job.timings and traces/jobs.jsonl.
+    """
+    with job_context(job.id):
+        try:
+            with span("job", url=url):
+                return _run_scrape_job(job, url, config, bypass_cache)
+        finally:
+            job.fetch_stats = pop_job_fetch_stats(job.id)
+            job.timings = finish_job(job.id, url=url, domain=domain_of(url), fetch=job.fetch_stats)
+
+
+def _run_scrape_job(job, url, config, bypass_cache=False):
+    filename = f"{datetime.now().strftime('%Y-%m-%d_%H-%M-%S')}_{job.id}_properties.xlsx"
+    incremental = start_incremental_run(url, config, bypass_cache)
+    results = get_result_store()
+    results.start_job(job.id, url)
+
+    def store(result):
+        # Rows are persisted as they arrive; a run that is cut short keeps them
+        results.add(job.id, result.data, result.field_status)
+
+    properties = []
+    try:
+        single = parse_property_with_config(url, config, bypass_cache=bypass_cache)
+
+        if single.data and single.data.get("Название") != "ERROR":
+            properties = [single.data]
+            store(single)
+        else:
+            job.report("📄 Это страница листинга — обхожу все страницы…")
+            failures = []
+            properties = parse_list_page(
+                url, config, failures=failures, bypass_cache=bypass_cache, on_result=store,
+                incremental=incremental,
+            )
+            if incremental:
+                job.report(incremental.summary())
+            if failures:
+                job.report(f"⚠️ Не удалось обработать {len(failures)} объект(ов).")
+    except Exception:
+        exported = export_job_excel(job.id, filename)
+        results.finish_job(job.id, exported)
+        if exported:
+            rows = results.job_counts(job.id)["rows"]
+            job.report(f"💾 Частичный результат ({rows}): {BASE_URL}/output_files/{filename}")
+        raise
+
+    exported = export_job_excel(job.id, filename)
+    results.finish_job(job.id, exported)
+    if not exported:
+        return properties, None
+
+    if config.get("download_images", DOWNLOAD_IMAGES):
+        job.report("🖼️ Скачиваю фото…")
+        manifest = download_images(
+            job.id, [p for p in properties if p.get(STATUS_COLUMN) != STATUS_REMOVED], config
+        )
+        stored = sum(1 for img in manifest["images"] if img["path"])
+        job.report(f"🖼️ Фото: {stored} из {len(manifest['images'])} сохранено.")
+    return properties, filename
+
+
+async def handle_message(update: "Update", context: "ContextTypes.DEFAULT_TYPE"):
+    url, bypass_cache = split_cache_flag(update.message.text)
 
     domain, config = get_website_config(url)
     if not config:
         await update.message.reply_text("❌ Источник не подключён.")
         return
 
-    data, error = parse_property_with_config(url, config)
-
-    if data and data.get("Название") != "ERROR":
-        properties = [data]
-    else:
-        properties = parse_list_page(url, config)
+    loop = asyncio.get_running_loop()
+    chat_id = update.effective_chat.id
+
+    def send(text):
+        # Called from worker threads: hand the coroutine back to the bot's loop
+        asyncio.run_coroutine_threadsafe(context.bot.send_message(chat_id=chat_id, text=text), loop)
+
+    def on_done(job):
+        timings = "\n".join(filter(None, [format_fetch_stats(job.fetch_stats or {}), format_summary(job.timings)]))
+        if job.status == "failed":
+            send(f"❌ Задача {job.id} завершилась с ошибкой: {job.error}\n{timings}")
+            return
+        properties, filename = job.result
+        if not filename:
+            send(f"❌ Задача {job.id}: ничего не найдено.\n{timings}")
+            return
+        results = get_result_store()
+        counts = results.job_counts(job.id)
+        send(
+            f"✅ Задача {job.id} готова: {counts['rows']} объектов, {counts['with_errors']} с ошибками\n"
+            f"📂 {BASE_URL}/output_files/{filename}\n{results.field_stats(job.id).summary()}\n{timings}"
+        )
 
-    if not properties:
-        await update.message.reply_text("❌ Ничего не найдено.")
+    try:
+        job = get_job_queue().submit(
+            update.effective_user.id, url, run_scrape_job, url, config, bypass_cache,
+            on_progress=lambda job, message: send(f"[{job.id}] {message}"),
+            on_done=on_done,
+        )
+    except JobLimitError:
+        await update.message.reply_text("⏳ У вас уже есть задачи в работе. Дождитесь их завершения.")
         return
 
-    filename = f"{datetime.now().strftime('%Y-%m-%d_%H-%M-%S')}_properties.xlsx"
-    save_to_excel(properties, filename)
+    await update.message.reply_text(f"🔍 Собираю данные… Задача {job.id} поставлена в очередь.")
+
 
-    await update.message.reply_text(
-        f"✅ Готово: {len(properties)} объектов\n📂 {BASE_URL}/output_files/{filename}"
-    )
+async def status(update: "Update", context: "ContextTypes.DEFAULT_TYPE"):
+    jobs = get_job_queue().user_jobs(update.effective_user.id)
+    if not jobs:
+        await update.message.reply_text("Нет задач.")
+        return
+    lines = [f"{job.id}: {job.status} — {job.url}" for job in jobs[-10:]]
+    await update.message.reply_text("\n".join(lines))
 
 # ============================================================
 # 🚀 Launch Bot
 # ============================================================
 if __name__ == "__main__":
+    from telegram.ext import ApplicationBuilder, CommandHandler, MessageHandler, filters
+
     print("🤖 Bot running — config-driven, paginated scraper active...")
     app = ApplicationBuilder().token(BOT_TOKEN).build()
     app.add_handler(CommandHandler("start", start))
+    app.add_handler(CommandHandler("status", status))
     app.add_handler(MessageHandler(filters.TEXT & ~filters.COMMAND, handle_message))
     app.run_polling()
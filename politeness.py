@@ -0,0 +1,173 @@
+import os
+import time
+import threading
+from contextlib import contextmanager
+from urllib.parse import urlparse
+
+# Defaults per domain; a config overrides them with
+# "politeness": {"rps": 0.5, "burst": 2, "concurrency": 1}
+POLITE_RPS = float(os.getenv("POLITE_RPS", "2.0"))
+POLITE_BURST = int(os.getenv("POLITE_BURST", "3"))
+POLITE_CONCURRENCY = int(os.getenv("POLITE_CONCURRENCY", "2"))
+
+# Adaptive backoff: each block halves the rate and pauses the domain
+BACKOFF_BASE = float(os.getenv("POLITE_BACKOFF_BASE", "5"))
+BACKOFF_MAX = float(os.getenv("POLITE_BACKOFF_MAX", "300"))
+MIN_RATE_FACTOR = 1 / 16
+# Consecutive successes needed to undo one halving
+RECOVER_AFTER = 10
+
+
+def domain_of(url: str) -> str:
+    host = urlparse(url).netloc.lower().split(":")[0]
+    return host[4:] if host.startswith("www.") else host
+
+
+def parse_retry_after(value):
+    try:
+        return max(0.0, float(value))
+    except (TypeError, ValueError):
+        return None
+
+
+class DomainLimiter:
+    """Token bucket + concurrency cap for one domain, with AIMD-style backoff."""
+
+    def __init__(self, domain, rps=POLITE_RPS, burst=POLITE_BURST, concurrency=POLITE_CONCURRENCY):
+        self.domain = domain
+        self._cond = threading.Condition()
+        self.configure(rps, burst, concurrency)
+        self.tokens = float(self.burst)
+        self.updated = time.monotonic()
+        self.active = 0
+        self.factor = 1.0
+        self.paused_until = 0.0
+        self.strikes = 0
+        self.successes = 0
+
+    def configure(self, rps, burst, concurrency):
+        with self._cond:
+            self.rps = max(0.01, float(rps))
+            self.burst = max(1, int(burst))
+            self.concurrency = max(1, int(concurrency))
+            self._cond.notify_all()
+
+    def _refill(self, now):
+        rate = self.rps * self.factor
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * rate)
+        self.updated = now
+
+    def acquire(self):
+        with self._cond:
+            while True:
+                now = time.monotonic()
+                self._refill(now)
+                if now < self.paused_until:
+                    wait = self.paused_until - now
+                elif self.active >= self.concurrency:
+                    wait = None
+                elif self.tokens >= 1:
+                    self.tokens -= 1
+                    self.active += 1
+                    return
+                else:
+                    wait = (1 - self.tokens) / (self.rps * self.factor)
+                self._cond.wait(wait)
+
+    def release(self):
+        with self._cond:
+            self.active -= 1
+            self._cond.notify_all()
+
+    def success(self):
+        with self._cond:
+            self.strikes = 0
+            self.successes += 1
+            if self.factor < 1.0 and self.successes >= RECOVER_AFTER:
+                self.successes = 0
+                self.factor = min(1.0, self.factor * 2)
+                print(f"🐢 {self.domain}: rate restored to {self.rps * self.factor:.2f} req/s")
+
+    def blocked(self, retry_after=None):
+        with self._cond:
+            self.successes = 0
+            self.strikes += 1
+            self.factor = max(MIN_RATE_FACTOR, self.factor / 2)
+            pause = retry_after if retry_after is not None else min(BACKOFF_MAX, BACKOFF_BASE * 2 ** (self.strikes - 1))
+            self.paused_until = max(self.paused_until, time.monotonic() + pause)
+            self.tokens = 0
+            print(f"🛑 {self.domain}: blocked → pausing {pause:.0f}s, rate now {self.rps * self.factor:.2f} req/s")
+
+    def snapshot(self) -> dict:
+        with self._cond:
+            return {
+                "rps": round(self.rps * self.factor, 3),
+                "active": self.active,
+                "concurrency": self.concurrency,
+                "paused_for": max(0.0, round(self.paused_until - time.monotonic(), 1)),
+                "strikes": self.strikes,
+            }
+
+
+# ============================================================
+# 🚦 Politeness Scheduler
+# ============================================================
+class PolitenessScheduler:
+    """
+    Every request to a site (HTTP fetch, browser navigation, pagination,
+    image download) goes through slot(url, config), which waits for the
+    domain's concurrency cap and token bucket. Callers report blocks
+    (429/403/challenge) so the domain backs off, and successes so it recovers.
+    """
+
+    def __init__(self):
+        self._limiters = {}
+        self._lock = threading.Lock()
+
+    def limiter(self, url, config=None) -> DomainLimiter:
+        domain = domain_of(url)
+        settings = (config or {}).get("politeness") or {}
+        with self._lock:
+            limiter = self._limiters.get(domain)
+            if limiter is None:
+                limiter = self._limiters[domain] = DomainLimiter(domain)
+        if settings:
+            limiter.configure(
+                settings.get("rps", POLITE_RPS),
+                settings.get("burst", POLITE_BURST),
+                settings.get("concurrency", POLITE_CONCURRENCY),
+            )
+        return limiter
+
+    @contextmanager
+    def slot(self, url, config=None):
+        limiter = self.limiter(url, config)
+        limiter.acquire()
+        try:
+            yield limiter
+        finally:
+            limiter.release()
+
+    def report(self, url, blocked=False, retry_after=None):
+        limiter = self.limiter(url)
+        if blocked:
+            limiter.blocked(parse_retry_after(retry_after))
+        else:
+            limiter.success()
+
+    def stats(self) -> dict:
+        with self._lock:
+            limiters = dict(self._limiters)
+        return {domain: limiter.snapshot() for domain, limiter in limiters.items()}
+
+
+_scheduler = None
+_scheduler_lock = threading.Lock()
+
+
+def get_politeness() -> PolitenessScheduler:
+    global _scheduler
+    with _scheduler_lock:
+        if _scheduler is None:
+            _scheduler = PolitenessScheduler()
+        return _scheduler
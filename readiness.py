@@ -0,0 +1,155 @@
+import os
+import time
+
+from selenium.common.exceptions import WebDriverException
+
+from resource_policy import network_monitor
+
+READY_POLL = float(os.getenv("READY_POLL", "0.25"))
+# A signal counts as settled after this long without change
+DOM_QUIET = float(os.getenv("READY_DOM_QUIET", "0.5"))
+NETWORK_QUIET = float(os.getenv("READY_NETWORK_QUIET", "0.5"))
+# Long-polling/analytics connections that never finish are tolerated
+NETWORK_MAX_INFLIGHT = int(os.getenv("READY_NETWORK_MAX_INFLIGHT", "2"))
+# Page settled but none of the target XPaths matched: stop waiting after this long
+GIVE_UP_AFTER_SETTLED = float(os.getenv("READY_GIVE_UP", "2"))
+# Content present and network idle, but animations keep mutating the DOM
+CONTENT_GRACE = float(os.getenv("READY_CONTENT_GRACE", "2"))
+
+# One round trip per poll: installs a MutationObserver on first call and reports
+# target hits, ms since the last DOM mutation and the current scrollHeight.
+PROBE_JS = """
+const targets = arguments[0], notEqual = arguments[1];
+if (!window.__readyObserver) {
+  window.__lastMutation = performance.now();
+  window.__readyObserver = new MutationObserver(() => { window.__lastMutation = performance.now(); });
+  window.__readyObserver.observe(document.documentElement, {childList: true, subtree: true, attributes: true, characterData: true});
+}
+let matched = false, first = null;
+for (const xp of targets) {
+  try {
+    const r = document.evaluate(xp, document, null, XPathResult.ANY_TYPE, null);
+    let value = null;
+    if (r.resultType === XPathResult.STRING_TYPE) value = r.stringValue.trim() || null;
+    else if (r.resultType === XPathResult.NUMBER_TYPE) value = isNaN(r.numberValue) ? null : String(r.numberValue);
+    else if (r.resultType === XPathResult.BOOLEAN_TYPE) value = r.booleanValue ? "true" : null;
+    else { const n = r.iterateNext(); if (n) value = n.nodeValue !== null ? n.nodeValue : (n.textContent || "node"); }
+    if (value !== null) {
+      if (first === null) first = value;
+      if (notEqual === null || value !== notEqual) { matched = true; break; }
+    }
+  } catch (e) {}
+}
+return {
+  matched: matched,
+  first: first,
+  sinceMutation: performance.now() - window.__lastMutation,
+  readyState: document.readyState,
+  scrollHeight: document.body ? document.body.scrollHeight : 0
+};
+"""
+
+
+def ready_targets(config, list_page=None):
+    """
+    XPaths whose presence means the content we want is rendered:
+    page_ready_xpath when the config sets one, otherwise the list-card XPath
+    and/or the field XPaths (the catch-all "//*" is never a useful signal).
+    """
+    page_ready_xpath = config.get("page_ready_xpath", "//*")
+    if page_ready_xpath and page_ready_xpath != "//*":
+        return [page_ready_xpath]
+    targets = []
+    if list_page is not False and config.get("list_page_check"):
+        targets.append(config["list_page_check"])
+    if list_page is not True:
+        targets.extend(f.get("xpath") for f in config.get("fields", {}).values() if f.get("xpath"))
+    return targets
+
+
+def _probe(driver, targets, not_equal=None):
+    try:
+        return driver.execute_script(PROBE_JS, targets, not_equal)
+    except WebDriverException:
+        raise
+    except Exception:
+        return None
+
+
+# ============================================================
+# ⏱️ Readiness Engine
+# ============================================================
+def wait_for_ready(driver, config, targets=None, timeout=None, not_equal=None) -> bool:
+    """
+    Wait until a target XPath matches, the DOM has stopped mutating and the
+    network is idle, capped at config["wait_time"] seconds. `not_equal`
+    requires the first target value to differ from it (pagination: the first
+    card must change). Returns False on timeout or when the page settled
+    without any target matching.
+    """
+    if targets is None:
+        targets = ready_targets(config)
+    timeout = timeout if timeout is not None else config.get("wait_time", 6)
+    monitor = network_monitor(driver)
+    start = time.monotonic()
+    deadline = start + timeout
+    settled_since = content_since = None
+
+    while True:
+        state = _probe(driver, targets, not_equal) or {}
+        dom_quiet = state.get("sinceMutation", 0) >= DOM_QUIET * 1000
+        net_quiet = monitor.idle_for(NETWORK_MAX_INFLIGHT) >= NETWORK_QUIET
+        loaded = state.get("readyState") in ("interactive", "complete")
+        content = state.get("matched") or not targets
+
+        content_since = (content_since or time.monotonic()) if content else None
+        lingering = content_since and time.monotonic() - content_since >= CONTENT_GRACE
+        if content and loaded and net_quiet and (dom_quiet or lingering):
+            print(f"✅ Page ready in {time.monotonic() - start:.1f}s")
+            return True
+
+        if loaded and dom_quiet and net_quiet:
+            settled_since = settled_since or time.monotonic()
+            if time.monotonic() - settled_since >= GIVE_UP_AFTER_SETTLED:
+                print(f"⚠️ Page settled without target content after {time.monotonic() - start:.1f}s")
+                return False
+        else:
+            settled_since = None
+
+        if time.monotonic() >= deadline:
+            print(f"⚠️ Readiness cap reached ({timeout}s)")
+            return bool(content)
+        time.sleep(READY_POLL)
+
+
+def scroll_until_stable(driver, config, max_scrolls=None, pause_cap=None):
+    """
+    Lazy-load scroll: after each jump to the bottom wait only until the
+    height grows (or the page settles), never longer than scroll_pause.
+    """
+    max_scrolls = max_scrolls if max_scrolls is not None else config.get("max_scrolls", 10)
+    pause_cap = pause_cap if pause_cap is not None else config.get("scroll_pause", 2)
+    monitor = network_monitor(driver)
+
+    last_height = (_probe(driver, []) or {}).get("scrollHeight", 0)
+    for _ in range(max_scrolls):
+        driver.execute_script("window.scrollTo(0, document.body.scrollHeight);")
+        scrolled_at = time.monotonic()
+        deadline = scrolled_at + pause_cap
+        grown = False
+        while time.monotonic() < deadline:
+            time.sleep(READY_POLL)
+            state = _probe(driver, []) or {}
+            if state.get("scrollHeight", 0) > last_height:
+                grown = True
+                last_height = state["scrollHeight"]
+                break
+            settled = (
+                time.monotonic() - scrolled_at >= DOM_QUIET
+                and state.get("sinceMutation", 0) >= DOM_QUIET * 1000
+                and monitor.idle_for(NETWORK_MAX_INFLIGHT) >= NETWORK_QUIET
+            )
+            if settled:
+                break
+        if not grown:
+            break
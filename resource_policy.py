@@ -0,0 +1,191 @@
+import os
+import json
+import time
+import weakref
+import threading
+from collections import Counter
+
+# Config key "resource_policy": a profile name, or a dict overriding the default
+# profile, e.g. {"images": false, "allow_hosts": ["maps.googleapis.com"]}.
+# True = block that resource class.
+PROFILES = {
+    "none": {"images": False, "media": False, "fonts": False, "stylesheets": False, "trackers": False},
+    "default": {"images": True, "media": True, "fonts": True, "stylesheets": False, "trackers": True},
+    "aggressive": {"images": True, "media": True, "fonts": True, "stylesheets": True, "trackers": True},
+}
+DEFAULT_PROFILE = os.getenv("RESOURCE_PROFILE", "default")
+
+# Blocking works on URL patterns (Network.setBlockedURLs), so classes map to extensions
+RESOURCE_PATTERNS = {
+    "images": ["*.jpg*", "*.jpeg*", "*.png*", "*.gif*", "*.webp*", "*.avif*", "*.bmp*", "*.ico*", "*.svg*"],
+    "media": ["*.mp4*", "*.webm*", "*.m3u8*", "*.mp3*", "*.ogg*", "*.mov*"],
+    "fonts": ["*.woff*", "*.woff2*", "*.ttf*", "*.otf*", "*.eot*"],
+    "stylesheets": ["*.css*"],
+}
+TRACKER_HOSTS = [
+    "google-analytics.com", "googletagmanager.com", "doubleclick.net", "googlesyndication.com",
+    "googleadservices.com", "facebook.net", "connect.facebook.com", "hotjar.com", "clarity.ms",
+    "bat.bing.com", "criteo.com", "taboola.com", "outbrain.com", "adnxs.com", "scorecardresearch.com",
+    "mc.yandex.ru", "tiktok.com/i18n/pixel", "snap.licdn.com", "segment.io", "cdn.segment.com",
+    "sentry-cdn.com", "newrelic.com", "nr-data.net", "intercom.io", "hs-scripts.com", "onetrust.com",
+    "cookielaw.org", "trustarc.com", "quantserve.com", "amazon-adsystem.com",
+]
+
+# Rough transfer size of a resource we never downloaded, by CDP resource type
+TYPICAL_BYTES = {
+    "Image": 60_000, "Media": 500_000, "Font": 40_000, "Stylesheet": 30_000,
+    "Script": 40_000, "XHR": 5_000, "Fetch": 5_000, "Other": 10_000,
+}
+
+RESOURCE_STATS = Counter()
+_stats_lock = threading.Lock()
+
+
+# ============================================================
+# 🚫 Resource Policy
+# ============================================================
+def resolve_policy(config) -> tuple:
+    """Blocked URL patterns for a config, as a hashable tuple (empty = block nothing)."""
+    raw = (config or {}).get("resource_policy", DEFAULT_PROFILE)
+    if isinstance(raw, str):
+        policy = dict(PROFILES.get(raw, PROFILES["default"]))
+    elif isinstance(raw, dict):
+        policy = dict(PROFILES.get(DEFAULT_PROFILE, PROFILES["default"]))
+        policy.update(raw)
+    else:
+        policy = dict(PROFILES["none" if raw is False else "default"])
+
+    patterns = []
+    for resource_class, class_patterns in RESOURCE_PATTERNS.items():
+        if policy.get(resource_class):
+            patterns.extend(class_patterns)
+    if policy.get("trackers"):
+        allowed = set(policy.get("allow_hosts", []))
+        patterns.extend(f"*{host}*" for host in TRACKER_HOSTS if host not in allowed)
+    patterns.extend(f"*{host}*" for host in policy.get("block_hosts", []))
+    return tuple(patterns)
+
+
+def apply_resource_policy(driver, patterns):
+    """Install the blocked URL list on a live driver (per navigation target)."""
+    try:
+        driver.execute_cdp_cmd("Network.enable", {})
+        driver.execute_cdp_cmd("Network.setBlockedURLs", {"urls": list(patterns)})
+        return True
+    except Exception as e:
+        print(f"⚠️ Could not apply resource policy: {e}")
+        return False
+
+
+def enable_network_log(options):
+    """Chrome performance log, read back by collect_network_stats()."""
+    options.set_capability("goog:loggingPrefs", {"performance": "ALL"})
+    return options
+
+
+# ============================================================
+# 📊 Network monitor (bandwidth metrics + idle signal)
+# ============================================================
+class NetworkMonitor:
+    """
+    Reads one driver's performance log. Chrome hands each entry out only
+    once, so the readiness engine (in-flight requests) and the bandwidth
+    metrics share this reader instead of calling get_log() themselves.
+    """
+
+    def __init__(self, driver):
+        self.driver = driver
+        self.available = True
+        self.inflight = set()
+        self.last_activity = time.monotonic()
+        self.page = Counter()
+        self._types = {}
+
+    def poll(self):
+        if not self.available:
+            return
+        try:
+            entries = self.driver.get_log("performance")
+        except Exception:
+            self.available = False   # driver launched without the performance log
+            return
+
+        for entry in entries:
+            try:
+                message = json.loads(entry["message"])["message"]
+            except (KeyError, ValueError):
+                continue
+            method, params = message.get("method"), message.get("params", {})
+            request_id = params.get("requestId")
+            if method == "Network.requestWillBeSent":
+                self._types[request_id] = params.get("type", "Other")
+                self.inflight.add(request_id)
+            elif method == "Network.loadingFinished":
+                self.inflight.discard(request_id)
+                self.page["requests_loaded"] += 1
+                self.page["bytes_loaded"] += int(params.get("encodedDataLength") or 0)
+            elif method == "Network.loadingFailed":
+                self.inflight.discard(request_id)
+                if params.get("blockedReason"):
+                    resource_type = params.get("type") or self._types.get(request_id, "Other")
+                    self.page["requests_blocked"] += 1
+                    self.page["bytes_saved_est"] += TYPICAL_BYTES.get(resource_type, TYPICAL_BYTES["Other"])
+            else:
+                continue
+            self.last_activity = time.monotonic()
+
+    def idle_for(self, max_inflight=0) -> float:
+        """Seconds since the last request event, or 0 while requests are still running."""
+        self.poll()
+        if not self.available:
+            return float("inf")
+        if len(self.inflight) > max_inflight:
+            return 0.0
+        return time.monotonic() - self.last_activity
+
+    def flush(self) -> dict:
+        """
+        Add everything since the last flush to RESOURCE_STATS. Loaded bytes
+        are real encoded transfer sizes; saved bytes are an estimate from
+        TYPICAL_BYTES, since blocked requests are never sent.
+        """
+        self.poll()
+        page, self.page = self.page, Counter()
+        self.inflight.clear()
+        self._types.clear()
+        if page:
+            record_page_stats(page)
+            print(
+                f"🧹 Blocked {page['requests_blocked']} requests (~{page['bytes_saved_est'] / 1e6:.1f} MB saved), "
+                f"loaded {page['bytes_loaded'] / 1e6:.1f} MB"
+            )
+        return dict(page)
+
+
+_monitors = weakref.WeakKeyDictionary()
+_monitors_lock = threading.Lock()
+
+
+def network_monitor(driver) -> NetworkMonitor:
+    with _monitors_lock:
+        monitor = _monitors.get(driver)
+        if monitor is None:
+            monitor = _monitors[driver] = NetworkMonitor(driver)
+        return monitor
+
+
+def record_page_stats(page: dict):
+    """Add one page's counters (possibly from a browser worker process) to RESOURCE_STATS."""
+    with _stats_lock:
+        RESOURCE_STATS.update(page)
+        RESOURCE_STATS["pages"] += 1
+
+
+def collect_network_stats(driver) -> dict:
+    """Drain the driver's performance log into RESOURCE_STATS."""
+    return network_monitor(driver).flush()
+
+
+def get_resource_stats() -> dict:
+    with _stats_lock:
+        return dict(RESOURCE_STATS)
@@ -0,0 +1,232 @@
+import os
+import re
+import json
+import threading
+
+from database import DB_PATH, get_connection, transaction
+from html_cache import normalize_url
+from politeness import domain_of
+from excel_export import ExcelStreamWriter, COLUMNS, STATUS_COLUMN
+from extraction_result import FieldStats, FAILED_STATUSES
+
+LINK_FIELD = "Ссылка на объект"
+
+# Unit words in area strings → square metres per unit (anything else is taken as m²)
+AREA_UNITS = (
+    (re.compile(r"sq\.?\s*ft|sqft|ft²|ft2|square\s+feet|кв\.?\s*фут", re.I), 0.09290304),
+    (re.compile(r"\bha\b|hectare|га\b", re.I), 10000.0),
+    (re.compile(r"\bacres?\b|акр", re.I), 4046.8564224),
+    (re.compile(r"сот(ок|ки|ка)?\b", re.I), 100.0),
+)
+NUMBER_RE = re.compile(r"\d[\d\s  .,']*")
+
+
+# ============================================================
+# 🔢 Typed columns
+# ============================================================
+def parse_number(value):
+    """
+    First number in a scraped string: '€ 1 250 000' → 1250000.0,
+    '1,250,000' → 1250000.0, '1.250.000,50' → 1250000.5, '120,5 m²' → 120.5.
+    """
+    if isinstance(value, (int, float)):
+        return float(value)
+    if isinstance(value, list):
+        value = value[0] if value else None
+    if not value or value == "ERROR":
+        return None
+    match = NUMBER_RE.search(str(value))
+    if not match:
+        return None
+    token = re.sub(r"[\s  ']", "", match.group()).rstrip(".,")
+
+    if "," in token and "." in token:
+        # Whichever separator comes last is the decimal one
+        decimal = "," if token.rfind(",") > token.rfind(".") else "."
+        token = token.replace("." if decimal == "," else ",", "").replace(decimal, ".")
+    elif "," in token or "." in token:
+        sep = "," if "," in token else "."
+        parts = token.split(sep)
+        # One separator followed by exactly three digits reads as thousands (1,250 / 1.250)
+        if len(parts) > 2 or len(parts[-1]) == 3:
+            token = token.replace(sep, "")
+        else:
+            token = token.replace(sep, ".")
+    try:
+        return float(token)
+    except ValueError:
+        return None
+
+
+def parse_area(value):
+    """Area string → square metres (sq ft, hectares, acres and сотки are converted)."""
+    number = parse_number(value)
+    if number is None:
+        return None
+    text = " ".join(map(str, value)) if isinstance(value, list) else str(value)
+    for pattern, factor in AREA_UNITS:
+        if pattern.search(text):
+            return round(number * factor, 2)
+    return number
+
+
+def _text(value):
+    if isinstance(value, list):
+        value = ";".join(str(v) for v in value)
+    return None if value in (None, "", "ERROR") else str(value)
+
+
+# ============================================================
+# 🗄️ Results Store
+# ============================================================
+class ResultStore:
+    """
+    Every extracted property, one row per (job, canonical URL), with typed
+    price/area columns for queries. The full record is kept as JSON, so an
+    Excel file is just an export of a job's rows.
+    """
+
+    def __init__(self, db_path: str = DB_PATH):
+        self.db_path = db_path
+        get_connection(db_path)       # migrate the schema up front
+
+    def start_job(self, job_id, source_url):
+        get_connection(self.db_path).execute(
+            "INSERT OR IGNORE INTO scrape_jobs (job_id, source_url, domain) VALUES (?, ?, ?)",
+            (job_id, source_url, domain_of(source_url)),
+        )
+
+    def finish_job(self, job_id, excel_file=None):
+        get_connection(self.db_path).execute(
+            "UPDATE scrape_jobs SET excel_file = ?, finished_at = CURRENT_TIMESTAMP WHERE job_id = ?",
+            (excel_file, job_id),
+        )
+
+    @staticmethod
+    def _row(job_id, prop, field_status=None):
+        link = normalize_url(prop.get(LINK_FIELD) or "")
+        if field_status:
+            errors = sum(1 for status in field_status.values() if status in FAILED_STATUSES)
+        else:
+            errors = sum(1 for v in prop.values() if v == "ERROR")
+        return (
+            job_id, domain_of(link), link,
+            _text(prop.get("Название")),
+            parse_number(prop.get("Цена")),
+            _text(prop.get("Валюта")),
+            parse_area(prop.get("Площадь")),
+            parse_area(prop.get("Площадь земли")),
+            prop.get(STATUS_COLUMN),
+            errors,
+            json.dumps(prop, ensure_ascii=False),
+            json.dumps(field_status, ensure_ascii=False) if field_status else None,
+        )
+
+    def add(self, job_id, prop, field_status=None):
+        """Store one record with its per-field statuses (an ExtractionResult's data/field_status)."""
+        self.add_many(job_id, [(prop, field_status)])
+
+    def add_many(self, job_id, items):
+        """
+        Store (record, field_status) pairs under a job. A URL seen twice in
+        one job keeps its first position and the latest record.
+        """
+        rows = [self._row(job_id, prop, field_status) for prop, field_status in items]
+        with transaction(self.db_path) as conn:
+            conn.executemany("""
+                INSERT INTO results (
+                    job_id, domain, url, title, price, currency, area_m2, land_area_m2,
+                    status, error_fields, record_json, field_status
+                ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                ON CONFLICT (job_id, url) DO UPDATE SET
+                    title = excluded.title, price = excluded.price, currency = excluded.currency,
+                    area_m2 = excluded.area_m2, land_area_m2 = excluded.land_area_m2,
+                    status = excluded.status, error_fields = excluded.error_fields,
+                    record_json = excluded.record_json, field_status = excluded.field_status,
+                    scraped_at = CURRENT_TIMESTAMP
+            """, rows)
+
+    # ---------------- queries ----------------
+    def job_counts(self, job_id) -> dict:
+        """{"rows": N, "with_errors": M} for one job."""
+        row = get_connection(self.db_path).execute(
+            "SELECT COUNT(*) AS rows, COALESCE(SUM(error_fields > 0), 0) AS with_errors "
+            "FROM results WHERE job_id = ?",
+            (job_id,),
+        ).fetchone()
+        return dict(row)
+
+    def field_stats(self, job_id) -> FieldStats:
+        """Field status counts over the job's freshly extracted rows (unchanged/removed ones carry none)."""
+        conn = get_connection(self.db_path)
+        stats = FieldStats()
+        stats.properties = conn.execute(
+            "SELECT COUNT(*) FROM results WHERE job_id = ? AND field_status IS NOT NULL", (job_id,)
+        ).fetchone()[0]
+        for row in conn.execute("""
+            SELECT f.key AS field, f.value AS status, COUNT(*) AS n
+            FROM results r, json_each(r.field_status) f
+            WHERE r.job_id = ? AND r.field_status IS NOT NULL
+            GROUP BY f.key, f.value
+        """, (job_id,)):
+            stats.add(row["field"], row["status"], row["n"])
+        return stats
+
+    def field_failure_heatmap(self, jobs=50) -> dict:
+        """{domain: {field: (failed, seen)}} over the last `jobs` scrape jobs."""
+        placeholders = ", ".join("?" for _ in FAILED_STATUSES)
+        heatmap = {}
+        for row in get_connection(self.db_path).execute(f"""
+            SELECT r.domain, f.key AS field,
+                   SUM(f.value IN ({placeholders})) AS failed, COUNT(*) AS seen
+            FROM results r
+            JOIN (SELECT job_id FROM scrape_jobs ORDER BY started_at DESC LIMIT ?) recent USING (job_id),
+                 json_each(r.field_status) f
+            WHERE r.field_status IS NOT NULL
+            GROUP BY r.domain, f.key
+        """, (*FAILED_STATUSES, jobs)):
+            heatmap.setdefault(row["domain"], {})[row["field"]] = (row["failed"], row["seen"])
+        return heatmap
+
+    def job_records(self, job_id):
+        """A job's records in scrape order."""
+        rows = get_connection(self.db_path).execute(
+            "SELECT record_json FROM results WHERE job_id = ? ORDER BY id", (job_id,)
+        )
+        for row in rows:
+            yield json.loads(row["record_json"])
+
+    def jobs(self, limit=20):
+        """Recent jobs with their row and error counts, newest first."""
+        return [dict(row) for row in get_connection(self.db_path).execute("""
+            SELECT j.job_id, j.source_url, j.domain, j.excel_file, j.started_at, j.finished_at,
+                   COUNT(r.id) AS rows, COALESCE(SUM(r.error_fields > 0), 0) AS with_errors
+            FROM scrape_jobs j LEFT JOIN results r ON r.job_id = j.job_id
+            GROUP BY j.job_id ORDER BY j.started_at DESC LIMIT ?
+        """, (limit,))]
+
+    # ---------------- export ----------------
+    def export_excel(self, job_id, file_path):
+        """Write a job's rows to an .xlsx; returns the row count (no file is left when 0)."""
+        has_status = get_connection(self.db_path).execute(
+            "SELECT 1 FROM results WHERE job_id = ? AND status IS NOT NULL LIMIT 1", (job_id,)
+        ).fetchone()
+        writer = ExcelStreamWriter(file_path, COLUMNS + [STATUS_COLUMN] if has_status else COLUMNS)
+        with writer:
+            for record in self.job_records(job_id):
+                writer.append(record)
+        if not writer.rows:
+            os.remove(file_path)
+        return writer.rows
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_result_store() -> ResultStore:
+    global _store
+    with _store_lock:
+        if _store is None:
+            _store = ResultStore()
+        return _store
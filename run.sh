@@ -3,6 +3,11 @@
 # Activate virtual environment (if you have one)
 # source venv/bin/activate
 
+# Run the browser worker first: the panel and the bot render pages through it
+echo "Starting browser worker..."
+python3 browser_worker.py &
+export BROWSER_WORKER_URL="${BROWSER_WORKER_URL:-http://127.0.0.1:${BROWSER_WORKER_PORT:-8765}}"
+
 # Run Flask app in background
 echo "Starting Flask app..."
 python3 app.py &
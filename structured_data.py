@@ -0,0 +1,249 @@
+import re
+import json
+
+from html_cache import normalize_url
+from results_store import parse_number, parse_area, AREA_UNITS
+
+# schema.org types that describe the listing itself
+LISTING_TYPES = {
+    "RealEstateListing", "Product", "Offer", "Residence", "House", "SingleFamilyResidence",
+    "Apartment", "ApartmentComplex", "Accommodation", "Room", "Suite", "HouseAndLot",
+}
+PERSON_TYPES = {"Person", "RealEstateAgent"}
+CURRENCY_SYMBOLS = {"EUR": "€", "USD": "$", "GBP": "£", "JPY": "¥", "RUB": "₽"}
+# QuantitativeValue.unitCode (UN/CEFACT) → square metres per unit
+AREA_UNIT_CODES = {
+    "MTK": 1.0, "M2": 1.0, "SQM": 1.0,
+    "FTK": 0.09290304, "FTK2": 0.09290304, "SQF": 0.09290304, "FT2": 0.09290304,
+    "ACR": 4046.8564224, "HAR": 10000.0,
+}
+
+
+def _types(node):
+    t = node.get("@type", [])
+    return set(t if isinstance(t, list) else [t])
+
+
+def _walk_json(node, out):
+    """Flatten JSON-LD: top-level lists and @graph members become separate entities."""
+    if isinstance(node, list):
+        for item in node:
+            _walk_json(item, out)
+    elif isinstance(node, dict):
+        if "@graph" in node:
+            _walk_json(node["@graph"], out)
+        if "@type" in node:
+            out.append(node)
+
+
+def _json_ld_entities(tree):
+    entities = []
+    for raw in tree.xpath("//script[@type='application/ld+json']/text()"):
+        try:
+            _walk_json(json.loads(raw), entities)
+        except ValueError:
+            continue
+    return entities
+
+
+def _microdata_item(el):
+    item = {"@type": (el.get("itemtype") or "").rstrip("/").split("/")[-1]}
+    for prop in el.xpath(".//*[@itemprop]"):
+        # Skip properties that belong to a nested itemscope (handled recursively)
+        owner = prop.xpath("ancestor::*[@itemscope][1]")
+        if owner and owner[0] is not el:
+            continue
+        name = prop.get("itemprop")
+        if prop.get("itemscope") is not None:
+            value = _microdata_item(prop)
+        else:
+            value = prop.get("content") or prop.get("href") or prop.get("src") or prop.text_content().strip()
+        item.setdefault(name, value)
+    return item
+
+
+def _microdata_entities(tree):
+    return [
+        _microdata_item(el)
+        for el in tree.xpath("//*[@itemscope and not(ancestor::*[@itemscope])]")
+    ]
+
+
+def _first(value):
+    if isinstance(value, list):
+        return value[0] if value else None
+    return value
+
+
+def _text(value):
+    value = _first(value)
+    if isinstance(value, dict):
+        value = value.get("name") or value.get("value")
+    if value is None:
+        return None
+    value = str(value).strip()
+    return value or None
+
+
+def _format(number):
+    return str(int(number)) if float(number).is_integer() else str(round(number, 2))
+
+
+def _number(value):
+    """667800.0 → '667800', '1,250,000' → '1250000', '1 250 000,50' → '1250000.5'."""
+    value = _first(value)
+    if isinstance(value, dict):
+        value = value.get("value") or value.get("price") or value.get("minValue")
+    number = parse_number(value) if isinstance(value, (int, float, str)) else None
+    return None if number is None else _format(number)
+
+
+def _area(value):
+    """
+    floorSize/lotSize in m². A QuantitativeValue in sq ft, acres or hectares
+    is converted; an unknown unit gives None, so XPath/LLM fill the field.
+    """
+    value = _first(value)
+    if isinstance(value, dict):
+        number = _number(value)
+        unit = str(value.get("unitCode") or value.get("unitText") or "").strip()
+        if number is None or not unit:
+            return number
+        factor = AREA_UNIT_CODES.get(unit.upper().replace(" ", ""))
+        if factor is None:
+            if re.fullmatch(r"(?i)m²|m2|sq\.?\s*m|кв\.?\s*м", unit):
+                factor = 1.0
+            else:
+                factor = next((f for pattern, f in AREA_UNITS if pattern.search(unit)), None)
+        return None if factor is None else _format(round(float(number) * factor, 2))
+    if isinstance(value, (int, float, str)):
+        area = parse_area(value)
+        return None if area is None else _format(area)
+    return None
+
+
+def _images(value):
+    values = value if isinstance(value, list) else [value]
+    urls = []
+    for v in values:
+        if isinstance(v, dict):
+            v = v.get("contentUrl") or v.get("url")
+        if isinstance(v, str) and v.startswith("http"):
+            urls.append(v)
+    return urls
+
+
+def _pick_listing(entities, page_urls):
+    candidates = [e for e in entities if _types(e) & LISTING_TYPES]
+    for entity in candidates:
+        url = entity.get("url") or entity.get("@id")
+        if isinstance(url, str) and normalize_url(url) in page_urls:
+            return entity
+    # Without a URL match only an unambiguous page is safe: detail pages often
+    # embed "similar listings" with the same types
+    return candidates[0] if len(candidates) == 1 else None
+
+
+def _map_entity(entity) -> dict:
+    offers = _first(entity.get("offers")) or {}
+    if not isinstance(offers, dict):
+        offers = {}
+    if "Offer" in _types(entity):
+        offers = entity
+    item = entity.get("itemOffered") if isinstance(entity.get("itemOffered"), dict) else entity
+
+    result = {
+        "Название": _text(item.get("name")),
+        "Описание": _text(item.get("description")),
+        "Цена": _number(offers.get("price") or _first(offers.get("priceSpecification"))),
+        "Тип объекта": _text(item.get("accommodationCategory")),
+        "Площадь": _area(item.get("floorSize")),
+        "Площадь земли": _area(item.get("lotSize")),
+        "Год постройки": _number(item.get("yearBuilt")),
+        "Количество комнат": _number(item.get("numberOfRooms") or item.get("numberOfBedrooms")),
+        "С/у": _number(item.get("numberOfBathroomsTotal") or item.get("numberOfFullBathrooms")),
+        "Этаж": _text(item.get("floorLevel")),
+    }
+
+    currency = _text(offers.get("priceCurrency"))
+    if currency:
+        result["Валюта"] = CURRENCY_SYMBOLS.get(currency.upper(), currency)
+
+    address = item.get("address")
+    if isinstance(address, dict):
+        result["Локация"] = _text(address.get("addressLocality")) or _text(address.get("addressRegion"))
+    elif isinstance(address, str) and address.strip():
+        result["Локация"] = address.split(",")[0].strip()
+
+    geo = item.get("geo")
+    if isinstance(geo, dict) and geo.get("latitude") and geo.get("longitude"):
+        result["Координаты"] = f"{geo['latitude']},{geo['longitude']}"
+
+    images = _images(item.get("image") or item.get("photo"))
+    if images:
+        result["Фото_ссылки"] = images
+        result["Фото_уникальные_названия"] = [u.rstrip("/").split("/")[-1] for u in images]
+
+    for key in ("seller", "offeredBy", "broker", "agent", "provider"):
+        party = _first(offers.get(key) or item.get(key))
+        if not isinstance(party, dict):
+            continue
+        if _types(party) & PERSON_TYPES and "Контактное лицо" not in result:
+            result["Контактное лицо"] = _text(party.get("name"))
+            result["Телефон контактного лица"] = _text(party.get("telephone"))
+            employer = party.get("worksFor") or party.get("parentOrganization")
+            if isinstance(employer, dict):
+                result.setdefault("Компания", _text(employer.get("name")))
+                result.setdefault("Телефон компании", _text(employer.get("telephone")))
+        elif "Компания" not in result:
+            result["Компания"] = _text(party.get("name"))
+            result["Телефон компании"] = _text(party.get("telephone"))
+
+    return result
+
+
+def _open_graph(tree) -> dict:
+    meta = {
+        m.get("property"): m.get("content")
+        for m in tree.xpath("//meta[@property and @content]")
+    }
+    result = {
+        "Цена": _number(meta.get("product:price:amount") or meta.get("og:price:amount")),
+    }
+    currency = meta.get("product:price:currency") or meta.get("og:price:currency")
+    if currency:
+        result["Валюта"] = CURRENCY_SYMBOLS.get(currency.upper(), currency)
+    lat = meta.get("place:location:latitude") or meta.get("og:latitude")
+    lng = meta.get("place:location:longitude") or meta.get("og:longitude")
+    if lat and lng:
+        result["Координаты"] = f"{lat},{lng}"
+    return result
+
+
+# ============================================================
+# 🏷️ Structured Data Extractor (JSON-LD / microdata / OpenGraph)
+# ============================================================
+def extract_structured_data(tree, url) -> dict:
+    """
+    Map the page's own schema.org description onto our column schema.
+    Only fields with a value are returned; JSON-LD wins over microdata,
+    which wins over OpenGraph.
+    """
+    page_urls = {normalize_url(url)}
+    for canonical in tree.xpath("//link[@rel='canonical']/@href | //meta[@property='og:url']/@content"):
+        page_urls.add(normalize_url(canonical))
+
+    result = {}
+    sources = [
+        _pick_listing(_json_ld_entities(tree), page_urls),
+        _pick_listing(_microdata_entities(tree), page_urls),
+    ]
+    for entity in sources:
+        if entity:
+            for field, value in _map_entity(entity).items():
+                if value and field not in result:
+                    result[field] = value
+    for field, value in _open_graph(tree).items():
+        if value and field not in result:
+            result[field] = value
+    return result
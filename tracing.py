@@ -0,0 +1,243 @@
+import os
+import json
+import time
+import queue
+import atexit
+import threading
+import contextvars
+from contextlib import contextmanager
+from datetime import datetime
+
+from politeness import domain_of
+
+TRACE_DIR = os.getenv("TRACE_DIR", "traces")
+# Every finished span, one JSON object per line
+SPANS_FILE = os.path.join(TRACE_DIR, "spans.jsonl")
+# One aggregate line per finished job (read by the dashboard)
+JOBS_FILE = os.path.join(TRACE_DIR, "jobs.jsonl")
+# A trace file past this size is moved to <name>.1 (the previous .1 is dropped)
+TRACE_MAX_BYTES = int(os.getenv("TRACE_MAX_MB", "50")) * 1024 * 1024
+
+# Labels for the Telegram summary
+STAGE_LABELS = {
+    "job": "всего",
+    "chrome_start": "запуск Chrome",
+    "page_load": "загрузка страниц",
+    "scroll": "прокрутка",
+    "http_fetch": "HTTP",
+    "list_page_load": "пагинация",
+    "extract_fields": "XPath",
+    "llm_fallback": "LLM",
+    "excel": "Excel",
+    "download_images": "фото",
+}
+
+_job_id = contextvars.ContextVar("job_id", default=None)
+_totals = {}            # job_id → {span name → [count, total_ms, max_ms, errors]}
+_lock = threading.Lock()
+
+
+def current_job():
+    return _job_id.get()
+
+
+@contextmanager
+def job_context(job_id):
+    """Tag every span opened in this context (and in traced_submit tasks) with job_id."""
+    token = _job_id.set(job_id)
+    try:
+        yield
+    finally:
+        _job_id.reset(token)
+
+
+def traced_submit(executor, fn, *args):
+    """executor.submit that carries the caller's job context into the worker thread."""
+    return executor.submit(contextvars.copy_context().run, fn, *args)
+
+
+# ============================================================
+# ✍️ Trace writer (one background thread, files kept open)
+# ============================================================
+_queue = queue.SimpleQueue()
+_writer = None
+_writer_lock = threading.Lock()
+
+
+def _write(path, record):
+    """Queue one JSON line; spans never wait on file I/O."""
+    global _writer
+    _queue.put((path, json.dumps(record, ensure_ascii=False) + "\n"))
+    if _writer is None:
+        with _writer_lock:
+            if _writer is None:
+                _writer = threading.Thread(target=_writer_loop, name="trace-writer", daemon=True)
+                _writer.start()
+                atexit.register(_flush_on_exit)
+
+
+class _TraceFile:
+    """
+    Append-only handle. The bot, the panel and the browser worker share the
+    files, so each batch goes out as one O_APPEND write (lines never
+    interleave) and a file rotated by another process is reopened.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.fd = None
+
+    def write(self, data: bytes):
+        if self.fd is None or self._rotated_elsewhere():
+            self._reopen()
+        os.write(self.fd, data)
+        if os.fstat(self.fd).st_size > TRACE_MAX_BYTES:
+            os.replace(self.path, self.path + ".1")
+            self._reopen()
+
+    def _rotated_elsewhere(self):
+        try:
+            return os.stat(self.path).st_ino != os.fstat(self.fd).st_ino
+        except FileNotFoundError:
+            return True
+
+    def _reopen(self):
+        if self.fd is not None:
+            os.close(self.fd)
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        self.fd = os.open(self.path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+
+
+def _writer_loop():
+    files = {}
+    stop = False
+    while not stop:
+        items = [_queue.get()]
+        while len(items) < 1000:
+            try:
+                items.append(_queue.get_nowait())
+            except queue.Empty:
+                break
+        batch = {}
+        for item in items:
+            if item is None:
+                stop = True     # _flush_on_exit: everything queued before it still gets written
+                continue
+            path, line = item
+            batch.setdefault(path, []).append(line)
+        for path, lines in batch.items():
+            try:
+                files.setdefault(path, _TraceFile(path)).write("".join(lines).encode("utf-8"))
+            except OSError as e:
+                print(f"⚠️ Trace write failed for {path}: {e}")
+
+
+def _flush_on_exit():
+    _queue.put(None)
+    _writer.join(5)
+
+
+# ============================================================
+# ⏱️ Spans
+# ============================================================
+@contextmanager
+def span(name, url=None, **tags):
+    """Time a block; written to spans.jsonl and added to the job's totals."""
+    start = time.perf_counter()
+    status = "ok"
+    try:
+        yield tags
+    except BaseException:
+        status = "error"
+        raise
+    finally:
+        duration_ms = (time.perf_counter() - start) * 1000
+        job_id = _job_id.get()
+        record = {
+            "ts": datetime.now().isoformat(timespec="milliseconds"),
+            "span": name,
+            "ms": round(duration_ms, 2),
+            "status": status,
+            "job": job_id,
+            "thread": threading.current_thread().name,
+        }
+        if url:
+            record["url"] = url
+            record["domain"] = domain_of(url)
+        record.update(tags)
+        _write(SPANS_FILE, record)
+
+        if job_id:
+            with _lock:
+                stats = _totals.setdefault(job_id, {}).setdefault(name, [0, 0.0, 0.0, 0])
+                stats[0] += 1
+                stats[1] += duration_ms
+                stats[2] = max(stats[2], duration_ms)
+                stats[3] += status == "error"
+
+
+# ============================================================
+# 📊 Summaries
+# ============================================================
+def job_summary(job_id) -> dict:
+    """{span: {"count", "total_ms", "max_ms", "errors"}} for one job."""
+    with _lock:
+        stats = {name: list(values) for name, values in _totals.get(job_id, {}).items()}
+    return {
+        name: {"count": c, "total_ms": round(t, 1), "max_ms": round(m, 1), "errors": e}
+        for name, (c, t, m, e) in stats.items()
+    }
+
+
+def finish_job(job_id, **tags) -> dict:
+    """Write the job's aggregate to jobs.jsonl and drop it from memory."""
+    summary = job_summary(job_id)
+    with _lock:
+        _totals.pop(job_id, None)
+    _write(JOBS_FILE, {
+        "ts": datetime.now().isoformat(timespec="seconds"),
+        "job": job_id,
+        **tags,
+        "stages": summary,
+    })
+    return summary
+
+
+def format_summary(summary) -> str:
+    """Telegram-friendly 'where did the time go'. Stage times are summed over workers."""
+    if not summary:
+        return ""
+    lines = ["⏱️ Время по этапам (сумма по потокам):"]
+    total = summary.get("job", {}).get("total_ms")
+    if total:
+        lines.append(f"• всего: {total / 1000:.1f} с")
+    stages = [(n, s) for n, s in summary.items() if n in STAGE_LABELS and n != "job"]
+    for name, stats in sorted(stages, key=lambda item: -item[1]["total_ms"]):
+        lines.append(f"• {STAGE_LABELS[name]}: {stats['total_ms'] / 1000:.1f} с ({stats['count']}×)")
+    return "\n".join(lines)
+
+
+def _tail_lines(path, count, block=64 * 1024) -> list:
+    """Last `count` lines of a file, reading backwards from the end."""
+    with open(path, "rb") as f:
+        f.seek(0, os.SEEK_END)
+        pos, data = f.tell(), b""
+        while pos > 0 and data.count(b"\n") <= count:
+            step = min(block, pos)
+            pos -= step
+            f.seek(pos)
+            data = f.read(step) + data
+    return data.decode("utf-8", errors="replace").splitlines()[-count:]
+
+
+def recent_jobs(limit=20) -> list:
+    """Last finished job summaries, newest first."""
+    if not os.path.exists(JOBS_FILE):
+        return []
+    jobs = []
+    for line in reversed(_tail_lines(JOBS_FILE, limit)):
+        try:
+            jobs.append(json.loads(line))
+        except ValueError:
+            continue
+    return jobs
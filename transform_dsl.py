@@ -0,0 +1,360 @@
+import re
+import ast
+import operator
+from functools import lru_cache
+from itertools import islice
+
+# ============================================================
+# 🧮 Transform DSL
+# ------------------------------------------------------------
+# Field transforms stay written as Python-style expressions over `value`
+# (so every stored config keeps working), but only this subset is accepted:
+#   - literals, lists/tuples, `value`, names bound by `name = expr;` steps
+#   - re.sub/search/findall/match/fullmatch/split and match.group(s)
+#   - str methods: strip/split/replace/join/lower/upper/startswith/...
+#   - indexing and slicing, + - * / // %, comparisons, `in`, and/or/not
+#   - `a if cond else b` and one-level list comprehensions with filters
+#   - float/int/str/len/round/min/max/abs/bool/list conversions
+# Sources are compiled once into nested closures; there is no eval().
+# ============================================================
+
+MAX_TRANSFORM_LENGTH = 1000
+MAX_RESULT_LENGTH = 1_000_000
+
+SAFE_BUILTINS = {
+    "float": float, "int": int, "str": str, "len": len, "round": round,
+    "min": min, "max": max, "abs": abs, "bool": bool, "list": list,
+}
+RE_FUNCTIONS = {"sub", "search", "findall", "match", "fullmatch", "split", "I", "IGNORECASE", "S", "DOTALL", "M", "MULTILINE"}
+OBJECT_METHODS = {
+    # str
+    "strip", "lstrip", "rstrip", "split", "rsplit", "replace", "lower", "upper",
+    "title", "capitalize", "join", "startswith", "endswith", "find", "count",
+    "isdigit", "splitlines", "removeprefix", "removesuffix",
+    # re.Match
+    "group", "groups",
+    # list
+    "index",
+}
+SAFE_RECEIVERS = (str, list, tuple, re.Match)
+
+BIN_OPS = {
+    ast.Add: operator.add, ast.Sub: operator.sub, ast.Mult: operator.mul,
+    ast.Div: operator.truediv, ast.FloorDiv: operator.floordiv, ast.Mod: operator.mod,
+}
+CMP_OPS = {
+    ast.Eq: operator.eq, ast.NotEq: operator.ne, ast.Lt: operator.lt, ast.LtE: operator.le,
+    ast.Gt: operator.gt, ast.GtE: operator.ge, ast.Is: operator.is_, ast.IsNot: operator.is_not,
+    ast.In: lambda a, b: a in b, ast.NotIn: lambda a, b: a not in b,
+}
+
+
+class TransformError(ValueError):
+    """Raised when a transform is not valid DSL, or fails while running."""
+
+
+class _ReNamespace:
+    """The only face of the `re` module a transform can see."""
+
+    def __init__(self):
+        for name in RE_FUNCTIONS:
+            setattr(self, name, getattr(re, name))
+
+
+_RE = _ReNamespace()
+
+
+def _check_size(result):
+    if isinstance(result, (str, list, tuple, range)) and len(result) > MAX_RESULT_LENGTH:
+        raise TransformError("Transform result too large")
+    return result
+
+
+def _check_length(length):
+    """Refuse a result of `length` items before it is built."""
+    _check_size(range(max(length, 0)))
+
+
+def _no_empty_pattern(pattern, replacement):
+    # '' matches between every character: a non-empty replacement multiplies the value
+    if pattern == "" and replacement:
+        raise TransformError("Empty pattern with a non-empty replacement is not allowed")
+
+
+def _replace_length(s, old, new, count=-1):
+    _no_empty_pattern(old, new)
+    hits = s.count(old) if old else 0
+    if count >= 0:
+        hits = min(hits, count)
+    return len(s) + hits * (len(new) - len(old))
+
+
+def _join_length(sep, items):
+    if not isinstance(items, (str, list, tuple)):
+        return 0
+    return sum(len(i) for i in items if isinstance(i, str)) + len(sep) * max(len(items) - 1, 0)
+
+
+# Output length of str methods that can grow their receiver, computed from the arguments
+STR_RESULT_LENGTH = {
+    "replace": _replace_length,
+    "join": _join_length,
+    "center": lambda s, width, *_: max(len(s), width),
+    "ljust": lambda s, width, *_: max(len(s), width),
+    "rjust": lambda s, width, *_: max(len(s), width),
+    "zfill": lambda s, width: max(len(s), width),
+    "expandtabs": lambda s, tabsize=8: len(s) + s.count("\t") * max(tabsize, 0),
+}
+
+
+def _check_call_size(func, args, kwargs):
+    """Size-check a str method call from its arguments, before it allocates the result."""
+    receiver = getattr(func, "__self__", None)
+    estimate = STR_RESULT_LENGTH.get(getattr(func, "__name__", ""))
+    if not isinstance(receiver, str) or estimate is None:
+        return
+    try:
+        length = estimate(receiver, *args, **kwargs)
+    except TypeError:
+        return                  # bad arguments: let the call itself report them
+    _check_length(length)
+
+
+def _bounded_sub(pattern, repl, string, count=0, flags=0):
+    """re.sub that refuses up front when its output could pass MAX_RESULT_LENGTH."""
+    _no_empty_pattern(pattern, repl)
+    if isinstance(repl, str) and isinstance(string, str):
+        # A group reference expands to at most the whole match
+        refs = repl.count("\\")
+        if refs or len(string) + (len(string) + 1) * len(repl) > MAX_RESULT_LENGTH:
+            length = len(string)
+            for match in islice(re.finditer(pattern, string, flags=flags), count or None):
+                width = match.end() - match.start()
+                length += len(repl) + (refs - 1) * width
+                _check_length(length)
+    return re.sub(pattern, repl, string, count=count, flags=flags)
+
+
+def _compile_node(node, names):
+    """Return fn(env) for one AST node; `names` are the variables in scope."""
+    if isinstance(node, ast.Constant):
+        value = node.value
+        if not isinstance(value, (str, int, float, bool, type(None))):
+            raise TransformError(f"Unsupported literal: {value!r}")
+        return lambda env: value
+
+    if isinstance(node, ast.Name):
+        name = node.id
+        if name in names:
+            return lambda env: env[name]
+        if name == "re":
+            return lambda env: _RE
+        if name in SAFE_BUILTINS:
+            builtin = SAFE_BUILTINS[name]
+            return lambda env: builtin
+        raise TransformError(f"Unknown name '{name}'")
+
+    if isinstance(node, ast.Attribute):
+        attr = node.attr
+        if isinstance(node.value, ast.Name) and node.value.id == "re" and "re" not in names:
+            if attr not in RE_FUNCTIONS:
+                raise TransformError(f"re.{attr} is not allowed")
+            func = _bounded_sub if attr == "sub" else getattr(re, attr)
+            return lambda env: func
+        if attr not in OBJECT_METHODS:
+            raise TransformError(f"Method '.{attr}' is not allowed")
+        obj_fn = _compile_node(node.value, names)
+
+        def get_attr(env):
+            obj = obj_fn(env)
+            if not isinstance(obj, SAFE_RECEIVERS):
+                raise TransformError(f"'.{attr}' on unsupported type {type(obj).__name__}")
+            return getattr(obj, attr)
+        return get_attr
+
+    if isinstance(node, ast.Call):
+        func_fn = _compile_node(node.func, names)
+        arg_fns = [_compile_node(a, names) for a in node.args]
+        kw_fns = {}
+        for kw in node.keywords:
+            if kw.arg is None:
+                raise TransformError("**kwargs are not allowed")
+            kw_fns[kw.arg] = _compile_node(kw.value, names)
+        def call(env):
+            func = func_fn(env)
+            args = [f(env) for f in arg_fns]
+            kwargs = {k: f(env) for k, f in kw_fns.items()}
+            _check_call_size(func, args, kwargs)
+            return _check_size(func(*args, **kwargs))
+        return call
+
+    if isinstance(node, ast.Subscript):
+        obj_fn = _compile_node(node.value, names)
+        if isinstance(node.slice, ast.Slice):
+            parts = [
+                _compile_node(p, names) if p is not None else (lambda env: None)
+                for p in (node.slice.lower, node.slice.upper, node.slice.step)
+            ]
+            return lambda env: obj_fn(env)[slice(*[p(env) for p in parts])]
+        index_fn = _compile_node(node.slice, names)
+        return lambda env: obj_fn(env)[index_fn(env)]
+
+    if isinstance(node, ast.BinOp):
+        op = BIN_OPS.get(type(node.op))
+        if op is None:
+            raise TransformError(f"Operator {type(node.op).__name__} is not allowed")
+        left, right = _compile_node(node.left, names), _compile_node(node.right, names)
+
+        def bin_op(env):
+            a, b = left(env), right(env)
+            if op is operator.mul:
+                # Refuse 'x' * 10**9 before building it
+                seq, times = (a, b) if isinstance(b, int) else (b, a)
+                if isinstance(seq, (str, list, tuple)) and isinstance(times, int):
+                    _check_size(range(len(seq) * max(times, 0)))
+            return _check_size(op(a, b))
+        return bin_op
+
+    if isinstance(node, ast.UnaryOp):
+        operand = _compile_node(node.operand, names)
+        if isinstance(node.op, ast.Not):
+            return lambda env: not operand(env)
+        if isinstance(node.op, ast.USub):
+            return lambda env: -operand(env)
+        raise TransformError(f"Operator {type(node.op).__name__} is not allowed")
+
+    if isinstance(node, ast.BoolOp):
+        fns = [_compile_node(v, names) for v in node.values]
+        if isinstance(node.op, ast.And):
+            def and_(env):
+                result = True
+                for f in fns:
+                    result = f(env)
+                    if not result:
+                        return result
+                return result
+            return and_
+
+        def or_(env):
+            result = False
+            for f in fns:
+                result = f(env)
+                if result:
+                    return result
+            return result
+        return or_
+
+    if isinstance(node, ast.Compare):
+        left = _compile_node(node.left, names)
+        ops = []
+        for op, comparator in zip(node.ops, node.comparators):
+            if type(op) not in CMP_OPS:
+                raise TransformError(f"Comparison {type(op).__name__} is not allowed")
+            ops.append((CMP_OPS[type(op)], _compile_node(comparator, names)))
+
+        def compare(env):
+            current = left(env)
+            for op, right_fn in ops:
+                right = right_fn(env)
+                if not op(current, right):
+                    return False
+                current = right
+            return True
+        return compare
+
+    if isinstance(node, ast.IfExp):
+        test, body, orelse = (_compile_node(n, names) for n in (node.test, node.body, node.orelse))
+        return lambda env: body(env) if test(env) else orelse(env)
+
+    if isinstance(node, (ast.List, ast.Tuple)):
+        fns = [_compile_node(e, names) for e in node.elts]
+        container = list if isinstance(node, ast.List) else tuple
+        return lambda env: container(f(env) for f in fns)
+
+    if isinstance(node, ast.ListComp):
+        if len(node.generators) != 1:
+            raise TransformError("Only one 'for' per list comprehension is allowed")
+        gen = node.generators[0]
+        if not isinstance(gen.target, ast.Name) or gen.is_async:
+            raise TransformError("List comprehension target must be a plain name")
+        var = gen.target.id
+        if any(isinstance(n, ast.ListComp) for part in (node.elt, gen.iter, *gen.ifs) for n in ast.walk(part)):
+            raise TransformError("Nested list comprehensions are not allowed")
+        inner = names | {var}
+        iter_fn = _compile_node(gen.iter, names)
+        cond_fns = [_compile_node(c, inner) for c in gen.ifs]
+        elt_fn = _compile_node(node.elt, inner)
+
+        def list_comp(env):
+            out = []
+            built = 0           # list slots + the length of every element built so far
+            scope = dict(env)
+            for item in iter_fn(env):
+                scope[var] = item
+                if all(c(scope) for c in cond_fns):
+                    elt = _check_size(elt_fn(scope))
+                    out.append(elt)
+                    built += 1 + (len(elt) if isinstance(elt, (str, list, tuple)) else 0)
+                    if built > MAX_RESULT_LENGTH:
+                        raise TransformError("Transform result too large")
+            return out
+        return list_comp
+
+    raise TransformError(f"Unsupported syntax: {type(node).__name__}")
+
+
+@lru_cache(maxsize=1024)
+def compile_transform(source: str):
+    """
+    Compile a transform into fn(value) -> result. Raises TransformError for
+    anything outside the DSL; the returned function raises TransformError
+    when the transform fails on a particular value.
+    """
+    if not isinstance(source, str) or not source.strip():
+        raise TransformError("Transform must be a non-empty string")
+    if len(source) > MAX_TRANSFORM_LENGTH:
+        raise TransformError("Transform is too long")
+    try:
+        module = ast.parse(source.strip(), mode="exec")
+    except SyntaxError as e:
+        raise TransformError(f"Syntax error: {e.msg}") from e
+
+    *steps, last = module.body or [None]
+    if not isinstance(last, ast.Expr):
+        raise TransformError("Transform must end with an expression")
+
+    names = {"value"}
+    compiled_steps = []
+    for step in steps:
+        if not (isinstance(step, ast.Assign) and len(step.targets) == 1 and isinstance(step.targets[0], ast.Name)):
+            raise TransformError("Only 'name = expression;' steps are allowed before the final expression")
+        compiled_steps.append((step.targets[0].id, _compile_node(step.value, names)))
+        names = names | {step.targets[0].id}
+    result_fn = _compile_node(last.value, names)
+
+    def run(value):
+        env = {"value": value}
+        try:
+            for name, fn in compiled_steps:
+                env[name] = fn(env)
+            return result_fn(env)
+        except TransformError:
+            raise
+        except Exception as e:
+            raise TransformError(f"{type(e).__name__}: {e}") from e
+
+    return run
+
+
+def validate_transforms(config) -> list:
+    """Human-readable problems with a config's transforms (empty list if all compile)."""
+    errors = []
+    for field_name, field_data in (config.get("fields") or {}).items():
+        transform = (field_data or {}).get("transform")
+        if not transform:
+            continue
+        try:
+            compile_transform(transform)
+        except TransformError as e:
+            errors.append(f"{field_name}: {e}")
+    return errors
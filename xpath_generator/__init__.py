@@ -0,0 +1,9 @@
+"""
+LLM-driven generator of site configs (XPaths + transforms) from a list page
+and a detail page. Importing the package is cheap: the CHAT_GPT_* settings
+are read and `requests` is loaded on the first call.
+"""
+from .client import call_gpt, gpt_settings
+from .generator import extract_xpaths
+from .prompts import SYSTEM_PROMPT
+from .validation import INVALID_XPATH_TOKENS, validate_config, validate_xpath
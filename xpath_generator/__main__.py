@@ -0,0 +1,36 @@
+"""
+Generate a config from saved pages:
+
+    python -m xpath_generator                          # recorded jamesedition.com pages
+    python -m xpath_generator list.html detail.html -o extracted_xpaths.json
+"""
+import os
+import json
+import argparse
+
+from .generator import extract_xpaths
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+FIXTURE_DIR = os.path.join(ROOT, "benchmarks", "fixtures", "jamesedition.com")
+
+
+def _read(path):
+    with open(path, encoding="utf-8") as f:
+        return f.read()
+
+
+def main_cli():
+    parser = argparse.ArgumentParser(prog="python -m xpath_generator", description="Generate a scraping config with the LLM")
+    parser.add_argument("list_html", nargs="?", default=os.path.join(FIXTURE_DIR, "list.html"))
+    parser.add_argument("detail_html", nargs="?", default=os.path.join(FIXTURE_DIR, "detail.html"))
+    parser.add_argument("-o", "--output", default="extracted_xpaths.json")
+    args = parser.parse_args()
+
+    result = extract_xpaths(_read(args.list_html), _read(args.detail_html))
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(result, f, indent=2, ensure_ascii=False)
+    print(json.dumps(result, indent=2, ensure_ascii=False))
+
+
+if __name__ == "__main__":
+    main_cli()
@@ -0,0 +1,42 @@
+import os
+
+from dotenv import load_dotenv
+
+
+# ============================================================
+# 🔐 ENV
+# ============================================================
+def gpt_settings():
+    """(url, api_key, model), read when the generator is first used rather than at import."""
+    load_dotenv()
+    url = os.getenv("CHAT_GPT_URL")
+    api_key = os.getenv("CHAT_GPT_API_KEY")
+    model = os.getenv("CHAT_GPT_MODEL")
+    if not url or not api_key or not model:
+        raise RuntimeError("❌ Missing CHAT_GPT_* environment variables")
+    return url, api_key, model
+
+
+# ============================================================
+# 🤖 GPT CALL
+# ============================================================
+def call_gpt(messages):
+    import requests
+
+    url, api_key, model = gpt_settings()
+    headers = {
+        "Authorization": f"Bearer {api_key}",
+        "Content-Type": "application/json"
+    }
+
+    payload = {
+        "model": model,
+        "messages": messages,
+        "temperature": 0
+    }
+
+    r = requests.post(url, json=payload, headers=headers, timeout=120)
+    if r.status_code != 200:
+        raise RuntimeError(r.text)
+
+    return r.json()["choices"][0]["message"]["content"]
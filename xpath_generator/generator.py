@@ -0,0 +1,39 @@
+import json
+
+from .client import call_gpt
+from .prompts import SYSTEM_PROMPT, generation_prompt, repair_prompt
+from .validation import validate_config
+
+
+# ============================================================
+# 🔁 AUTO-REPAIR XPATH GENERATOR
+# ============================================================
+def extract_xpaths(list_html: str, detail_html: str, max_retries: int = 3) -> dict:
+    messages = [
+        {"role": "system", "content": SYSTEM_PROMPT},
+        {"role": "user", "content": generation_prompt(list_html, detail_html)}
+    ]
+
+    last_error = None
+
+    for attempt in range(1, max_retries + 1):
+        content = call_gpt(messages)
+
+        try:
+            cfg = json.loads(content)
+            return validate_config(cfg)
+
+        except Exception as e:
+            last_error = str(e)
+
+            # 🔁 FEEDBACK LOOP TO GPT
+            messages.append({
+                "role": "assistant",
+                "content": content
+            })
+            messages.append({
+                "role": "user",
+                "content": repair_prompt(last_error)
+            })
+
+    raise RuntimeError(f"❌ Failed after {max_retries} attempts.\nLast error: {last_error}")
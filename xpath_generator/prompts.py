@@ -0,0 +1,88 @@
+# ============================================================
+# 🧠 SYSTEM PROMPT
+# ============================================================
+SYSTEM_PROMPT = """
+You are a senior web scraping engineer.
+
+You generate ONLY valid XPath 1.0 expressions and Python transform strings.
+
+STRICT RULES:
+- XPath MUST be valid XPath 1.0 syntax.
+- XPath MUST NOT contain Python code.
+- NEVER use re.sub, re.search, if, else, lambda, list comprehensions in XPath.
+- XPath is ONLY for selecting nodes or text.
+- ALL regex, cleanup, logic MUST be in transform.
+- Single-value fields → XPath MUST return text (string() or /text()).
+- Multi-value fields → XPath MUST return node sets.
+- Attribute values MUST be selected using /@attr.
+- Pagination XPath MUST select ELEMENTS, not attributes.
+- page_query MUST be a query parameter name, NOT XPath.
+- If unsure, return null.
+- Make sure transform code is a single Python expression over `value`.
+- Transforms may only use: re.sub/search/findall/match/split, match.group(), str methods (strip, split, replace, join, lower, upper, startswith, endswith), indexing/slicing, float/int/str/len, `a if cond else b` and simple list comprehensions. Do not import anything.
+- Make sure list_page_check XPath must return href attribute of an <a> element which points to the property detail page.
+"""
+
+# Each page is cut to this many characters before it goes into the prompt
+MAX_PAGE_CHARS = 120000
+
+
+def generation_prompt(list_html: str, detail_html: str) -> str:
+    return f"""
+You will receive two HTML documents.
+
+Generate a scraping configuration JSON.
+
+Rules:
+- Output RAW JSON only
+- No explanations
+- Follow XPath rules strictly
+
+list_page_html:
+{list_html[:MAX_PAGE_CHARS]}
+
+detail_page_html:
+{detail_html[:MAX_PAGE_CHARS]}
+
+JSON TEMPLATE:
+{{
+  "fields": {{
+    "Название": {{ "xpath": null, "transform": null }},
+    "Цена": {{ "xpath": null, "transform": null }},
+    "Валюта": {{ "xpath": null, "transform": null }},
+    "Площадь": {{ "xpath": null, "transform": null }},
+    "Площадь земли": {{ "xpath": null, "transform": null }},
+    "Тип объекта": {{ "xpath": null, "transform": null }},
+    "Год постройки": {{ "xpath": null, "transform": null }},
+    "Количество комнат": {{ "xpath": null, "transform": null }},
+    "Описание": {{ "xpath": null, "transform": null }},
+    "Инфраструктура": {{ "xpath": null, "transform": null }},
+    "С/у": {{ "xpath": null, "transform": null }},
+    "Этаж": {{ "xpath": null, "transform": null }},
+    "Локация": {{ "xpath": null, "transform": null }},
+    "Координаты": {{ "xpath": null, "transform": null }},
+    "Фото_ссылки": {{ "xpath": null, "transform": null }},
+    "Фото_уникальные_названия": {{ "xpath": null, "transform": null }},
+    "Контактное лицо": {{ "xpath": null, "transform": null }},
+    "Телефон контактного лица": {{ "xpath": null, "transform": null }},
+    "Компания": {{ "xpath": null, "transform": null }},
+    "Телефон компании": {{ "xpath": null, "transform": null }}
+  }},
+  "list_page_check": null,
+  "page_query": null,
+  "next_page_xpath": null
+}}
+"""
+
+
+def repair_prompt(error: str) -> str:
+    return f"""
+The previous JSON is INVALID.
+
+ERROR:
+{error}
+
+Fix ONLY the invalid parts.
+Return FULL corrected JSON.
+RAW JSON ONLY.
+"""
@@ -0,0 +1,50 @@
+from lxml import html
+
+from transform_dsl import validate_transforms
+
+# ============================================================
+# 🚫 INVALID TOKENS (hard block)
+# ============================================================
+INVALID_XPATH_TOKENS = [
+    "re.", " if ", " else", "lambda", ";",
+    "{", "}", " for ", " in "
+]
+
+
+# ============================================================
+# 🧪 VALIDATION
+# ============================================================
+def validate_xpath(xpath: str, field_name: str):
+    if not isinstance(xpath, str):
+        raise ValueError(f"XPath for '{field_name}' must be a string")
+
+    for bad in INVALID_XPATH_TOKENS:
+        if bad in xpath:
+            raise ValueError(f"Invalid token '{bad}' in XPath for '{field_name}'")
+
+    try:
+        html.fromstring("<html></html>").xpath(xpath)
+    except Exception as e:
+        raise ValueError(f"Invalid XPath for '{field_name}': {xpath}") from e
+
+
+def validate_config(cfg: dict):
+    fields = cfg.get("fields", {})
+    for field, meta in fields.items():
+        xp = meta.get("xpath")
+        if xp:
+            validate_xpath(xp, field)
+
+    transform_errors = validate_transforms(cfg)
+    if transform_errors:
+        raise ValueError("Invalid transform: " + "; ".join(transform_errors))
+
+    np = cfg.get("next_page_xpath")
+    if np and "/@" in np:
+        raise ValueError("next_page_xpath must select an ELEMENT, not attribute")
+
+    pq = cfg.get("page_query")
+    if pq and ("/" in pq or "[" in pq):
+        raise ValueError("page_query must be a query parameter name")
+
+    return cfg